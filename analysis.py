@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from library import CODEC_BY_EXT, LibraryScanner
+
+# Nivel de referencia de ReplayGain 2.0 (LUFS)
+REPLAYGAIN_REFERENCE_LUFS = -18.0
+
+_INTEGRATED_RE = re.compile(r"I:\s+(-?\d+(?:\.\d+)?)\s+LUFS")
+
+
+def probe(path: str) -> Dict:
+    """Duración, bitrate y códec con ffprobe (solo lee la cabecera)"""
+    output = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration,bit_rate:stream=codec_name",
+        "-of", "json", path
+    ], check=True, capture_output=True, stdin=subprocess.DEVNULL).stdout
+    data = json.loads(output)
+    fmt = data.get("format", {})
+    streams = data.get("streams") or [{}]
+    return {
+        "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+        "bitrate": int(fmt["bit_rate"]) if fmt.get("bit_rate") else None,
+        "codec": streams[0].get("codec_name"),
+    }
+
+
+def measure_loudness(path: str) -> Optional[float]:
+    """Sonoridad integrada EBU R128 (LUFS) con el filtro ebur128 de ffmpeg"""
+    result = subprocess.run([
+        "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+        "-map", "a:0", "-filter:a", "ebur128", "-f", "null", "-"
+    ], check=True, capture_output=True, stdin=subprocess.DEVNULL)
+    # El resumen final es la última aparición de "I: ... LUFS"
+    matches = _INTEGRATED_RE.findall(result.stderr.decode(errors="replace"))
+    return float(matches[-1]) if matches else None
+
+
+def analyze_file(song_id: str, path: str) -> Tuple[str, Dict]:
+    """Analiza un archivo (se ejecuta en un proceso del pool)"""
+    stat = os.stat(path)
+    info = probe(path)
+    loudness = measure_loudness(path)
+    ext = path.rsplit(".", 1)[-1]
+    info.update(
+        codec=info["codec"] or CODEC_BY_EXT.get(ext.lower()),
+        ext=ext,
+        loudness=loudness,
+        gain_db=(REPLAYGAIN_REFERENCE_LUFS - loudness) if loudness is not None else None,
+        file_mtime=stat.st_mtime,
+        file_size=stat.st_size,
+    )
+    return song_id, info
+
+
+class LibraryAnalyzer:
+    """Analiza en paralelo las canciones nuevas o modificadas y guarda el resultado
+
+    Cada archivo se analiza en un proceso aparte (ffprobe + ffmpeg ebur128);
+    los que tienen el mismo mtime y tamaño que en el catálogo se saltan
+    (tamaño y mtime salen de la copia en memoria del LibraryScanner).
+    """
+
+    def __init__(self, catalog, library: LibraryScanner, workers: Optional[int] = None):
+        self.catalog = catalog
+        self.library = library
+        self.workers = workers or os.cpu_count() or 1
+
+    def pending(self, force: bool = False) -> List[Tuple[str, str]]:
+        """(song_id, ruta) de las canciones que hay que analizar"""
+        pending = []
+        for song_id, info in self.library.song_files():
+            song = self.catalog.get(song_id) or {}
+            if not force and song.get("file_mtime") == info.mtime and song.get("file_size") == info.size:
+                continue
+            pending.append((song_id, os.path.join(self.library.songs_dir, f"{song_id}.{info.ext}")))
+        return pending
+
+    def run(self, force: bool = False, should_cancel: Optional[Callable[[], bool]] = None,
+            progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """Analiza lo pendiente. Devuelve cuántas se analizaron, fallaron y se saltaron"""
+        should_cancel = should_cancel or (lambda: False)
+        pending = self.pending(force)
+        skipped = len(self.library.song_files()) - len(pending)
+        analyzed = failed = 0
+        if not pending:
+            return {"analyzed": 0, "failed": 0, "skipped": skipped}
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+            futures = [pool.submit(analyze_file, song_id, path) for song_id, path in pending]
+            with self.catalog.batch():
+                for done, future in enumerate(as_completed(futures), 1):
+                    if should_cancel():
+                        for f in futures:
+                            f.cancel()
+                        break
+                    try:
+                        song_id, info = future.result()
+                        self.catalog.set_analysis(song_id, info)
+                        analyzed += 1
+                    except Exception as e:
+                        failed += 1
+                        print(f"\nError al analizar: {e}")
+                    if progress:
+                        progress(done, len(pending))
+        return {"analyzed": analyzed, "failed": failed, "skipped": skipped}
@@ -0,0 +1,553 @@
+import io
+import os
+import sys
+import json
+import shutil
+import time
+import statistics
+import subprocess
+import random
+import argparse
+import tempfile
+import threading
+import http.server
+from contextlib import redirect_stdout
+
+WORDS = [
+    "love", "night", "dream", "fire", "heart", "rain", "summer", "light", "dance",
+    "moments", "magnificent", "everything", "alright", "shadow", "ocean", "river",
+    "golden", "electric", "silence", "forever", "stars", "city", "home", "wild",
+]
+EXTRAS = [
+    "(Official Audio)", "(Official Video)", "[HD]", "(Lyrics)", "(Live)", "[Remix]",
+    "(feat. Someone)", "| Topic", "(Extended Mix)", "- Cover", "", "", "", "",
+]
+
+
+def random_title(rng: random.Random) -> str:
+    song = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    artist = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 2)))
+    title = f"{artist} - {song}" if rng.random() < 0.7 else song
+    return f"{title} {rng.choice(EXTRAS)}".strip()
+
+
+def search_candidates(rng: random.Random, expected: str, count: int = 20) -> list:
+    """Simula los resultados de una búsqueda: variantes del título esperado y ruido"""
+    song, _, artist = expected.partition(" - ")
+    artist = artist or rng.choice(WORDS).title()
+    variants = [
+        f"{artist} - {song} (Official Audio)",
+        f"{artist} - {song} (Official Video)",
+        f"{song} - {artist} [HD]",
+        f"{artist} - {song} (Lyrics)",
+        f"{song} {artist}",
+        f"{artist} - {song} (Live)",
+        f"{artist} - {song} [Remix]",
+        f"{artist.upper()} - {song.upper()}",
+    ]
+    candidates = []
+    for _ in range(count):
+        title = rng.choice(variants) if rng.random() < 0.7 else random_title(rng)
+        candidates.append((title, rng.randint(120, 420)))
+    return candidates
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT = "Command > "
+# Módulos que no deben importarse hasta que se usen (descargas, Spotify, portapapeles)
+LAZY_MODULES = ("yt_dlp", "spotipy", "pyperclip", "downloader")
+
+
+def _time_to_prompt(extra_args=()) -> tuple:
+    """Arranca main.py y mide cuánto tarda en mostrar el prompt"""
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, *extra_args, "main.py"], cwd=BASE_DIR, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    output = b""
+    while PROMPT.encode() not in output:
+        chunk = os.read(proc.stdout.fileno(), 4096)
+        if not chunk:
+            break
+        output += chunk
+    elapsed = time.perf_counter() - start
+    _, stderr = proc.communicate(b"exit\n", timeout=30)
+    if PROMPT.encode() not in output:
+        raise RuntimeError(f"main.py no llegó al prompt:\n{stderr.decode(errors='replace')}")
+    return elapsed, stderr.decode(errors="replace")
+
+
+def bench_startup(n: int = 5) -> dict:
+    """Tiempo hasta el prompt y desglose de -X importtime
+
+    main.py abre el dispositivo de audio al arrancar; en una máquina sin
+    audio, ejecutar con SDL_AUDIODRIVER=dummy.
+    """
+    times = [_time_to_prompt()[0] for _ in range(n)]
+
+    _, importtime = _time_to_prompt(("-X", "importtime"))
+    imports = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative_us), name[1:].rstrip()))
+    # Solo los módulos importados directamente (sin sangría en la salida)
+    top_level = sorted(
+        ((us, name) for us, name in imports if not name.startswith(" ")),
+        reverse=True
+    )
+
+    loaded = {name.strip() for _, name in imports}
+    return {
+        "prompt_ms_median": statistics.median(times) * 1000,
+        "prompt_ms_min": min(times) * 1000,
+        "top_imports": ", ".join(f"{name} {us / 1000:.1f}ms" for us, name in top_level[:8]),
+        "lazy_modules_loaded": ", ".join(m for m in LAZY_MODULES if m in loaded) or "ninguno",
+    }
+
+
+def bench_confidence(n: int = 10000, seed: int = 0) -> dict:
+    """Compara calculate_confidence (uno a uno) con ConfidenceScorer.score_batch"""
+    from downloader import SmartDownloader
+
+    rng = random.Random(seed)
+    downloader = SmartDownloader.__new__(SmartDownloader)
+    SmartDownloader.__init__(downloader, "Songs")
+    expected = [
+        f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))} - {rng.choice(WORDS).title()}"
+        for _ in range(max(n // 20, 1))
+    ]
+    batches = [(exp, search_candidates(rng, exp)) for exp in expected]
+
+    start = time.perf_counter()
+    reference = [
+        [downloader.calculate_confidence(exp, title, dur) for title, dur in cands]
+        for exp, cands in batches
+    ]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = [downloader.scorer.score_batch(exp, cands) for exp, cands in batches]
+    batch_time = time.perf_counter() - start
+
+    max_diff = max(
+        abs(a - b)
+        for ref, new in zip(reference, batch)
+        for a, b in zip(ref, new)
+    )
+    return {
+        "candidates": sum(len(c) for _, c in batches),
+        "reference_s": reference_time,
+        "batch_s": batch_time,
+        "speedup": reference_time / batch_time if batch_time else float("inf"),
+        "max_diff": max_diff,
+    }
+
+
+def _serve_throttled(data: bytes, bytes_per_second: int):
+    """Servidor HTTP local que entrega `data` a la velocidad indicada (admite Range)"""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start = 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"].split("=")[1].split("-")[0])
+                self.send_response(206)
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(data) - start))
+            self.end_headers()
+            chunk = max(bytes_per_second // 20, 1)
+            for offset in range(start, len(data), chunk):
+                self.wfile.write(data[offset:offset + chunk])
+                time.sleep(0.05)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/audio"
+
+
+def bench_progressive(n: int = 20, speed: float = 2.0) -> dict:
+    """Tiempo hasta el primer audio de Stream frente a esperar la descarga completa
+
+    Sirve n segundos de PCM desde un servidor local a `speed` veces el tiempo
+    real. El PCM ya está en el formato del mezclador, así que el decodificador
+    es `cat` y no hace falta ffmpeg; se usa el driver de audio dummy de SDL.
+    """
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from progressive import GrowingFileReader, ProgressivePlayer, StreamingDownload
+
+    pygame.mixer.init(frequency=44100, size=-16, channels=2)
+    bytes_per_second = 44100 * 2 * 2
+    data = bytes(bytes_per_second * n)
+    server, url = _serve_throttled(data, int(bytes_per_second * speed))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            download = StreamingDownload(url, os.path.join(tmp, "audio.part")).start()
+            player = ProgressivePlayer(GrowingFileReader(download), decoder_cmd=["cat"]).start(start)
+            download.wait()
+            full_download = time.perf_counter() - start
+            player.stop()
+    finally:
+        server.shutdown()
+    return {
+        "audio_seconds": n,
+        "time_to_first_audio_s": player.time_to_first_audio or float("nan"),
+        "full_download_s": full_download,
+        "underruns": player.underruns,
+    }
+
+
+def _child_cpu_seconds() -> float:
+    """CPU de los procesos hijos (ffmpeg); NaN donde no hay resource (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_storage(n: int = 5, seconds: int = 180) -> dict:
+    """Importación con conversión a MP3 frente a guardar el audio original
+
+    Genera n pistas de prueba en Opus/WebM (como las que da YouTube) y mide
+    el tiempo de CPU de ffmpeg y el espacio en disco de cada modo.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("este benchmark necesita ffmpeg en el PATH")
+    from downloader import SmartDownloader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for i in range(n):
+            path = os.path.join(tmp, f"pista{i}.webm")
+            subprocess.run([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "lavfi", "-i", f"sine=frequency={220 + 40 * i}:duration={seconds}",
+                "-ac", "2", "-codec:a", "libopus", "-b:a", "128k", path
+            ], check=True)
+            sources.append(path)
+
+        result = {"tracks": n, "source_mb": sum(map(os.path.getsize, sources)) / 1e6}
+        for mode in ("mp3", "native"):
+            library_dir = os.path.join(tmp, mode)
+            os.makedirs(library_dir)
+            downloader = SmartDownloader.__new__(SmartDownloader)
+            downloader.songs_dir = library_dir
+            downloader.storage_format = mode
+            downloader.native_extensions = ("mp3", "opus", "ogg")
+
+            cpu = _child_cpu_seconds()
+            start = time.perf_counter()
+            for i, source in enumerate(sources):
+                copy = os.path.join(library_dir, f"{i}.src.webm")
+                shutil.copyfile(source, copy)
+                if not downloader.finalize(copy, str(i)):
+                    raise RuntimeError(f"falló el modo {mode}")
+            result[f"{mode}_wall_s"] = time.perf_counter() - start
+            result[f"{mode}_cpu_s"] = _child_cpu_seconds() - cpu
+            result[f"{mode}_mb"] = sum(
+                os.path.getsize(os.path.join(library_dir, f)) for f in os.listdir(library_dir)
+            ) / 1e6
+    return result
+
+
+def make_library(root: str, n_songs: int, n_playlists: int, seed: int = 0) -> None:
+    """Crea una biblioteca sintética en root: Songs/ (archivos vacíos, metadata.json,
+    counter.json) y Lists/ con n_playlists listas de tamaño variable"""
+    from playlist_store import PlaylistStore
+
+    rng = random.Random(seed)
+    songs_dir = os.path.join(root, "Songs")
+    os.makedirs(songs_dir, exist_ok=True)
+    metadata = {}
+    for i in range(1, n_songs + 1):
+        open(os.path.join(songs_dir, f"{i}.mp3"), "wb").close()
+        metadata[str(i)] = {
+            "title": random_title(rng),
+            "added_date": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(1.6e9 + i * 3600)),
+        }
+    with open(os.path.join(songs_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(songs_dir, "counter.json"), "w") as f:
+        json.dump({"next_id": n_songs + 1}, f)
+
+    lists_dir = os.path.join(root, "Lists")
+    os.makedirs(lists_dir, exist_ok=True)
+    store = PlaylistStore(lists_dir)
+    ids = list(metadata)
+    for i in range(n_playlists):
+        size = min(len(ids), rng.randint(10, 500))
+        store.create(f"Lista {i + 1}", rng.sample(ids, size))
+
+
+class _NullMusic:
+    """Backend de reproducción que no hace nada (solo se mide la lógica del reproductor)"""
+
+    def set_volume(self, volume): pass
+    def set_end_callback(self, callback): pass
+    def load(self, path): pass
+    def queue(self, path): pass
+    def play(self): pass
+    def stop(self): pass
+    def unload(self): pass
+    def get_busy(self): return False
+
+
+def _per_call_us(func, calls: int, rounds: int = 5) -> float:
+    """Tiempo por llamada en la mejor de varias rondas de calls // rounds llamadas"""
+    per_round = max(calls // rounds, 1)
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(per_round):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / per_round * 1e6
+
+
+def _best_ms(func, repeat: int = 5) -> float:
+    """Mejor de varias ejecuciones (las operaciones sueltas tienen mucho ruido)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def _hotpaths_at(n: int, seed: int) -> dict:
+    import main
+    import scoring
+    from catalog import SongCatalog
+    from downloader import SmartDownloader
+
+    rng = random.Random(seed)
+    result = {}
+    root = tempfile.mkdtemp(prefix="pymusic-bench-")
+    try:
+        make_library(root, n, max(n // 100, 5), seed)
+        songs_dir = os.path.join(root, "Songs")
+
+        # Lectura de metadatos: migración desde metadata.json y apertura normal
+        start = time.perf_counter()
+        SongCatalog(songs_dir).close()
+        result["catalog_migrate_ms"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        catalog = SongCatalog(songs_dir)
+        result["catalog_open_ms"] = (time.perf_counter() - start) * 1000
+
+        # Escritura de metadatos: altas sueltas y en lote
+        ids = [catalog.next_song_id() for _ in range(200)]
+        start = time.perf_counter()
+        for song_id in ids[:100]:
+            catalog.add(song_id, random_title(rng))
+        result["metadata_write_us"] = (time.perf_counter() - start) / 100 * 1e6
+        start = time.perf_counter()
+        with catalog.batch():
+            for song_id in ids[100:]:
+                catalog.add(song_id, random_title(rng))
+        result["metadata_batch_write_us"] = (time.perf_counter() - start) / 100 * 1e6
+        catalog.close()
+
+        downloader = SmartDownloader(songs_dir)
+        titles = [random_title(rng) for _ in range(200)]
+        # clean_title está memorizado (lru_cache): cada llamada usa títulos que
+        # no se han visto antes para medir el cálculo y no un acierto de caché
+        scoring.clean_title.cache_clear()
+        fresh = iter([f"{random_title(rng)} {i}" for i in range(6000)])
+        result["clean_title_us"] = _per_call_us(lambda: downloader.clean_title(next(fresh)), 2000)
+        result["calculate_confidence_us"] = _per_call_us(
+            lambda: downloader.calculate_confidence(next(fresh), next(fresh), 200), 2000
+        )
+
+        main.BASE_DIR = root
+        with redirect_stdout(io.StringIO()):
+            player = main.MusicPlayer(_NullMusic())
+            try:
+                # Aleatorio de una lista con toda la biblioteca
+                all_ids = [str(i) for i in range(1, n + 1)]
+                player.current_playlist = list(all_ids)
+                player.current_playlist_id = None
+                result["play_next_song_us"] = _per_call_us(player.play_next_song, 500)
+                player.stop_playback()
+
+                sample = rng.sample(all_ids, min(n, 50))
+                result["edit_playlist_ms"] = _best_ms(
+                    lambda: (player.edit_playlist("1", "add", *sample),
+                             player.edit_playlist("1", "remove", *sample))
+                ) / 2
+                # Cada repetición borra canciones distintas (las ya quitadas no cuestan nada)
+                result["remove_song_from_playlists_ms"] = _best_ms(
+                    lambda: player.remove_song_from_playlists(*rng.sample(all_ids, 10))
+                )
+                result["show_songs_ms"] = _best_ms(player.show_songs)
+
+                # El primer borrado de una sesión carga el índice inverso: sin
+                # índice guardado se leen todas las listas; con él, solo las que cambiaron
+                from playlist_store import PlaylistStore
+                for key, saved in (("remove_song_first_rebuild_ms", False), ("remove_song_first_ms", True)):
+                    if not saved:
+                        os.remove(os.path.join(player.lists_dir, PlaylistStore.INDEX_FILE))
+                    store = PlaylistStore(player.lists_dir)
+                    start = time.perf_counter()
+                    store.remove_songs_everywhere(rng.sample(all_ids, 10))
+                    result[key] = (time.perf_counter() - start) * 1000
+                    store.close()
+
+                start = time.perf_counter()
+                player.find_songs(*rng.choice(titles).split()[:2])
+                result["find_first_ms"] = (time.perf_counter() - start) * 1000
+                result["find_us"] = _per_call_us(lambda: player.find_songs(rng.choice(WORDS)), 200)
+            finally:
+                player.catalog.close()
+                player.library.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return result
+
+
+def bench_hotpaths(n: int = 1000, seed: int = 0, scales=None) -> dict:
+    """Caminos calientes de la biblioteca sobre bibliotecas sintéticas de varios tamaños"""
+    result = {}
+    for scale in scales or (n,):
+        for key, value in _hotpaths_at(scale, seed).items():
+            result[f"{scale}.{key}"] = value
+    return result
+
+
+class _StandInSpotify:
+    """Sustituto local de la API de Spotify: cuenta las llamadas y simula la latencia"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def _track(self, track_id: str) -> dict:
+        return {"id": track_id, "name": f"Track {track_id}", "artists": [{"name": "Artist"}],
+                "album": {"name": "Album"}, "external_ids": {"isrc": f"ISRC{track_id}"}}
+
+    def track(self, track_id: str) -> dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._track(track_id)
+
+    def tracks(self, track_ids: list) -> dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"tracks": [self._track(track_id) for track_id in track_ids]}
+
+
+def bench_spotify(n: int = 500, latency: float = 0.005) -> dict:
+    """Llamadas a la API y tiempo para los datos de n pistas: una a una, por lotes y con caché"""
+    from spotify_tracks import SpotifyMetadata
+
+    ids = [f"{i:022d}" for i in range(n)]
+    api = _StandInSpotify(latency)
+    start = time.perf_counter()
+    for track_id in ids:
+        api.track(track_id)
+    result = {"one_by_one_calls": api.calls, "one_by_one_s": time.perf_counter() - start}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api = _StandInSpotify(latency)
+        metadata = SpotifyMetadata(api, os.path.join(tmp, "spotify_cache.db"))
+        start = time.perf_counter()
+        metadata.tracks(ids)
+        result.update(batched_calls=api.calls, batched_s=time.perf_counter() - start)
+        start = time.perf_counter()
+        metadata.tracks(ids)
+        result.update(cached_calls=api.calls - result["batched_calls"], cached_s=time.perf_counter() - start)
+        metadata.close()
+    return result
+
+
+# Sufijos de las métricas de tiempo (menos es mejor): las que compara --compare
+TIME_SUFFIXES = ("_s", "_ms", "_us")
+
+
+def compare_results(baseline: dict, result: dict, tolerance: float) -> list:
+    """Métricas de tiempo que empeoran más de `tolerance` (0.2 = 20 %) respecto a la base"""
+    regressions = []
+    for key, value in result.items():
+        old = baseline.get(key)
+        if not key.endswith(TIME_SUFFIXES) or not isinstance(old, (int, float)) or old <= 0:
+            continue
+        if value > old * (1 + tolerance):
+            regressions.append((key, old, value))
+    return regressions
+
+
+BENCHMARKS = {
+    "confidence": bench_confidence,
+    "hotpaths": bench_hotpaths,
+    "storage": bench_storage,
+    "progressive": bench_progressive,
+    "spotify": bench_spotify,
+    "startup": bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de PyMusic")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("-n", type=int, help="tamaño del benchmark (cada uno tiene su valor por defecto)")
+    parser.add_argument("--scales", help="hotpaths: tamaños de biblioteca separados por comas (1000,10000,100000)")
+    parser.add_argument("--save", metavar="JSON", help="guarda el resultado como línea base en este archivo")
+    parser.add_argument("--compare", metavar="JSON", help="compara con una línea base guardada con --save")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="empeoramiento permitido al comparar (0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    bench = BENCHMARKS[args.name]
+    kwargs = {"n": args.n} if args.n else {}
+    if args.scales:
+        if args.name != "hotpaths":
+            parser.error("--scales solo se aplica a hotpaths")
+        kwargs["scales"] = [int(scale) for scale in args.scales.split(",")]
+    result = bench(**kwargs)
+    for key, value in result.items():
+        if isinstance(value, float):
+            print(f"{key:>36}: {value:.4f}")
+        else:
+            print(f"{key:>36}: {value}")
+
+    # Las líneas base de cada benchmark se guardan juntas en el mismo archivo
+    if args.save:
+        saved = {}
+        if os.path.exists(args.save):
+            with open(args.save, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        saved[args.name] = result
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get(args.name, {})
+        regressions = compare_results(baseline, result, args.tolerance)
+        for key, old, new in regressions:
+            print(f"REGRESIÓN: {key} {old:.4f} -> {new:.4f} (+{(new / old - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"Sin regresiones respecto a {args.compare}")
+
+    # Las librerías pesadas deben cargarse al usarse, no al arrancar
+    if args.name == "startup" and result["lazy_modules_loaded"] != "ninguno":
+        print("REGRESIÓN: se importan al arrancar módulos que deberían ser perezosos")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
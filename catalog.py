@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Resultado del análisis de audio (ver analysis.py): columna -> tipo SQL
+ANALYSIS_COLUMNS = {
+    "duration": "REAL",
+    "bitrate": "INTEGER",
+    "loudness": "REAL",
+    "gain_db": "REAL",
+    "file_mtime": "REAL",
+    "file_size": "INTEGER",
+}
+
+
+class SongCatalog:
+    """Catálogo persistente de canciones indexado por song_id (SQLite en modo WAL)
+
+    Los IDs numéricos se reservan por bloques: solo se escribe en disco al
+    empezar un bloque nuevo. Si el programa se cierra de golpe, el resto del
+    bloque se salta, pero nunca se reutiliza un ID ya entregado.
+    """
+
+    ID_BLOCK_SIZE = 32
+    BATCH_FLUSH_EVERY = 64
+
+    def __init__(self, songs_dir: str, db_path: Optional[str] = None):
+        self.songs_dir = songs_dir
+        self.db_path = db_path or os.path.join(songs_dir, "catalog.db")
+        self.metadata_file = os.path.join(songs_dir, "metadata.json")
+        self.counter_file = os.path.join(songs_dir, "counter.json")
+        self._lock = threading.RLock()
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS songs ("
+            " song_id TEXT PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " added_date TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS shuffle_state ("
+            " playlist_id TEXT PRIMARY KEY,"
+            " song_order TEXT NOT NULL,"
+            " cursor INTEGER NOT NULL)"
+        )
+        # De dónde salió cada canción: ('youtube', id), ('spotify', id), ('isrc', código)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " source TEXT NOT NULL,"
+            " source_id TEXT NOT NULL,"
+            " song_id TEXT NOT NULL,"
+            " PRIMARY KEY (source, source_id))"
+        )
+        self._ensure_column("songs", "play_count", "INTEGER NOT NULL DEFAULT 0")
+        self._ensure_column("songs", "last_played", "REAL")
+        # Formato del archivo guardado: extensión ('mp3', 'opus'...) y códec
+        self._ensure_column("songs", "ext", "TEXT")
+        self._ensure_column("songs", "codec", "TEXT")
+        for column, definition in ANALYSIS_COLUMNS.items():
+            self._ensure_column("songs", column, definition)
+        self.conn.commit()
+
+        if self._get_meta("migrated") is None:
+            self._migrate_json()
+
+        # Índice en memoria: se carga una sola vez y se mantiene al día
+        self._songs: Dict[str, Dict] = {}
+        columns = ["title", "added_date", "play_count", "last_played", "ext", "codec", *ANALYSIS_COLUMNS]
+        for row in self.conn.execute(f"SELECT song_id, {', '.join(columns)} FROM songs"):
+            self._songs[row[0]] = dict(zip(columns, row[1:]))
+        self._sources: Dict[Tuple[str, str], str] = {
+            (source, source_id): song_id
+            for source, source_id, song_id in self.conn.execute(
+                "SELECT source, source_id, song_id FROM sources"
+            )
+        }
+        self._next_id = int(self._get_meta("next_id") or 1)
+        self._block_end = self._next_id  # Aún no hay ningún bloque reservado
+
+        # Escritura diferida durante importaciones (ver batch())
+        self._batch_depth = 0
+        self._pending: List[Tuple[str, str, str, Optional[str], Optional[str]]] = []
+        self._pending_sources: List[Tuple[str, str, str]] = []
+        self._pending_analysis: List[tuple] = []
+
+    def _ensure_column(self, table: str, column: str, definition: str) -> None:
+        """Añade una columna a un catálogo creado con una versión anterior"""
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def _migrate_json(self) -> None:
+        """Importa metadata.json y counter.json la primera vez que se crea el catálogo"""
+        metadata = {}
+        if os.path.exists(self.metadata_file):
+            try:
+                with open(self.metadata_file, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except Exception as e:
+                print(f"Advertencia: no se pudo leer metadata.json para migrar: {e}")
+
+        next_id = 1
+        if os.path.exists(self.counter_file):
+            try:
+                with open(self.counter_file, "r") as f:
+                    next_id = int(json.load(f).get("next_id", 1))
+            except Exception as e:
+                print(f"Advertencia: no se pudo leer counter.json para migrar: {e}")
+
+        # Nunca reutilizar un ID numérico que ya exista en los metadatos
+        numeric_ids = [int(s) for s in metadata if s.isdigit()]
+        if numeric_ids:
+            next_id = max(next_id, max(numeric_ids) + 1)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO songs (song_id, title, added_date) VALUES (?, ?, ?)",
+                [
+                    (song_id, info.get("title", f"Canción {song_id}"), info.get("added_date"))
+                    for song_id, info in metadata.items()
+                ],
+            )
+            self._set_meta("next_id", next_id)
+            self._set_meta("migrated", time.strftime("%Y-%m-%d %H:%M:%S"))
+
+    def __contains__(self, song_id: str) -> bool:
+        return song_id in self._songs
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    def get(self, song_id: str) -> Optional[Dict]:
+        """Devuelve los metadatos de una canción o None si no está en el catálogo"""
+        return self._songs.get(song_id)
+
+    def get_title(self, song_id: str) -> str:
+        song = self._songs.get(song_id)
+        if song:
+            return song.get("title") or f"Canción {song_id}"
+        return f"Canción {song_id}"
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return iter(list(self._songs.items()))
+
+    def add(self, song_id: str, title: str, added_date: Optional[str] = None,
+            ext: Optional[str] = None, codec: Optional[str] = None) -> None:
+        """Inserta o actualiza una canción (ext/codec vacíos conservan los anteriores)"""
+        added_date = added_date or time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            song = self._songs.setdefault(
+                song_id, {"play_count": 0, "last_played": None, "ext": None, "codec": None}
+            )
+            song.update(title=title, added_date=added_date)
+            if ext:
+                song.update(ext=ext, codec=codec)
+            self._pending.append((song_id, title, added_date, ext, codec))
+            self._maybe_flush()
+
+    def add_sources(self, song_id: str, sources: Dict[str, Optional[str]]) -> None:
+        """Registra los IDs de origen de una canción (se ignoran los vacíos)"""
+        with self._lock:
+            for source, source_id in sources.items():
+                if source_id:
+                    self._sources[(source, source_id)] = song_id
+                    self._pending_sources.append((source, source_id, song_id))
+            self._maybe_flush()
+
+    def find_source(self, sources: Dict[str, Optional[str]]) -> Optional[str]:
+        """Devuelve el song_id de la primera fuente conocida, o None"""
+        for source, source_id in sources.items():
+            if source_id:
+                song_id = self._sources.get((source, source_id))
+                if song_id is not None:
+                    return song_id
+        return None
+
+    def _maybe_flush(self) -> None:
+        pending = len(self._pending) + len(self._pending_sources) + len(self._pending_analysis)
+        if self._batch_depth == 0 or pending >= self.BATCH_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        """Escribe las altas pendientes en una sola transacción"""
+        with self._lock:
+            if not self._pending and not self._pending_sources and not self._pending_analysis:
+                return
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO songs (song_id, title, added_date, ext, codec) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(song_id) DO UPDATE SET "
+                    "title = excluded.title, added_date = excluded.added_date, "
+                    "ext = COALESCE(excluded.ext, songs.ext), "
+                    "codec = COALESCE(excluded.codec, songs.codec)",
+                    self._pending,
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sources (source, source_id, song_id) VALUES (?, ?, ?)",
+                    self._pending_sources,
+                )
+                self.conn.executemany(
+                    f"UPDATE songs SET {', '.join(f'{key} = ?' for key in ANALYSIS_COLUMNS)} "
+                    "WHERE song_id = ?",
+                    self._pending_analysis,
+                )
+            self._pending = []
+            self._pending_sources = []
+            self._pending_analysis = []
+
+    @contextmanager
+    def batch(self):
+        """Agrupa las altas de una importación: se escriben juntas al salir
+
+        Dentro del bloque el índice en memoria se actualiza al momento; el
+        disco se actualiza cada BATCH_FLUSH_EVERY canciones y al terminar.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def set_analysis(self, song_id: str, info: Dict) -> None:
+        """Guarda duración, bitrate, sonoridad... de una canción ya analizada"""
+        fields = {key: info.get(key) for key in ANALYSIS_COLUMNS}
+        with self._lock:
+            song = self._songs.get(song_id)
+            if song is None:
+                # Archivo sin entrada en el catálogo: darlo de alta con el título por defecto
+                self.add(song_id, f"Canción {song_id}", ext=info.get("ext"), codec=info.get("codec"))
+                song = self._songs[song_id]
+            song.update(fields)
+            self._pending_analysis.append((*fields.values(), song_id))
+            self._maybe_flush()
+
+    def remove(self, song_id: str) -> bool:
+        """Elimina una canción (y sus fuentes) del catálogo. Devuelve True si existía"""
+        with self._lock:
+            self.flush()
+            with self.conn:
+                self.conn.execute("DELETE FROM songs WHERE song_id = ?", (song_id,))
+                self.conn.execute("DELETE FROM sources WHERE song_id = ?", (song_id,))
+            if song_id in self._sources.values():
+                self._sources = {key: value for key, value in self._sources.items() if value != song_id}
+            return self._songs.pop(song_id, None) is not None
+
+    def record_play(self, song_id: str) -> None:
+        """Suma una reproducción y guarda cuándo fue (para el aleatorio ponderado)"""
+        now = time.time()
+        with self._lock:
+            song = self._songs.get(song_id)
+            if song is None:
+                return
+            self.flush()
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE songs SET play_count = play_count + 1, last_played = ? WHERE song_id = ?",
+                    (now, song_id),
+                )
+            song["play_count"] = (song.get("play_count") or 0) + 1
+            song["last_played"] = now
+
+    def load_shuffle(self, playlist_id: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT song_order, cursor FROM shuffle_state WHERE playlist_id = ?", (playlist_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"order": json.loads(row[0]), "cursor": row[1]}
+
+    def save_shuffle(self, playlist_id: str, state: Dict) -> None:
+        """Guarda la permutación completa (una vez por pasada) y el cursor"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shuffle_state (playlist_id, song_order, cursor) VALUES (?, ?, ?)",
+                (playlist_id, json.dumps(state["order"]), state["cursor"]),
+            )
+
+    def save_shuffle_cursor(self, playlist_id: str, cursor: int) -> None:
+        """Actualiza solo el cursor: una escritura pequeña por canción"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE shuffle_state SET cursor = ? WHERE playlist_id = ?", (cursor, playlist_id)
+            )
+
+    def next_song_id(self, exists: Optional[Callable[[str], bool]] = None) -> str:
+        """Reserva y devuelve el siguiente ID de canción disponible
+
+        exists(song_id) dice si ya hay un archivo con ese ID; esos IDs (y los
+        que ya están en el catálogo) se saltan, que guardar encima con
+        os.replace borraría la canción anterior sin avisar.
+        """
+        with self._lock:
+            while True:
+                if self._next_id >= self._block_end:
+                    self._reserve_block()
+                song_id = str(self._next_id)
+                self._next_id += 1
+                if song_id not in self._songs and not (exists and exists(song_id)):
+                    return song_id
+
+    def _reserve_block(self) -> None:
+        """Reserva un bloque nuevo antes de entregar ninguno de sus IDs
+
+        Con synchronous=NORMAL un corte de luz puede deshacer el último commit
+        en WAL y volver a entregar IDs ya usados; esta escritura va con FULL.
+        """
+        self._block_end = self._next_id + self.ID_BLOCK_SIZE
+        self.conn.execute("PRAGMA synchronous=FULL")
+        try:
+            with self.conn:
+                self._set_meta("next_id", self._block_end)
+        finally:
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            # Al cerrar bien se devuelven los IDs del bloque que no se usaron
+            with self.conn:
+                self._set_meta("next_id", self._next_id)
+            self._block_end = self._next_id
+            self.conn.close()
@@ -3,4 +3,32 @@ SPOTIFY_CLIENT_ID = "PUT YOUR SPOTIFY CLIENT ID HERE"
 SPOTIFY_CLIENT_SECRET = "PUT YOUR SPOTIFY CLIENT SECRET HERE"
 
 # Configuración del reproductor
-DEFAULT_VOLUME = 2.0  # Volumen por defecto (0.0 a 3.0) 
\ No newline at end of file
+DEFAULT_VOLUME = 2.0  # Volumen por defecto (0.0 a 3.0) 
+# Motor de reproducción: "music" (pygame.mixer.music, decodifica al vuelo),
+# "predecode" (decodifica la siguiente canción mientras suena la actual) o
+# "mpv" (un único proceso mpv controlado por IPC, necesita mpv instalado)
+PLAYBACK_ENGINE = "music"
+CROSSFADE_MS = 0  # Fundido entre canciones en milisegundos (solo "predecode")
+PREDECODE_MAX_MB = 256  # Memoria máxima para las canciones decodificadas
+
+# Aleatorio ponderado: None (uniforme), "play_count" (las menos escuchadas antes)
+# o "recency" (las que hace más tiempo que no suenan antes)
+SHUFFLE_WEIGHTING = None
+
+# Descargas en segundo plano: cuántos trabajos (descargas/importaciones) a la vez
+MAX_DOWNLOAD_JOBS = 2
+
+# Formato de la biblioteca: "mp3" (todo se convierte a MP3 192k) o "native"
+# (se guarda el audio original sin recodificar: Opus/Vorbis con pygame,
+# cualquier formato con el motor mpv)
+STORAGE_FORMAT = "mp3"
+
+# Normalización de sonoridad: ajusta el volumen de cada canción según su
+# ganancia medida con Analyze (referencia -18 LUFS). Con pygame el volumen
+# no pasa del 100%, así que solo se bajan las canciones fuertes
+NORMALIZE_LOUDNESS = True
+
+# Medición de tiempos por comando y etapa de descarga (comando Stats).
+# TIMINGS_LOG: ruta de un archivo JSONL donde añadir cada medida (None = no guardar)
+TIMINGS_ENABLED = True
+TIMINGS_LOG = None
@@ -0,0 +1,53 @@
+import os
+import mmap
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+# Tamaño de cada bloque que se pasa al hash
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str, limit: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> str:
+    """Hash BLAKE2b del archivo (o de sus primeros `limit` bytes)
+
+    El archivo se mapea en memoria y se recorre por bloques, así no se copia
+    entero a un buffer de Python ni se hace una lectura por bloque.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if limit is None else min(size, limit)
+        if end == 0:
+            return hasher.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(0, end, chunk_size):
+                    hasher.update(view[start:min(start + chunk_size, end)])
+            finally:
+                view.release()
+    return hasher.hexdigest()
+
+
+def _group(paths: Iterable[str], key) -> List[List[str]]:
+    groups: Dict[object, List[str]] = {}
+    for path in paths:
+        try:
+            groups.setdefault(key(path), []).append(path)
+        except OSError as e:
+            print(f"No se pudo leer {path}: {e}")
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(paths: Iterable[str], chunk_size: int = CHUNK_SIZE) -> List[List[str]]:
+    """Agrupa los archivos con contenido idéntico
+
+    Se filtra por etapas de coste creciente: primero el tamaño, después el
+    hash del primer bloque y solo para los que siguen empatados el hash
+    completo. Devuelve los grupos de 2 o más archivos, ordenados.
+    """
+    duplicates = []
+    for same_size in _group(paths, os.path.getsize):
+        for same_head in _group(same_size, lambda p: file_digest(p, limit=chunk_size, chunk_size=chunk_size)):
+            duplicates.extend(_group(same_head, lambda p: file_digest(p, chunk_size=chunk_size)))
+    return sorted(sorted(group) for group in duplicates)
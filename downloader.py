@@ -1,23 +1,53 @@
 import os
 import json
 import time
-import re
 import difflib
-from typing import List, Dict, Optional, Tuple
-import yt_dlp
+import subprocess
+from typing import Callable, List, Dict, Optional, Tuple, Union
+from search_cache import SearchCache
+from scoring import ConfidenceScorer, clean_title
+from library import PYGAME_EXTENSIONS, find_song_file
+from timing import Timings
+from ytdl_pool import DOWNLOAD_PROFILE, SEARCH_OPTS, SEARCH_PROFILE, STREAM_OPTS, STREAM_PROFILE, YoutubeDLPool
 
 class SmartDownloader:
-    def __init__(self, songs_dir: str):
+    def __init__(self, songs_dir: str, search_cache: Optional[SearchCache] = None, bypass_cache: bool = False,
+                 source_lookup: Optional[Callable[[str], Optional[str]]] = None,
+                 storage_format: str = "mp3", native_extensions: Tuple[str, ...] = PYGAME_EXTENSIONS,
+                 timings: Optional[Timings] = None, pool_size: Union[int, Dict[str, int]] = 2):
         self.songs_dir = songs_dir
+        # Tiempos de cada etapa (search, fetch, postprocess, rename) para Stats
+        self.timings = timings or Timings(enabled=False)
+        # YoutubeDL reutilizables (extractores cargados y conexiones abiertas) para
+        # buscar, descargar y Stream; lo comparten todos los trabajos
+        self.ydl_pool = YoutubeDLPool({
+            SEARCH_PROFILE: lambda: SEARCH_OPTS,
+            DOWNLOAD_PROFILE: self.fetch_opts,
+            STREAM_PROFILE: lambda: STREAM_OPTS,
+        }, max_per_profile=pool_size)
+        # "mp3": todo se convierte a MP3 192k; "native": se guarda el audio original
+        # (sin recodificar) si el motor de reproducción puede abrir su formato
+        self.storage_format = storage_format
+        self.native_extensions = native_extensions
+        # video_id de YouTube -> song_id local si ya se descargó antes
+        self.source_lookup = source_lookup
+        # Caché de búsquedas para no repetir consultas al reimportar playlists
+        self.search_cache = search_cache or SearchCache(os.path.join(songs_dir, "search_cache.db"))
+        self.bypass_cache = bypass_cache
         self.exclude_keywords = [
             "review", "rework", "podcast", "interview", "live", "cover",
             "neuro", "evil", "neurofunk", "neurohop", "neurobass", "neurodub",
             "remix", "bootleg", "mashup", "edit", "flip", "flipped",
             "flipz", "flipzter", "bootleg", "bootlegged", "bootleggers"
         ]
+        self.scorer = ConfidenceScorer(self.exclude_keywords)
         
     def calculate_confidence(self, expected_title: str, result_title: str, duration: int) -> int:
-        """Calcula la puntuación de confianza para un resultado de búsqueda"""
+        """Calcula la puntuación de confianza para un resultado de búsqueda
+
+        Implementación de referencia; las búsquedas usan self.scorer.score_batch,
+        que da el mismo resultado para todos los candidatos de una vez.
+        """
         confidence = 100
         
         # Excluir resultados con palabras clave no deseadas
@@ -65,88 +95,193 @@ class SmartDownloader:
     
     def clean_title(self, title: str) -> str:
         """Limpia el título eliminando caracteres especiales y texto extra"""
-        title = re.sub(r'\([^)]*\)', '', title)
-        title = re.sub(r'\[[^\]]*\]', '', title)
-        title = re.sub(r'[^\w\s-]', '', title)
-        title = re.sub(r'\s+', ' ', title).strip()
-        return title
+        return clean_title(title)
     
-    def search_with_confidence(self, search_query: str, expected_title: str, max_results: int = 10) -> List[Dict]:
-        """Busca videos con sistema de confianza"""
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-            'default_search': 'ytsearch',  # Asegurar que siempre busque en YouTube
-        }
+    def search_entries(self, search_query: str, count: int, bypass_cache: Optional[bool] = None) -> Optional[List[Dict]]:
+        """Devuelve los resultados planos de YouTube, usando la caché si se puede"""
+        bypass = self.bypass_cache if bypass_cache is None else bypass_cache
+        cache_key = f"ytsearch{count}:{search_query}"
+        if not bypass:
+            cached = self.search_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        with self.timings.measure("download.search"), self.ydl_pool.session(SEARCH_PROFILE) as ydl:
+            search_results = ydl.extract_info(cache_key, download=False)
+        
+        if not search_results or 'entries' not in search_results:
+            return None
         
+        entries = [video for video in search_results['entries'] if video]
+        self.search_cache.put(cache_key, entries)
+        return entries
+
+    def search_with_confidence(self, search_query: str, expected_title: str, max_results: int = 10,
+                               bypass_cache: Optional[bool] = None) -> List[Dict]:
+        """Busca videos con sistema de confianza"""
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Aumentar el número de resultados para tener más opciones
-                search_results = ydl.extract_info(f"ytsearch{max_results*2}:{search_query}", download=False)
-                
-                if not search_results or 'entries' not in search_results:
-                    return []
-                
-                results_with_confidence = []
-                
-                for video in search_results['entries']:
-                    if not video:
-                        continue
-                    
-                    title = video.get('title', '')
-                    duration = int(video.get('duration', 0))
-                    video_id = video.get('id', '')
-                    
-                    # Saltar videos sin ID o título
-                    if not video_id or not title:
-                        continue
-                    
-                    # Calcular confianza
-                    confidence = self.calculate_confidence(expected_title, title, duration)
-                    
-                    if confidence > 0:
-                        results_with_confidence.append({
-                            'title': title,
-                            'video_id': video_id,
-                            'duration': duration,
-                            'confidence': confidence,
-                            'url': f"https://www.youtube.com/watch?v={video_id}"
-                        })
-                
-                # Ordenar por confianza y tomar los mejores resultados
-                results_with_confidence.sort(key=lambda x: x['confidence'], reverse=True)
-                return results_with_confidence[:max_results]  # Devolver solo los mejores resultados
-                
+            # Aumentar el número de resultados para tener más opciones
+            entries = self.search_entries(search_query, max_results * 2, bypass_cache)
+            
+            if not entries:
+                return []
+            
+            # Saltar videos sin ID o título
+            videos = [
+                video for video in entries
+                if video and video.get('id') and video.get('title')
+            ]
+            
+            # Calcular la confianza de todos los candidatos de una vez
+            scores = self.scorer.score_batch(
+                expected_title,
+                [(video['title'], int(video.get('duration') or 0)) for video in videos]
+            )
+            
+            results_with_confidence = []
+            for video, confidence in zip(videos, scores):
+                if confidence > 0:
+                    results_with_confidence.append({
+                        'title': video['title'],
+                        'video_id': video['id'],
+                        'duration': int(video.get('duration') or 0),
+                        'confidence': confidence,
+                        'url': f"https://www.youtube.com/watch?v={video['id']}"
+                    })
+            
+            # Ordenar por confianza y tomar los mejores resultados
+            results_with_confidence.sort(key=lambda x: x['confidence'], reverse=True)
+            return results_with_confidence[:max_results]  # Devolver solo los mejores resultados
+            
         except Exception as e:
             print(f"Error en búsqueda: {e}")
             return []
     
+    def existing_song(self, video_id: str) -> Optional[str]:
+        """song_id local de un video ya descargado, o None"""
+        if self.source_lookup:
+            return self.source_lookup(video_id)
+        if find_song_file(self.songs_dir, video_id):
+            return video_id
+        return None
+
     def download_video(self, video_info: Dict) -> Optional[str]:
         """Descarga un video usando su información"""
+        existing = self.existing_song(video_info['video_id'])
+        if existing:
+            print(f"Ya descargada como {existing}: {video_info['title']}")
+            return existing
+        source_path = self.fetch_audio(video_info)
+        if not source_path:
+            return None
+        return self.finalize(source_path, video_info['video_id'])
+
+    def fetch_opts(self) -> Dict:
+        """Opciones de yt-dlp para bajar solo el audio original
+
+        El nombre depende solo del ID del video, así una descarga interrumpida
+        se continúa desde su archivo .part en lugar de empezar de cero. En modo
+        nativo se prefiere Opus, que se puede guardar tal cual.
+        """
+        if self.storage_format == "native":
+            audio_format = 'bestaudio[acodec=opus]/bestaudio[acodec=vorbis]/bestaudio/best'
+        else:
+            audio_format = 'bestaudio/best'
+        return {
+            'format': audio_format,
+            'outtmpl': os.path.join(self.songs_dir, '%(id)s.src.%(ext)s'),
+            'continuedl': True,
+            'nopart': False,
+            'quiet': True,
+            'no_warnings': True,
+        }
+
+    def fetch_audio(self, video_info: Dict) -> Optional[str]:
+        """Descarga solo el audio original, sin convertir. Devuelve la ruta del archivo"""
         try:
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': os.path.join(self.songs_dir, '%(id)s.%(ext)s'),
-                'quiet': True,
-                'no_warnings': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_info['url']])
-                return video_info['video_id']
-                
+            with self.timings.measure("download.fetch"), self.ydl_pool.session(DOWNLOAD_PROFILE) as ydl:
+                info = ydl.extract_info(video_info['url'], download=True)
+                return ydl.prepare_filename(info)
+
         except Exception as e:
-            print(f"Error al descargar video: {e}")
+            print(f"Error al descargar audio: {e}")
             return None
-    
-    def download_by_name(self, song_name: str, artist_name: str = "", album_name: str = "") -> Optional[str]:
-        """Descarga una canción por nombre usando el sistema de confianza"""
+
+    def finalize(self, source_path: str, song_id: str) -> Optional[str]:
+        """Guarda el audio descargado en la biblioteca como <song_id>.<ext>"""
+        if self.storage_format == "native":
+            return self.store_native(source_path, song_id)
+        return self.transcode_to_mp3(source_path, song_id)
+
+    def store_native(self, source_path: str, song_id: str) -> Optional[str]:
+        """Guarda el audio sin recodificar
+
+        Si el motor puede abrir el contenedor se renombra sin más; el Opus en
+        WebM se remultiplexa a .opus (copia del flujo, sin decodificar). Solo
+        si el formato no se puede reproducir se cae a la conversión a MP3.
+        """
+        ext = source_path.rsplit(".", 1)[-1].lower()
+        if ext in self.native_extensions:
+            with self.timings.measure("download.rename"):
+                os.replace(source_path, os.path.join(self.songs_dir, f"{song_id}.{ext}"))
+            return song_id
+        if ext == "webm" and "opus" in self.native_extensions:
+            target_path = os.path.join(self.songs_dir, f"{song_id}.opus")
+            tmp_path = target_path + ".part"
+            try:
+                with self.timings.measure("download.postprocess"):
+                    subprocess.run([
+                        "ffmpeg", "-y", "-loglevel", "error",
+                        "-i", source_path,
+                        "-vn", "-codec:a", "copy",
+                        "-f", "opus", tmp_path
+                    ], check=True, stdin=subprocess.DEVNULL)
+                with self.timings.measure("download.rename"):
+                    os.replace(tmp_path, target_path)
+                    os.remove(source_path)
+                return song_id
+            except Exception as e:
+                print(f"No se pudo remultiplexar {source_path}, se convierte a MP3: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        return self.transcode_to_mp3(source_path, song_id)
+
+    def transcode_to_mp3(self, source_path: str, video_id: str) -> Optional[str]:
+        """Convierte el audio descargado a MP3 con ffmpeg y borra el original
+
+        Se escribe en un archivo temporal y se renombra al terminar: un MP3
+        a medias nunca queda con su nombre definitivo.
+        """
+        target_path = os.path.join(self.songs_dir, f"{video_id}.mp3")
+        tmp_path = target_path + ".part"
+        try:
+            with self.timings.measure("download.postprocess"):
+                subprocess.run([
+                    "ffmpeg", "-y", "-loglevel", "error",
+                    "-i", source_path,
+                    "-vn", "-codec:a", "libmp3lame", "-b:a", "192k",
+                    "-f", "mp3", tmp_path
+                ], check=True, stdin=subprocess.DEVNULL)
+            with self.timings.measure("download.rename"):
+                os.replace(tmp_path, target_path)
+                os.remove(source_path)
+            return video_id
+        except Exception as e:
+            print(f"Error al convertir audio: {e}")
+            for path in (source_path, tmp_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return None
+
+    def close(self) -> None:
+        self.ydl_pool.close()
+
+    def build_search(self, song_name: str, artist_name: str = "", album_name: str = "") -> Tuple[str, str]:
+        """Construye la consulta de búsqueda y el título esperado"""
         if artist_name:
             search_query = f"{song_name} {artist_name}"
             expected_title = f"{song_name} - {artist_name}"
@@ -158,12 +293,26 @@ class SmartDownloader:
             search_query += f" {album_name}"
         
         search_query += " official audio"
-        
+        return search_query, expected_title
+
+    def resolve(self, song_name: str, artist_name: str = "", album_name: str = "") -> List[Dict]:
+        """Busca una canción y devuelve los resultados ordenados por confianza"""
+        search_query, expected_title = self.build_search(song_name, artist_name, album_name)
+        return self.search_with_confidence(search_query, expected_title, max_results=5)
+
+    def download_by_name(self, song_name: str, artist_name: str = "", album_name: str = "",
+                         choose: Optional[Callable[[List[Dict]], Optional[Dict]]] = None) -> Optional[str]:
+        """Descarga una canción por nombre usando el sistema de confianza
+
+        choose recibe los resultados de baja confianza y devuelve el elegido
+        (por defecto se pregunta al usuario con choose_result).
+        """
+        search_query, _ = self.build_search(song_name, artist_name, album_name)
         print(f"Buscando: {search_query}")
         
         try:
             # Buscar resultados con confianza
-            results = self.search_with_confidence(search_query, expected_title, max_results=5)
+            results = self.resolve(song_name, artist_name, album_name)
             
             if not results:
                 print("No se encontraron resultados adecuados.")
@@ -173,45 +322,51 @@ class SmartDownloader:
             if results[0]['confidence'] >= 70:
                 print(f"Descargando: {results[0]['title']} (Confianza: {results[0]['confidence']:.1f}%)")
                 return self.download_video(results[0])
-                
-            # Si no hay suficiente confianza, mostrar opciones
-            print("\nNo se encontró una coincidencia segura. Opciones disponibles:")
-            for i, result in enumerate(results[:10], 1):
-                duration = result.get('duration', 0)
-                minutes = int(duration) // 60
-                seconds = int(duration) % 60
-                print(f"{i}. [{result.get('confidence', 0):.1f}%] {result.get('title', 'Sin título')} ({minutes}:{seconds:02d})")
-                
-            while True:
-                try:
-                    choice = input("\nSeleccione un número (o 's' para salir): ").strip().lower()
-                    if choice == 's':
-                        return None
-                        
-                    choice_idx = int(choice) - 1
-                    if 0 <= choice_idx < len(results):
-                        selected = results[choice_idx]
-                        duration = selected.get('duration', 0)
-                        minutes = int(duration) // 60
-                        seconds = int(duration) % 60
-                        
-                        print(f"\n=== Canción seleccionada ===")
-                        print(f"Título: {selected.get('title', 'Desconocido')}")
-                        print(f"Duración: {minutes}:{seconds:02d}")
-                        print(f"Confianza: {selected.get('confidence', 0):.1f}%")
-                        print("===========================")
-                        
-                        confirm = input("\n¿Desea descargar esta canción? (s/n): ").strip().lower()
-                        if confirm == 's':
-                            return self.download_video(selected)
-                        else:
-                            print("Búsqueda cancelada.")
-                            return None
-                    else:
-                        print("Opción inválida. Intente de nuevo.")
-                        
-                except ValueError:
-                    print("Por favor ingrese un número o 's' para salir.")
+
+            selected = (choose or self.choose_result)(results)
+            if selected:
+                return self.download_video(selected)
+            return None
         except Exception as e:
             print(f"Error al procesar la búsqueda: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def choose_result(self, results: List[Dict]) -> Optional[Dict]:
+        """Muestra las opciones de baja confianza y deja elegir al usuario"""
+        print("\nNo se encontró una coincidencia segura. Opciones disponibles:")
+        for i, result in enumerate(results[:10], 1):
+            duration = result.get('duration', 0)
+            minutes = int(duration) // 60
+            seconds = int(duration) % 60
+            print(f"{i}. [{result.get('confidence', 0):.1f}%] {result.get('title', 'Sin título')} ({minutes}:{seconds:02d})")
+            
+        while True:
+            try:
+                choice = input("\nSeleccione un número (o 's' para salir): ").strip().lower()
+                if choice == 's':
+                    return None
+                    
+                choice_idx = int(choice) - 1
+                if 0 <= choice_idx < len(results):
+                    selected = results[choice_idx]
+                    duration = selected.get('duration', 0)
+                    minutes = int(duration) // 60
+                    seconds = int(duration) % 60
+                    
+                    print(f"\n=== Canción seleccionada ===")
+                    print(f"Título: {selected.get('title', 'Desconocido')}")
+                    print(f"Duración: {minutes}:{seconds:02d}")
+                    print(f"Confianza: {selected.get('confidence', 0):.1f}%")
+                    print("===========================")
+                    
+                    confirm = input("\n¿Desea descargar esta canción? (s/n): ").strip().lower()
+                    if confirm == 's':
+                        return selected
+                    else:
+                        print("Búsqueda cancelada.")
+                        return None
+                else:
+                    print("Opción inválida. Intente de nuevo.")
+                    
+            except ValueError:
+                print("Por favor ingrese un número o 's' para salir.")
\ No newline at end of file
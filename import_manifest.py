@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Optional
+
+# Estados de cada pista en una importación
+RESOLVED = "resolved"        # Ya se eligió el video (video_id, url, title)
+DOWNLOADED = "downloaded"    # Audio original descargado (source_path)
+TRANSCODED = "transcoded"    # MP3 listo (song_id)
+FAILED = "failed"            # Falló (reason); se reintenta al volver a importar
+REVIEW = "review"            # Coincidencia dudosa pendiente de elegir a mano
+
+
+def track_key(track: Dict) -> str:
+    """Identificador estable de una pista dentro de la importación"""
+    if track.get("id"):
+        return track["id"]
+    return f"{track.get('name', '')}|{track.get('artist', '')}|{track.get('album', '')}"
+
+
+class ImportManifest:
+    """Estado por pista de una importación, para poder reanudarla
+
+    Es un registro JSONL de solo añadir: cada cambio de estado es una línea
+    y al cargar gana la última de cada pista. Una línea a medio escribir
+    (cierre brusco) se ignora.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.playlist_id: Optional[str] = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            # errors="replace": un corte puede dejar un carácter UTF-8 a medias
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Línea a medio escribir: las siguientes siguen valiendo
+                    if "playlist_id" in record:
+                        self.playlist_id = record["playlist_id"]
+                    else:
+                        self.entries[record["key"]] = record
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, track: Dict) -> Optional[Dict]:
+        return self.entries.get(track_key(track))
+
+    def _append(self, record: Dict) -> None:
+        with open(self.path, "ab+") as f:
+            # Tras una línea cortada, el registro nuevo empieza en su propia línea
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, track: Dict, state: str, **fields) -> None:
+        """Guarda el nuevo estado de una pista (conserva los campos anteriores)"""
+        key = track_key(track)
+        with self._lock:
+            entry = dict(self.entries.get(key, {}), key=key, state=state, time=time.time(), **fields)
+            if state != FAILED:
+                entry.pop("reason", None)
+            self.entries[key] = entry
+            self._append(entry)
+
+    def set_playlist(self, playlist_id: str) -> None:
+        """Recuerda la lista local creada para esta importación"""
+        with self._lock:
+            self.playlist_id = playlist_id
+            self._append({"playlist_id": playlist_id})
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.entries.values():
+            counts[entry["state"]] = counts.get(entry["state"], 0) + 1
+        return counts
@@ -0,0 +1,295 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from library import find_song_file
+from import_manifest import DOWNLOADED, FAILED, RESOLVED, REVIEW, TRANSCODED, ImportManifest
+
+# Hilos por defecto de las etapas que usan yt-dlp (buscar y descargar)
+RESOLVE_WORKERS = 4
+FETCH_WORKERS = 3
+
+
+class StageStats:
+    """Contadores de rendimiento de una etapa del pipeline"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+        self._lock = threading.Lock()
+
+    def record(self, started: float, ended: float, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.busy_seconds += ended - started
+            if self.first_start is None or started < self.first_start:
+                self.first_start = started
+            if self.last_end is None or ended > self.last_end:
+                self.last_end = ended
+
+    @property
+    def throughput(self) -> float:
+        """Pistas completadas por segundo de reloj"""
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        wall = self.last_end - self.first_start
+        return self.completed / wall if wall > 0 else 0.0
+
+    def summary(self) -> str:
+        avg = self.busy_seconds / max(self.completed + self.failed, 1)
+        return (f"{self.name:<10} {self.completed:>4} ok  {self.failed:>3} fallos  "
+                f"{self.throughput:6.2f} pistas/s  {avg:6.2f} s/pista")
+
+
+class ImportPipeline:
+    """Importador por etapas: resolver (búsqueda) -> descargar -> convertir
+
+    Cada etapa tiene su propio pool de hilos acotado, así mientras una pista
+    se convierte la siguiente ya se está descargando y otras se están buscando.
+
+    Antes de buscar se consulta lookup(pista) (IDs de Spotify/ISRC ya
+    conocidos) y antes de descargar downloader.existing_song(video_id); si
+    dos pistas de la misma importación dan el mismo video se descarga una vez.
+
+    Con un manifest cada pista guarda su estado al avanzar; al repetir la
+    importación se retoma desde la última etapa completada y solo se vuelven
+    a intentar las que fallaron.
+    """
+
+    def __init__(self, downloader, resolve_workers: int = RESOLVE_WORKERS, fetch_workers: int = FETCH_WORKERS,
+                 transcode_workers: Optional[int] = None, max_in_flight: int = 16,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 lookup: Optional[Callable[[Dict], Optional[str]]] = None,
+                 manifest: Optional[ImportManifest] = None):
+        self.downloader = downloader
+        self.resolve_workers = resolve_workers
+        self.fetch_workers = fetch_workers
+        self.transcode_workers = transcode_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight
+        self.should_cancel = should_cancel or (lambda: False)
+        self.lookup = lookup
+        self.manifest = manifest
+
+        self.stats = {name: StageStats(name) for name in ("resolver", "descargar", "convertir")}
+        self.tracks: List[Dict] = []
+        self.results: List[Optional[str]] = []
+        # video_id de YouTube elegido para cada pista (para el índice de fuentes)
+        self.video_ids: List[Optional[str]] = []
+        self.reused = 0
+        # song_id creados en esta importación (los reutilizados no se incluyen)
+        self.new_song_ids: List[str] = []
+        # Pistas sin coincidencia segura: (índice, pista, resultados) para elegir a mano
+        self.needs_review: List[Tuple[int, Dict, List[Dict]]] = []
+
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._pending = 0
+        self._slots = threading.Semaphore(max_in_flight)
+        # video_id -> índice que lo descarga, y pistas que esperan a ese mismo video
+        self._owners: Dict[str, int] = {}
+        self._followers: Dict[str, List[int]] = {}
+
+    def cancelled(self) -> bool:
+        return bool(self.should_cancel())
+
+    def run(self, tracks: Iterable[Dict]) -> List[Optional[str]]:
+        """Procesa las pistas y devuelve los song_id en el orden de la playlist
+
+        Cada pista es un dict con 'name', 'artist' y 'album'. Puede ser un
+        generador: las pistas se empiezan a procesar según van llegando y quedan
+        guardadas en self.tracks. Las posiciones que no se pudieron descargar
+        quedan como None.
+        """
+        self._resolve_pool = ThreadPoolExecutor(self.resolve_workers, thread_name_prefix="resolver")
+        self._fetch_pool = ThreadPoolExecutor(self.fetch_workers, thread_name_prefix="descargar")
+        self._transcode_pool = ThreadPoolExecutor(self.transcode_workers, thread_name_prefix="convertir")
+        try:
+            for index, track in enumerate(tracks):
+                # Esperar un hueco libre sin dejar de atender la cancelación
+                while not self._slots.acquire(timeout=0.2):
+                    if self.cancelled():
+                        break
+                if self.cancelled():
+                    break
+                with self._lock:
+                    self.tracks.append(track)
+                    self.results.append(None)
+                    self.video_ids.append(None)
+                    self._pending += 1
+                self._resolve_pool.submit(self._guard, self._resolve, index, track)
+
+            with self._done:
+                while self._pending:
+                    self._done.wait(0.2)
+        finally:
+            for pool in (self._resolve_pool, self._fetch_pool, self._transcode_pool):
+                pool.shutdown(wait=True, cancel_futures=True)
+            # Si se canceló a mitad, dejar de pedir páginas
+            if hasattr(tracks, "close"):
+                tracks.close()
+        return self.results
+
+    def _record(self, track: Dict, state: str, **fields) -> None:
+        if self.manifest is not None:
+            self.manifest.record(track, state, **fields)
+
+    def _finish(self, index: int, song_id: Optional[str], reason: Optional[str] = None) -> None:
+        with self._done:
+            indices = [index]
+            video_id = self.video_ids[index]
+            if video_id and self._owners.get(video_id) == index:
+                del self._owners[video_id]
+                indices += self._followers.pop(video_id, [])
+            for i in indices:
+                self.results[i] = song_id
+                self._pending -= 1
+            self._done.notify_all()
+        try:
+            for i in indices:
+                if song_id:
+                    self._record(self.tracks[i], TRANSCODED, song_id=song_id)
+                elif reason and not self.cancelled():
+                    # Si se canceló, la pista se queda en su última etapa completada
+                    self._record(self.tracks[i], FAILED, reason=reason)
+        except Exception as e:
+            print(f"\nError al guardar el estado de la importación: {e}")
+        finally:
+            for _ in indices:
+                self._slots.release()
+
+    def _guard(self, task, index: int, *args) -> None:
+        """Ejecuta una tarea de un pool; si falla fuera de _run_stage (lookup,
+        manifest, comprobar la biblioteca...) la pista se da por fallida, que
+        si no _pending nunca llegaría a 0 y run() no terminaría"""
+        try:
+            task(index, *args)
+        except Exception as e:
+            print(f"\nError en la pista {index + 1}: {e}")
+            self._finish(index, None, reason=str(e))
+
+    def _reuse(self, index: int, track: Dict, song_id: str) -> None:
+        print(f"= [{index + 1}] Ya descargada como {song_id}: {track['name']} - {track['artist']}")
+        with self._lock:
+            self.reused += 1
+        self._finish(index, song_id)
+
+    def _run_stage(self, name: str, func, *args):
+        started = time.perf_counter()
+        result = None
+        try:
+            result = func(*args)
+        except Exception as e:
+            print(f"\nError en la etapa {name}: {e}")
+        self.stats[name].record(started, time.perf_counter(), result is not None)
+        return result
+
+    def _resume(self, index: int, track: Dict) -> bool:
+        """Retoma la pista desde el manifest. Devuelve False si hay que buscarla"""
+        entry = self.manifest.get(track) if self.manifest is not None else None
+        if not entry:
+            return False
+        state = entry["state"]
+        if state == TRANSCODED:
+            if find_song_file(self.downloader.songs_dir, entry["song_id"]):
+                self._reuse(index, track, entry["song_id"])
+                return True
+            return False
+        if state in (RESOLVED, DOWNLOADED):
+            video_info = {"video_id": entry["video_id"], "url": entry["url"], "title": entry.get("title", "")}
+            source_path = entry.get("source_path") if state == DOWNLOADED else None
+            if source_path and not os.path.exists(source_path):
+                source_path = None
+            print(f"[{index + 1}] Reanudando: {track['name']} - {track['artist']}")
+            self._start_download(index, track, video_info, source_path)
+            return True
+        return False  # Fallida o pendiente de revisión: se busca de nuevo
+
+    def _resolve(self, index: int, track: Dict) -> None:
+        if self.cancelled():
+            return self._finish(index, None)
+        existing = self.lookup(track) if self.lookup else None
+        if existing:
+            return self._reuse(index, track, existing)
+        if self._resume(index, track):
+            return
+        print(f"[{index + 1}] Buscando: {track['name']} - {track['artist']}")
+        results = self._run_stage("resolver", self.downloader.resolve,
+                                  track["name"], track["artist"], track.get("album", ""))
+        if not results:
+            print(f"No se encontraron resultados para: {track['name']} - {track['artist']}")
+            return self._finish(index, None, reason="sin resultados")
+        if results[0]["confidence"] < 70:
+            with self._lock:
+                self.needs_review.append((index, track, results))
+            self._record(track, REVIEW)
+            return self._finish(index, None)
+
+        video_info = results[0]
+        self._record(track, RESOLVED, video_id=video_info["video_id"],
+                     url=video_info["url"], title=video_info["title"])
+        self._start_download(index, track, video_info)
+
+    def _start_download(self, index: int, track: Dict, video_info: Dict,
+                        source_path: Optional[str] = None) -> None:
+        """Descarga (o convierte, si ya está el original) el video elegido"""
+        video_id = video_info["video_id"]
+        with self._lock:
+            self.video_ids[index] = video_id
+        existing = self.downloader.existing_song(video_id)
+        if existing:
+            return self._reuse(index, track, existing)
+        with self._lock:
+            if video_id in self._owners:
+                # Otra pista de esta importación ya está descargando el mismo video
+                self._followers.setdefault(video_id, []).append(index)
+                self.reused += 1
+                return
+            self._owners[video_id] = index
+        try:
+            if source_path:
+                self._transcode_pool.submit(self._guard, self._transcode, index, track, video_info, source_path)
+            else:
+                self._fetch_pool.submit(self._guard, self._fetch, index, track, video_info)
+        except RuntimeError:
+            self._finish(index, None)
+
+    def _fetch(self, index: int, track: Dict, video_info: Dict) -> None:
+        if self.cancelled():
+            return self._finish(index, None)
+        source_path = self._run_stage("descargar", self.downloader.fetch_audio, video_info)
+        if not source_path:
+            return self._finish(index, None, reason="error al descargar")
+        self._record(track, DOWNLOADED, source_path=source_path)
+        try:
+            self._transcode_pool.submit(self._guard, self._transcode, index, track, video_info, source_path)
+        except RuntimeError:
+            self._finish(index, None)
+
+    def _transcode(self, index: int, track: Dict, video_info: Dict, source_path: str) -> None:
+        if self.cancelled():
+            # El original se conserva: la próxima importación lo convierte sin descargarlo
+            return self._finish(index, None)
+        song_id = self._run_stage("convertir", self.downloader.finalize,
+                                  source_path, video_info["video_id"])
+        if song_id:
+            with self._lock:
+                self.new_song_ids.append(song_id)
+            print(f"✓ [{index + 1}] Descargada: {track['name']} - {track['artist']}")
+        self._finish(index, song_id, reason=None if song_id else "error al convertir")
+
+    def report(self) -> None:
+        """Imprime el rendimiento de cada etapa"""
+        print("\nRendimiento por etapa:")
+        if self.reused:
+            print(f"  reutilizadas {self.reused} pistas ya descargadas")
+        for stage in self.stats.values():
+            print(f"  {stage.summary()}")
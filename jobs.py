@@ -0,0 +1,149 @@
+import time
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Prioridades: número más bajo = se ejecuta antes
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+PENDING = "en cola"
+RUNNING = "en curso"
+DONE = "terminado"
+FAILED = "error"
+CANCELLED = "cancelado"
+
+
+class Job:
+    """Un trabajo en segundo plano (descarga, importación...)"""
+
+    def __init__(self, job_id: int, description: str, func: Callable, args: tuple, priority: int):
+        self.id = job_id
+        self.description = description
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.status = PENDING
+        self.progress: Optional[str] = None
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobQueue:
+    """Cola de trabajos con prioridades y un número acotado de hilos
+
+    Cada trabajo se ejecuta en uno de max_workers hilos. Mientras se ejecuta,
+    current() devuelve el trabajo del hilo actual, así el código de descarga
+    puede comprobar su propia cancelación sin recibir el trabajo como argumento.
+    """
+
+    def __init__(self, max_workers: int = 2, keep_finished: int = 50):
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self._jobs: Dict[int, Job] = {}
+        self._pending: List[Job] = []
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"trabajo-{i + 1}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, description: str, func: Callable, *args, priority: int = PRIORITY_NORMAL) -> Job:
+        with self._cond:
+            job = Job(next(self._ids), description, func, args, priority)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify()
+            return job
+
+    def _next_job(self) -> Job:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            job = min(self._pending, key=lambda j: (j.priority, j.id))
+            self._pending.remove(job)
+            job.status = RUNNING
+            job.started_at = time.time()
+            return job
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            self._local.job = job
+            try:
+                job.result = job.func(*job.args)
+                job.status = CANCELLED if job.cancelled else DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+                print(f"\n[trabajo {job.id}] Error: {e}")
+            finally:
+                self._local.job = None
+                job.finished_at = time.time()
+                self._prune()
+            print(f"\n[trabajo {job.id}] {job.status}: {job.description}")
+
+    def _prune(self) -> None:
+        """Olvida los trabajos terminados más antiguos"""
+        with self._cond:
+            finished = [job for job in self._jobs.values() if job.finished]
+            for job in finished[:-self.keep_finished or None]:
+                del self._jobs[job.id]
+
+    def current(self) -> Optional[Job]:
+        """Trabajo que se está ejecutando en este hilo (None fuera de la cola)"""
+        return getattr(self._local, "job", None)
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._cond:
+            return sorted(self._jobs.values(), key=lambda j: j.id)
+
+    def active(self) -> List[Job]:
+        return [job for job in self.jobs() if not job.finished]
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancela un trabajo: si está en cola no llega a empezar, si está en curso se le avisa"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job._cancel.set()
+            if job in self._pending:
+                self._pending.remove(job)
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            return True
+
+    def set_priority(self, job_id: int, priority: int) -> bool:
+        """Cambia la prioridad de un trabajo que aún está en cola"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != PENDING:
+                return False
+            job.priority = priority
+            return True
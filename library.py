@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import struct
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Extensiones de audio que puede tener una canción de la biblioteca, por preferencia
+AUDIO_EXTENSIONS = ("mp3", "opus", "ogg", "m4a", "webm")
+
+# Códec de cada extensión (lo que se guarda en el catálogo)
+CODEC_BY_EXT: Dict[str, str] = {
+    "mp3": "mp3",
+    "opus": "opus",
+    "ogg": "vorbis",
+    "m4a": "aac",
+    "webm": "opus",
+}
+
+# Lo que pygame (SDL_mixer) sabe abrir; m4a/webm solo con el motor mpv
+PYGAME_EXTENSIONS = ("mp3", "opus", "ogg")
+
+
+def split_song_file(filename: str) -> Optional[Tuple[str, str]]:
+    """'12.opus' -> ('12', 'opus'); None si no es un archivo de audio de la biblioteca
+
+    La extensión se devuelve tal como está en el disco ('1.MP3' -> 'MP3').
+    Los temporales de descarga ('x.src.webm', 'x.mp3.part') no cuentan.
+    """
+    song_id, dot, ext = filename.rpartition(".")
+    if not dot or ext.lower() not in AUDIO_EXTENSIONS or not song_id or "." in song_id:
+        return None
+    return song_id, ext
+
+
+def iter_song_files(songs_dir: str) -> Iterator[Tuple[str, str]]:
+    """Genera (song_id, extensión) de cada canción en el directorio"""
+    for filename in os.listdir(songs_dir):
+        parts = split_song_file(filename)
+        if parts:
+            yield parts
+
+
+def find_song_file(songs_dir: str, song_id: str, ext: Optional[str] = None) -> Optional[str]:
+    """Ruta del archivo de una canción, sea cual sea su códec
+
+    Si se conoce la extensión (del catálogo) se prueba primero; si no, se
+    prueban todas las de AUDIO_EXTENSIONS.
+    """
+    if ext:
+        path = os.path.join(songs_dir, f"{song_id}.{ext}")
+        if os.path.exists(path):
+            return path
+    for candidate in AUDIO_EXTENSIONS:
+        for variant in (candidate, candidate.upper()):
+            if variant != ext:
+                path = os.path.join(songs_dir, f"{song_id}.{variant}")
+                if os.path.exists(path):
+                    return path
+    return None
+
+
+class SongFile(NamedTuple):
+    ext: str
+    size: int
+    mtime: float
+
+
+# Eventos de inotify que cambian el contenido del directorio (ver inotify(7))
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_WATCH_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Margen para el mtime del directorio: un cambio en el mismo instante que el
+# último escaneo no mueve el mtime, así que un escaneo tan reciente no es fiable
+_MTIME_RACE_SECONDS = 2.0
+
+
+def _open_inotify(path: str) -> Optional[int]:
+    """Descriptor de inotify que vigila path, o None si el sistema no lo tiene"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(path), _WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception:
+        # Cualquier fallo (libc no encontrada...) deja el escaneo por mtime
+        return None
+
+
+class LibraryScanner:
+    """Copia en memoria del directorio de canciones (nombre, tamaño, mtime)
+
+    Las consultas se responden desde la copia. Antes de cada consulta se
+    actualiza de forma incremental: con inotify se vuelven a mirar solo los
+    archivos de los que llegó un evento; sin inotify se reescanea el
+    directorio entero solo si cambió su mtime.
+    """
+
+    def __init__(self, songs_dir: str, watch: bool = True):
+        self.songs_dir = songs_dir
+        self._lock = threading.RLock()
+        self._files: Dict[str, Dict[str, SongFile]] = {}
+        self._dir_mtime: Optional[int] = None
+        self._scanned_at = 0.0
+        self._inotify = _open_inotify(songs_dir) if watch else None
+        self.rescans = 0
+        self._rescan()
+
+    @property
+    def watching(self) -> bool:
+        return self._inotify is not None
+
+    def _set(self, filename: str) -> None:
+        parts = split_song_file(filename)
+        if not parts:
+            return
+        song_id, ext = parts
+        try:
+            st = os.stat(os.path.join(self.songs_dir, filename))
+        except FileNotFoundError:
+            self._discard(song_id, ext)
+            return
+        self._files.setdefault(song_id, {})[ext] = SongFile(ext, st.st_size, st.st_mtime)
+
+    def _discard(self, song_id: str, ext: str) -> None:
+        files = self._files.get(song_id)
+        if files is not None:
+            files.pop(ext, None)
+            if not files:
+                del self._files[song_id]
+
+    def _rescan(self) -> None:
+        """Vuelve a leer el directorio completo"""
+        files: Dict[str, Dict[str, SongFile]] = {}
+        self._dir_mtime = os.stat(self.songs_dir).st_mtime_ns
+        self._scanned_at = time.time()
+        with os.scandir(self.songs_dir) as entries:
+            for entry in entries:
+                parts = split_song_file(entry.name)
+                if not parts:
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.setdefault(parts[0], {})[parts[1]] = SongFile(parts[1], st.st_size, st.st_mtime)
+        self._files = files
+        self.rescans += 1
+
+    def _read_events(self) -> None:
+        """Aplica los eventos de inotify pendientes (lectura sin bloqueo)"""
+        names = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self._inotify, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & (_IN_Q_OVERFLOW | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                    rescan = True
+                elif name:
+                    names.add(os.fsdecode(name))
+        if rescan:
+            # Se perdieron eventos o el directorio se movió: vigilar de nuevo y reescanear
+            os.close(self._inotify)
+            self._inotify = _open_inotify(self.songs_dir)
+            self._rescan()
+            return
+        for name in names:
+            self._set(name)
+
+    def refresh(self) -> None:
+        with self._lock:
+            if self._inotify is not None:
+                self._read_events()
+                return
+            try:
+                mtime = os.stat(self.songs_dir).st_mtime_ns
+            except FileNotFoundError:
+                self._files = {}
+                return
+            if mtime != self._dir_mtime or time.time() - mtime / 1e9 < _MTIME_RACE_SECONDS:
+                self._rescan()
+
+    def path(self, song_id: str, ext: Optional[str] = None) -> Optional[str]:
+        """Como find_song_file, pero desde la copia en memoria"""
+        with self._lock:
+            self.refresh()
+            files = self._files.get(song_id)
+            if not files:
+                return None
+            if ext not in files:
+                ext = min(files, key=lambda e: (AUDIO_EXTENSIONS.index(e.lower()), e != e.lower()))
+            return os.path.join(self.songs_dir, f"{song_id}.{ext}")
+
+    def exists(self, song_id: str) -> bool:
+        with self._lock:
+            self.refresh()
+            return song_id in self._files
+
+    def song_files(self) -> List[Tuple[str, SongFile]]:
+        """(song_id, SongFile) de todos los archivos de audio, ordenados por nombre"""
+        with self._lock:
+            self.refresh()
+            return sorted(
+                (song_id, info) for song_id, files in self._files.items() for info in files.values()
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            return len(self._files)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._inotify is not None:
+                os.close(self._inotify)
+                self._inotify = None
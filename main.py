@@ -1,71 +1,53 @@
 import os
-import json
-import random
 import pygame
-import pyperclip
-import yt_dlp
 import time
 import threading
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyClientCredentials
 from password import ADMIN_PASSWORD
 from config import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, DEFAULT_VOLUME
-from downloader import SmartDownloader
+from config import PLAYBACK_ENGINE, CROSSFADE_MS, PREDECODE_MAX_MB, SHUFFLE_WEIGHTING
+from config import MAX_DOWNLOAD_JOBS, STORAGE_FORMAT, NORMALIZE_LOUDNESS
+from config import TIMINGS_ENABLED, TIMINGS_LOG
+from catalog import SongCatalog
+from library import AUDIO_EXTENSIONS, CODEC_BY_EXT, PYGAME_EXTENSIONS, LibraryScanner
+from importer import FETCH_WORKERS, RESOLVE_WORKERS, ImportPipeline
+from import_manifest import ImportManifest, TRANSCODED
+from jobs import JobQueue, PRIORITY_HIGH, PRIORITY_LOW
+from playback import PygameEndWatcher, PredecodeEngine
+from mpv_backend import MPVMusic
+from shuffle import ShuffleQueue
+from playlist_store import PlaylistStore
+from search_index import TitleIndex
+from timing import Timings
+from ytdl_pool import DOWNLOAD_PROFILE, SEARCH_PROFILE, STREAM_PROFILE
+from spotify_tracks import SpotifyMetadata, iter_album_tracks, iter_playlist_tracks, prefetch, track_sources
 
 # Obtener la ruta base del proyecto
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-import subprocess
-import signal
-
-class MPVMusic:
-    def __init__(self):
-        self.proc = None
-        self.volume = 100
-
-    def load(self, path):
-        self.path = path
-
-    def play(self):
-        self.stop()
-        self.proc = subprocess.Popen([
-            "mpv",
-            "--no-video",
-            "--no-audio-focus",
-            "--volume", str(self.volume),
-            self.path
-        ])
-
-    def stop(self):
-        if self.proc and self.proc.poll() is None:
-            self.proc.send_signal(signal.SIGTERM)
-            self.proc = None
-
-    def get_busy(self):
-        return self.proc and self.proc.poll() is None
-
-    def set_volume(self, vol):
-        self.volume = int(vol * 100)
-
-class FakeMixer:
-    music = MPVMusic()
-
-class FakeMixer2:
-    mixer = FakeMixer()
-
-FakeMixer2 = pygame
-
 class MusicPlayer:
-    def __init__(self):
+    def __init__(self, music=None):
+        # Backend de reproducción: pygame.mixer.music o cualquier objeto con su interfaz
+        self.music = music or self.create_music_backend()
         self.volume = DEFAULT_VOLUME
-        pygame.mixer.music.set_volume(self.volume)
+        self.music.set_volume(self.volume)
         self.current_playlist = []
+        self.current_playlist_id = None
         self.current_song_index = 0
-        self.played_songs = set()
-        self.check_thread = None
+        self.shuffle = None
+        self._shuffle_saved_order = None
+        self.current_song = None
+        self.queued_song = None
+        self.end_watcher = None
+        self.stream = None  # ProgressivePlayer de Stream, mientras suena
+        self._playback_lock = threading.RLock()
         self.is_playing = False
-        self.downloading = False
-        self.cancel_download = False
+        # Tiempos por comando y por etapa de descarga (comando Stats)
+        self.timings = Timings(enabled=TIMINGS_ENABLED, log_path=TIMINGS_LOG)
+        # Las descargas se ejecutan en segundo plano para no bloquear el prompt
+        self.jobs = JobQueue(max_workers=MAX_DOWNLOAD_JOBS)
+        # Coincidencias dudosas de trabajos en segundo plano: se eligen con Review
+        self.pending_reviews = []
+        self._reviews_lock = threading.Lock()
         
         # Crear directorios necesarios
         self.songs_dir = os.path.join(BASE_DIR, "Songs")
@@ -73,20 +55,27 @@ class MusicPlayer:
         os.makedirs(self.songs_dir, exist_ok=True)
         os.makedirs(self.lists_dir, exist_ok=True)
         
-        # Cargar o crear el contador de IDs
-        self.song_counter_file = os.path.join(self.songs_dir, "counter.json")
-        self.song_counter = self.load_song_counter()
+        # Copia en memoria de Songs/ (se actualiza con inotify o con el mtime del directorio)
+        self.library = LibraryScanner(self.songs_dir)
+        # Catálogo de canciones (migra metadata.json/counter.json la primera vez)
+        self.catalog = SongCatalog(self.songs_dir)
+        # Listas de reproducción con registro de ediciones incremental
+        self.playlists = PlaylistStore(self.lists_dir)
+        # Índice de títulos para Find: se construye la primera vez que se usa
+        self._title_index = None
         
         # Diccionario de comandos con sus atajos
         self.commands = {
-            "download": self.download_youtube_video,
-            "d": self.download_youtube_video,
-            "download_spotify": self.download_spotify_playlist,
-            "ds": self.download_spotify_playlist,
+            "download": self.queue_youtube_download,
+            "d": self.queue_youtube_download,
+            "download_spotify": self.queue_spotify_download,
+            "ds": self.queue_spotify_download,
             "create": self.create_playlist,
             "cl": self.create_playlist,
             "delete": self.delete_playlist,
             "del": self.delete_playlist,
+            "delete_songs": self.delete_songs,
+            "dels": self.delete_songs,
             "play": self.play_playlist,
             "pl": self.play_playlist,
             "play_song": self.play_song,
@@ -108,36 +97,156 @@ class MusicPlayer:
             "ch": self.check_playlist,
             "stop": self.stop_playback,
             "s": self.stop_playback,
-            "cancel": self.cancel_current_download,
-            "c": self.cancel_current_download,
+            "cancel": self.cancel_job,
+            "c": self.cancel_job,
+            "jobs": self.show_jobs,
+            "j": self.show_jobs,
+            "priority": self.set_job_priority,
+            "prio": self.set_job_priority,
+            "review": self.review_pending,
+            "rv": self.review_pending,
             "edit": self.edit_playlist,
             "e": self.edit_playlist,
             "showlist": self.show_list_content,
             "sl": self.show_list_content,
-            "search": self.search_song,
-            "sch": self.search_song
+            "stream": self.stream_song,
+            "st": self.stream_song,
+            "search": self.queue_search,
+            "sch": self.queue_search,
+            "find": self.find_songs,
+            "f": self.find_songs,
+            "stats": self.show_stats,
+            "sts": self.show_stats,
+            "buffer": self.show_buffer_stats,
+            "buf": self.show_buffer_stats,
+            "dupes": self.find_duplicate_songs,
+            "dup": self.find_duplicate_songs,
+            "analyze": self.queue_analysis,
+            "an": self.queue_analysis
         }
         
-        # Inicializar cliente de Spotify
-        try:
-            self.spotify = Spotify(auth_manager=SpotifyClientCredentials(
-                client_id=SPOTIFY_CLIENT_ID,
-                client_secret=SPOTIFY_CLIENT_SECRET
-            ))
-        except:
-            print("Advertencia: No se pudo inicializar Spotify. Asegúrate de tener las credenciales configuradas en config.py")
-            self.spotify = None
-        
+        # Spotify y el descargador se crean la primera vez que se usan
+        self._spotify = None
+        self._spotify_ready = False
+        self._spotify_metadata = None
+        self._downloader = None
+
+    @property
+    def spotify(self):
+        """Cliente de Spotify, creado (e importado) al primer uso"""
+        if not self._spotify_ready:
+            self._spotify_ready = True
+            try:
+                from spotipy import Spotify
+                from spotipy.cache_handler import CacheFileHandler
+                from spotipy.oauth2 import SpotifyClientCredentials
+                # Un solo cliente (una sesión HTTP) para todo; el token se guarda
+                # en disco y se reutiliza entre ejecuciones mientras no caduque
+                self._spotify = Spotify(auth_manager=SpotifyClientCredentials(
+                    client_id=SPOTIFY_CLIENT_ID,
+                    client_secret=SPOTIFY_CLIENT_SECRET,
+                    cache_handler=CacheFileHandler(cache_path=os.path.join(self.songs_dir, ".spotify_token"))
+                ))
+            except:
+                print("Advertencia: No se pudo inicializar Spotify. Asegúrate de tener las credenciales configuradas en config.py")
+                self._spotify = None
+        return self._spotify
+
+    @property
+    def spotify_metadata(self):
+        """Datos de pistas de Spotify por lotes y con caché en disco (None sin Spotify)"""
+        if self._spotify_metadata is None and self.spotify:
+            self._spotify_metadata = SpotifyMetadata(
+                self.spotify, os.path.join(self.songs_dir, "spotify_cache.db"), timings=self.timings
+            )
+        return self._spotify_metadata
+
+    @property
+    def downloader(self):
+        """SmartDownloader, creado al primer uso (importa yt_dlp)"""
+        if self._downloader is None:
+            from downloader import SmartDownloader
+            self._downloader = SmartDownloader(
+                self.songs_dir,
+                source_lookup=lambda video_id: self.find_song_by_sources({"youtube": video_id}),
+                timings=self.timings,
+                # Cada trabajo en segundo plano puede ser una importación con varios
+                # hilos de búsqueda y de descarga a la vez
+                pool_size={
+                    SEARCH_PROFILE: RESOLVE_WORKERS * MAX_DOWNLOAD_JOBS,
+                    DOWNLOAD_PROFILE: FETCH_WORKERS * MAX_DOWNLOAD_JOBS,
+                    STREAM_PROFILE: MAX_DOWNLOAD_JOBS,
+                },
+                storage_format=STORAGE_FORMAT,
+                # mpv abre cualquier contenedor; pygame solo MP3/Ogg/Opus
+                native_extensions=AUDIO_EXTENSIONS if isinstance(self.music, MPVMusic) else PYGAME_EXTENSIONS
+            )
+        return self._downloader
+
+    def song_path(self, song_id):
+        """Ruta del archivo de una canción (mp3, opus, m4a...) o None si no existe"""
+        song = self.catalog.get(song_id)
+        return self.library.path(song_id, song.get("ext") if song else None)
+
+    def playable_path(self, song_id):
+        path = self.song_path(song_id)
+        if path is None:
+            raise FileNotFoundError(f"No se encontró el archivo de la canción {song_id}")
+        return path
+
+    def find_song_by_sources(self, sources):
+        """Devuelve el song_id local si alguna fuente (youtube/spotify/isrc) ya se descargó"""
+        song_id = self.catalog.find_source(sources)
+        if song_id and self.song_path(song_id):
+            return song_id
+        # Canciones antiguas guardadas con el ID del video como nombre
+        video_id = sources.get("youtube")
+        if video_id and self.song_path(video_id):
+            return video_id
+        return None
+
+    def create_music_backend(self):
+        """Crea el backend de reproducción elegido en config.py"""
+        if PLAYBACK_ENGINE == "predecode":
+            try:
+                return PredecodeEngine(
+                    crossfade_ms=CROSSFADE_MS,
+                    max_buffer_bytes=PREDECODE_MAX_MB * 1024 * 1024,
+                    # Duración guardada por Analyze (Songs/<id>.<ext> -> <id>)
+                    duration_of=lambda path: (
+                        self.catalog.get(os.path.splitext(os.path.basename(path))[0]) or {}
+                    ).get("duration")
+                )
+            except Exception as e:
+                print(f"Advertencia: no se pudo iniciar el motor predecode, se usa pygame.mixer.music: {e}")
+        elif PLAYBACK_ENGINE == "mpv":
+            try:
+                return MPVMusic()
+            except Exception as e:
+                print(f"Advertencia: no se pudo iniciar mpv, se usa pygame.mixer.music: {e}")
+        # pygame.mixer.music necesita el mezclador iniciado (PredecodeEngine ya lo inicia)
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        return pygame.mixer.music
+
+    def show_buffer_stats(self):
+        """Muestra las métricas del motor de reproducción con predecodificación"""
+        if not hasattr(self.music, "stats"):
+            print("El motor de reproducción actual no tiene búfer (PLAYBACK_ENGINE = \"music\")")
+            return
+        stats = self.music.stats()
+        print(f"Canciones decodificadas: {stats['decoded_tracks']}")
+        print(f"Tiempo de decodificación: {stats['decode_seconds']:.2f} s")
+        print(f"Underruns del búfer: {stats['underruns']}")
+        print(f"Canciones sobre el límite de memoria: {stats['over_limit']}")
+        print(f"Canciones reproducidas desde el disco: {stats['streamed_tracks']}")
+
     def search_song(self, *args):
         """Busca y descarga una canción por nombre"""
         if not args:
             print("Uso: search <nombre_canción> [artista] [álbum]")
             return
 
-        # Inicializar el SmartDownloader si no existe
-        if not hasattr(self, 'downloader'):
-            self.downloader = SmartDownloader(self.songs_dir)
-
         # Procesar los argumentos
         song_name = args[0]
         artist_name = args[1] if len(args) > 1 else ""
@@ -145,11 +254,18 @@ class MusicPlayer:
 
         print(f"Buscando: {song_name} {artist_name} {album_name}")
         
+        # En segundo plano la elección manual se deja para el comando Review
+        choose = None
+        if self.jobs.current() is not None:
+            label = " ".join(args)
+            choose = lambda results: self.defer_review(label, results, self.downloader.download_video)
+        
         # Usar el SmartDownloader para buscar y descargar
         song_id = self.downloader.download_by_name(
             song_name=song_name,
             artist_name=artist_name,
-            album_name=album_name
+            album_name=album_name,
+            choose=choose
         )
         
         if song_id:
@@ -157,6 +273,56 @@ class MusicPlayer:
         else:
             print("No se pudo descargar la canción")
 
+    @property
+    def title_index(self):
+        if self._title_index is None:
+            self._title_index = TitleIndex.build(
+                (song_id, info.get("title") or f"Canción {song_id}") for song_id, info in self.catalog.items()
+            )
+        return self._title_index
+
+    def find_songs(self, *query):
+        """Busca en los títulos de la biblioteca local (sin conexión)"""
+        if not query:
+            print("Uso: find <texto>")
+            return []
+        try:
+            results = self.title_index.search(" ".join(query))
+            if not results:
+                print("No se encontraron canciones")
+                return []
+            print(f"\nCanciones encontradas ({len(results)}):")
+            for i, (song_id, title, _) in enumerate(results, 1):
+                print(f"{i}. {title} (ID: {song_id})")
+            return results
+        except Exception as e:
+            print(f"Error al buscar en la biblioteca: {e}")
+            return []
+
+    def show_stats(self, *args):
+        """Percentiles de tiempo de cada operación medida desde el arranque"""
+        if args and args[0] == "reset":
+            self.timings.reset()
+            print("Tiempos reiniciados")
+            return
+        if not self.timings.enabled:
+            print("La medición de tiempos está desactivada (TIMINGS_ENABLED en config.py)")
+            return
+        summary = self.timings.summary()
+        if not summary:
+            print("Aún no hay tiempos registrados")
+            return
+        print(f"\n{'Operación':<40} {'n':>6} {'p50':>10} {'p95':>10} {'p99':>10} {'máx':>10}")
+        for name, count, p50, p95, p99, longest in summary:
+            cells = " ".join(f"{seconds * 1000:>8.1f}ms" for seconds in (p50, p95, p99, longest))
+            print(f"{name:<40} {count:>6} {cells}")
+        if self._downloader is not None:
+            print("\nSesiones de yt-dlp (creadas = pools de conexiones abiertos):")
+            for profile, metrics in self._downloader.ydl_pool.stats().items():
+                print(f"  {profile:<10} creadas {metrics['created']}, reutilizadas {metrics['reused']}, "
+                      f"esperas {metrics['waits']}, descartadas {metrics['discarded']}, abiertas {metrics['open']}")
+        return summary
+
     def print_progress(self, current, total):
         """Imprime una barra de progreso y el porcentaje"""
         bar_length = 20
@@ -170,18 +336,15 @@ class MusicPlayer:
     def paste_url(self):
         """Pega la URL del portapapeles y la procesa automáticamente"""
         try:
+            import pyperclip
             url = pyperclip.paste()
             if "youtube.com" in url or "youtu.be" in url:
                 print(f"URL de YouTube detectada: {url}")
-                self.download_youtube_video(url)
+                self.queue_youtube_download(url)
             elif "spotify.com" in url:
                 print(f"URL de Spotify detectada: {url}")
-                if "/track/" in url:
-                    self.download_spotify_track(url)
-                elif "/playlist/" in url:
-                    self.download_spotify_playlist(url)
-                elif "/album/" in url:
-                    self.download_spotify_album(url)
+                if "/track/" in url or "/playlist/" in url or "/album/" in url:
+                    self.queue_spotify_download(url)
                 else:
                     print("URL de Spotify no reconocida. Debe ser una canción o playlist.")
             else:
@@ -193,7 +356,10 @@ class MusicPlayer:
         try:
             cmd, *args = command.lower().split()  # Convertir a minúsculas
             if cmd in self.commands:
-                return self.commands[cmd](*args)
+                func = self.commands[cmd]
+                # Los atajos se agrupan con su comando (d y download -> command.queue_youtube_download)
+                with self.timings.measure(f"command.{func.__name__}"):
+                    return func(*args)
             else:
                 print(f"Comando no reconocido: {cmd}")
                 self.show_help()
@@ -204,8 +370,8 @@ class MusicPlayer:
     def show_help(self):
         print("""
 Comandos disponibles:
-- Download/D [url_youtube] - Descarga un video de YouTube como MP3
-- Download_Spotify/DS [url_playlist] - Descarga una playlist de Spotify
+- Download/D [url_youtube] - Descarga un video de YouTube como MP3 (en segundo plano)
+- Download_Spotify/DS [url] [url2] ... - Descarga canciones, playlists o álbumes de Spotify (en segundo plano)
 - Create/CL [nombre_lista] [id1] [id2] ... - Crea una nueva lista
   Ejemplo: Create MiLista 1 2 3 4 5
 - Edit/E [id_lista] add/remove [id1] [id2] ... - Edita una lista existente
@@ -213,6 +379,7 @@ Comandos disponibles:
   - Edit 1L add 6 7 8
   - Edit 1L remove 3 4
 - Delete/DEL [id_lista_o_cancion] [contraseña] - Elimina una lista o canción
+- Delete_Songs/DELS [contraseña] [id1] [id2] ... - Elimina varias canciones de golpe
 - Play/P [id_lista] - Reproduce una lista
 - Play_Song/PS [id_cancion] - Reproduce una canción específica
 - Lists/L - Muestra todas las listas de reproducción
@@ -223,48 +390,46 @@ Comandos disponibles:
 - Pass/NEXT/N - Pasa a la siguiente canción
 - Check/CH [id_lista] - Verifica la integridad de una lista
 - Stop/S - Detiene la reproducción actual
-- Cancel/C - Cancela la descarga actual
+- Cancel/C [id_trabajo] - Cancela un trabajo (sin ID, todos los que estén en curso o en cola)
+- Jobs/J - Muestra las descargas en segundo plano y su estado
+- Priority/Prio [id_trabajo] [0-10] - Cambia la prioridad de un trabajo en cola (0 = primero)
+- Review/RV - Elige a mano las coincidencias dudosas de las descargas en segundo plano
 - Help/H - Muestra esta ayuda
 - Search/Sch - busqueda por nombre en youtube
+- Find/F [texto] - Busca canciones de la biblioteca por título (admite prefijos y erratas)
+- Stats/STS [reset] - Muestra los tiempos p50/p95/p99 de cada comando y etapa de descarga
+- Stream/ST [url_youtube o nombre] - Reproduce mientras se descarga y luego la guarda en la biblioteca
+- Buffer/Buf - Muestra las métricas del motor de reproducción (predecode)
+- Dupes/Dup - Busca canciones con el mismo contenido (archivos duplicados)
+- Analyze/AN [all] - Analiza duración, bitrate y sonoridad de las canciones nuevas (all = todas)
         """)
 
     def show_lists(self):
         try:
-            lists = os.listdir(self.lists_dir)
+            lists = self.playlists.list_ids()
             if not lists:
                 print("No hay listas de reproducción disponibles")
                 return
             
             print("\nListas de reproducción disponibles:")
-            for i, list_file in enumerate(lists, 1):
-                with open(os.path.join(self.lists_dir, list_file), "r") as f:
-                    playlist = json.load(f)
-                    print(f"{i}. {list_file[:-5]}: {playlist['name']} ({len(playlist['songs'])} canciones)")
+            for i, playlist_id in enumerate(lists, 1):
+                playlist = self.playlists.get(playlist_id)
+                print(f"{i}. {playlist_id}: {playlist.name} ({len(playlist)} canciones)")
         except Exception as e:
             print(f"Error al mostrar listas: {e}")
 
     def show_songs(self):
         try:
-            songs = [f for f in os.listdir(self.songs_dir) if f.lower().endswith('.mp3')]
+            songs = self.library.song_files()
             if not songs:
                 print("No hay canciones disponibles")
                 return
             
-            # Cargar metadatos si existen
-            metadata_file = os.path.join(self.songs_dir, 'metadata.json')
-            metadata = {}
-            if os.path.exists(metadata_file):
-                try:
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-                except:
-                    metadata = {}
-            
             print("\nCanciones disponibles:")
-            for i, song in enumerate(sorted(songs), 1):
-                song_id = song[:-4]  # Quitar la extensión .mp3
-                if song_id in metadata:
-                    song_info = metadata[song_id]
+            for i, (song_id, info) in enumerate(songs, 1):
+                song = f"{song_id}.{info.ext}"
+                song_info = self.catalog.get(song_id)
+                if song_info:
                     title = song_info.get("title", f"Canción {song_id}")
                     added_date = song_info.get("added_date", "Fecha desconocida")
                     print(f"{i}. {title} (ID: {song_id}) - Añadida: {added_date}")
@@ -275,82 +440,118 @@ Comandos disponibles:
             print(f"Error al mostrar canciones: {e}")
             # Mostrar las canciones directamente del directorio en caso de error
             try:
-                songs = [f for f in os.listdir(self.songs_dir) if f.lower().endswith('.mp3')]
+                songs = [f"{song_id}.{info.ext}" for song_id, info in self.library.song_files()]
                 if songs:
-                    print("\nLista de archivos MP3 encontrados:")
-                    for i, song in enumerate(sorted(songs), 1):
+                    print("\nLista de archivos de audio encontrados:")
+                    for i, song in enumerate(songs, 1):
                         print(f"{i}. {song}")
             except:
-                print("No se pudieron listar los archivos MP3")
+                print("No se pudieron listar los archivos de audio")
+
+    @staticmethod
+    def spotify_track_id(track_url):
+        return track_url.split("/track/")[1].split("?")[0]
+
+    def download_spotify_tracks(self, *track_urls):
+        """Descarga varias canciones de Spotify pidiendo sus datos en un solo lote"""
+        if not self.spotify:
+            print("Error: Spotify no está configurado correctamente")
+            return []
+        try:
+            tracks = self.spotify_metadata.tracks(self.spotify_track_id(url) for url in track_urls)
+            song_ids = []
+            with self.catalog.batch():
+                for url in track_urls:
+                    if self.download_cancelled():
+                        print("Descarga cancelada")
+                        break
+                    track = tracks.get(self.spotify_track_id(url))
+                    if not track:
+                        print(f"No se encontró la canción en Spotify: {url}")
+                        song_ids.append(None)
+                        continue
+                    song_ids.append(self.download_spotify_track(url, track))
+            return song_ids
+        except Exception as e:
+            print(f"Error al descargar canciones de Spotify: {e}")
+            return []
 
-    def download_spotify_track(self, track_url):
-        """Descarga una canción individual de Spotify"""
+    def download_spotify_track(self, track_url, track=None):
+        """Descarga una canción individual de Spotify (track: sus datos, si ya se tienen)"""
         if not self.spotify:
             print("Error: Spotify no está configurado correctamente")
             return
         
         try:
             # Extraer el ID de la canción de la URL
-            track_id = track_url.split("/track/")[1].split("?")[0]
+            track_id = self.spotify_track_id(track_url)
             
-            # Obtener información de la canción
-            track = self.spotify.track(track_id)
+            # Obtener información de la canción (caché en disco o API)
+            track = track or self.spotify_metadata.track(track_id)
+            if not track:
+                print(f"No se encontró la canción en Spotify: {track_id}")
+                return None
             song_name = track['name']
-            artist = track['artists'][0]['name']
-            album = track['album']['name']
+            artist = track['artist']
+            album = track['album']
+            sources = track_sources(track)
+            
+            existing = self.find_song_by_sources(sources)
+            if existing:
+                print(f"Ya descargada con ID {existing}: {song_name} - {artist}")
+                return existing
             
             print(f"Buscando: {song_name} - {artist}")
             
             # Buscar en YouTube con términos más específicos
             search_query = f"{song_name} {artist} {album} official audio"
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': os.path.join(self.songs_dir, '%(id)s.%(ext)s'),
-                'quiet': True,
-                'no_warnings': True,
-                'default_search': 'ytsearch',
-                'extract_flat': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                try:
+            try:
+                with self.downloader.ydl_pool.session(SEARCH_PROFILE) as ydl:
                     result = ydl.extract_info(f"ytsearch:{search_query}", download=False)
-                    if result and 'entries' in result and result['entries']:
-                        # Filtrar resultados para evitar podcasts y videos largos
-                        valid_videos = []
-                        for video in result['entries']:
-                            title = video['title'].lower()
-                            duration = video.get('duration', 0)
-                            # Evitar podcasts, entrevistas y videos muy largos
-                            if ('podcast' not in title and 
-                                'interview' not in title and 
-                                'live' not in title and
-                                duration < 600):  # Menos de 10 minutos
-                                valid_videos.append(video)
+                if result and 'entries' in result and result['entries']:
+                    # Filtrar resultados para evitar podcasts y videos largos
+                    valid_videos = []
+                    for video in result['entries']:
+                        title = video['title'].lower()
+                        duration = video.get('duration', 0)
+                        # Evitar podcasts, entrevistas y videos muy largos
+                        if ('podcast' not in title and 
+                            'interview' not in title and 
+                            'live' not in title and
+                            duration < 600):  # Menos de 10 minutos
+                            valid_videos.append(video)
                         
-                        if valid_videos:
-                            video = valid_videos[0]
-                            print(f"Encontrado: {video['title']}")
-                            ydl.download([f"https://www.youtube.com/watch?v={video['id']}"])
-                            # Guardar el título en un archivo de metadatos
-                            self.save_song_metadata(video['id'], video['title'])
-                            print(f"✓ Descargada: {song_name}")
-                            time.sleep(1)
-                            return video['id']
-                        else:
-                            print(f"No se encontró una versión adecuada para: {song_name}")
+                    if valid_videos:
+                        video = valid_videos[0]
+                        print(f"Encontrado: {video['title']}")
+                        sources["youtube"] = video['id']
+                        existing = self.find_song_by_sources(sources)
+                        if existing:
+                            print(f"Ya descargada con ID {existing}")
+                            self.catalog.add_sources(existing, sources)
+                            return existing
+                        song_id = self.downloader.download_video({
+                            'video_id': video['id'],
+                            'title': video['title'],
+                            'url': f"https://www.youtube.com/watch?v={video['id']}",
+                        })
+                        if not song_id:
                             return None
+                        # Guardar el título en un archivo de metadatos
+                        self.save_song_metadata(song_id, video['title'])
+                        self.catalog.add_sources(song_id, sources)
+                        print(f"✓ Descargada: {song_name}")
+                        time.sleep(1)
+                        return song_id
                     else:
-                        print(f"No se encontró el video para: {song_name}")
+                        print(f"No se encontró una versión adecuada para: {song_name}")
                         return None
-                except Exception as e:
-                    print(f"Error al descargar: {e}")
+                else:
+                    print(f"No se encontró el video para: {song_name}")
                     return None
+            except Exception as e:
+                print(f"Error al descargar: {e}")
+                return None
                 
         except Exception as e:
             print(f"Error al descargar canción de Spotify: {e}")
@@ -363,69 +564,90 @@ Comandos disponibles:
             return
         
         try:
-            self.downloading = True
-            self.cancel_download = False
-            
-            # Inicializar el SmartDownloader si no existe
-            if not hasattr(self, 'downloader'):
-                self.downloader = SmartDownloader(self.songs_dir)
-            
             # Extraer el ID de la playlist de la URL
             playlist_id = playlist_url.split("/playlist/")[1].split("?")[0]
             
             # Obtener información de la playlist
-            results = self.spotify.playlist(playlist_id)
+            with self.timings.measure("spotify.playlist"):
+                results = self.spotify.playlist(playlist_id, fields="name,tracks(total)")
             playlist_name = results['name']
             
             print(f"Descargando playlist: {playlist_name}")
+            print(f"Total de canciones: {results['tracks']['total']}")
             
-            # Obtener todas las canciones de la playlist
-            tracks = results['tracks']['items']
-            total_tracks = len(tracks)
-            downloaded_songs = []
+            # Estado de cada pista: si esta playlist ya se importó (o se cortó) se retoma
+            manifest = ImportManifest(os.path.join(self.songs_dir, "imports", f"spotify-{playlist_id}.jsonl"))
+            if len(manifest):
+                counts = manifest.counts()
+                print(f"Reanudando importación: {counts.get(TRANSCODED, 0)} ya descargadas, "
+                      f"{len(manifest) - counts.get(TRANSCODED, 0)} pendientes o fallidas")
             
-            for i, track in enumerate(tracks, 1):
-                if self.cancel_download:
-                    print("\nDescarga cancelada")
-                    # Eliminar archivos parciales
-                    for song_id in downloaded_songs:
-                        try:
-                            os.remove(os.path.join(self.songs_dir, f"{song_id}.mp3"))
-                        except:
-                            pass
-                    return None
-                    
-                try:
-                    song_name = track['track']['name']
-                    artist = track['track']['artists'][0]['name']
-                    album = track['track']['album']['name']
-                    
-                    print(f"\n[{i}/{total_tracks}] Buscando: {song_name} - {artist}")
-                    
-                    # Usar el SmartDownloader para buscar y descargar
-                    song_id = self.downloader.download_by_name(
-                        song_name=song_name,
-                        artist_name=artist,
-                        album_name=album
-                    )
-                    
+            # Las páginas se piden en segundo plano mientras ya se procesan las primeras pistas
+            pipeline = ImportPipeline(
+                self.downloader,
+                should_cancel=self.cancel_check(),
+                lookup=lambda track: self.find_song_by_sources(track_sources(track)),
+                manifest=manifest
+            )
+            tracks = self.spotify_metadata.remember(iter_playlist_tracks(self.spotify, playlist_id))
+            song_ids = pipeline.run(prefetch(tracks))
+            tracks = pipeline.tracks
+            pipeline.report()
+            cache = self.downloader.search_cache.stats()
+            print(f"  caché de búsquedas: {cache['hits']} aciertos, {cache['misses']} fallos")
+            
+            if self.download_cancelled():
+                # Lo descargado se conserva y queda anotado en el manifest
+                print("\nDescarga cancelada. Vuelve a ejecutar el mismo comando para continuar")
+                return None
+            
+            # Las pistas sin coincidencia segura se eligen a mano, en orden.
+            # En segundo plano no se puede preguntar: se dejan para el comando Review
+            needs_review = sorted(pipeline.needs_review, key=lambda r: r[0])
+            deferred = []
+            for index, track, candidates in needs_review:
+                if self.jobs.current() is not None:
+                    deferred.append((track, candidates))
+                    continue
+                print(f"\n[{index + 1}/{len(tracks)}] {track['name']} - {track['artist']}")
+                selected = self.downloader.choose_result(candidates)
+                if selected:
+                    pipeline.video_ids[index] = selected['video_id']
+                    song_ids[index] = self.downloader.download_video(selected)
+                    if song_ids[index]:
+                        manifest.record(track, TRANSCODED, song_id=song_ids[index])
+            
+            downloaded_songs = []
+            # Los metadatos de toda la playlist se escriben en una sola transacción
+            with self.catalog.batch():
+                for track, song_id, video_id in zip(tracks, song_ids, pipeline.video_ids):
                     if song_id:
                         # Guardar metadatos con el título de Spotify
-                        title = f"{song_name} - {artist}"
-                        self.save_song_metadata(song_id, title)
+                        self.save_song_metadata(song_id, f"{track['name']} - {track['artist']}")
+                        self.catalog.add_sources(song_id, {"youtube": video_id, **track_sources(track)})
                         downloaded_songs.append(song_id)
-                        print(f"✓ Descargada: {title}")
                     else:
-                        print(f"No se pudo descargar: {song_name} - {artist}")
-                        
-                except Exception as e:
-                    print(f"\nError al procesar canción: {e}")
-                    continue
+                        print(f"No se pudo descargar: {track['name']} - {track['artist']}")
             
-            if downloaded_songs:
-                # Crear una lista de reproducción con las canciones descargadas
-                playlist_id = self.create_playlist(f"Spotify - {playlist_name}", *downloaded_songs)
-                print(f"\nPlaylist creada con ID: {playlist_id}")
+            if downloaded_songs or deferred:
+                if manifest.playlist_id and self.playlists.exists(manifest.playlist_id):
+                    # Importación repetida: completar la lista que ya se creó
+                    playlist_id = manifest.playlist_id
+                    added = self.playlists.add_songs(playlist_id, downloaded_songs)
+                    print(f"\nPlaylist {playlist_id} actualizada: {len(added)} canciones nuevas")
+                else:
+                    # Crear una lista de reproducción con las canciones descargadas
+                    playlist_id = self.create_playlist(f"Spotify - {playlist_name}", *downloaded_songs)
+                    manifest.set_playlist(playlist_id)
+                    print(f"\nPlaylist creada con ID: {playlist_id}")
+                for track, candidates in deferred:
+                    self.defer_review(
+                        f"{track['name']} - {track['artist']} ({playlist_id})", candidates,
+                        lambda selected, track=track: self.download_review_pick(selected, track, playlist_id, manifest)
+                    )
+                failed = len(tracks) - len(downloaded_songs) - len(deferred)
+                if failed:
+                    print(f"{failed} pistas fallaron: vuelve a ejecutar el mismo comando para reintentarlas")
                 return playlist_id
             else:
                 print("\nNo se pudo descargar ninguna canción de la playlist")
@@ -434,9 +656,6 @@ Comandos disponibles:
         except Exception as e:
             print(f"Error al descargar playlist de Spotify: {e}")
             return None
-        finally:
-            self.downloading = False
-            self.cancel_download = False
             
     def download_spotify_album(self, album_url):
         if not self.spotify:
@@ -445,140 +664,141 @@ Comandos disponibles:
         
         try:
             album_id = album_url.split("/album/")[1].split("?")[0]
-            album = self.spotify.album(album_id)
+            with self.timings.measure("spotify.album"):
+                album = self.spotify.album(album_id)
             album_name = album["name"]
-            tracks = album["tracks"]["items"]
     
             print(f"Descargando álbum: {album_name}")
             
-            downloaded_songs = []
-            for track in tracks:
-                song_name = track["name"]
-                artist = track["artists"][0]["name"]
-                search_query = f"{song_name} {artist} official audio"
-                print(f"Buscando: {song_name} - {artist}")
-                self.download_youtube_video(f"ytsearch:{search_query}")
+            with self.catalog.batch():
+                # spotify.album ya trae la primera página de pistas
+                tracks = iter_album_tracks(self.spotify, album_id, album_name, album.get("tracks"))
+                for track in prefetch(tracks):
+                    if self.download_cancelled():
+                        print("Descarga del álbum cancelada")
+                        return
+                    song_name = track["name"]
+                    artist = track["artist"]
+                    existing = self.find_song_by_sources(track_sources(track))
+                    if existing:
+                        print(f"Ya descargada con ID {existing}: {song_name} - {artist}")
+                        continue
+                    search_query = f"{song_name} {artist} official audio"
+                    print(f"Buscando: {song_name} - {artist}")
+                    self.download_youtube_video(f"ytsearch:{search_query}", sources=track_sources(track))
             
             print(f"Álbum descargado: {album_name}")
         except Exception as e:
             print(f"Error al descargar álbum: {e}")
     
     def save_song_metadata(self, song_id, title):
-        """Guarda los metadatos de la canción en un archivo JSON"""
+        """Guarda los metadatos de la canción en el catálogo"""
         try:
-            metadata_file = os.path.join(self.songs_dir, 'metadata.json')
-            metadata = {}
-            
-            # Cargar metadatos existentes si el archivo existe
-            if os.path.exists(metadata_file):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-            
             # Limpiar el título (eliminar caracteres especiales y extensiones)
             clean_title = title
-            if clean_title.endswith('.mp3'):
-                clean_title = clean_title[:-4]
-            if clean_title.endswith('.webm'):
-                clean_title = clean_title[:-5]
-            
-            # Actualizar metadatos
-            metadata[song_id] = {
-                "title": clean_title,
-                "added_date": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # Guardar metadatos
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            for ext in AUDIO_EXTENSIONS:
+                if clean_title.endswith(f'.{ext}'):
+                    clean_title = clean_title[:-len(ext) - 1]
+            
+            # Formato con el que quedó guardado el archivo
+            with self.timings.measure("download.metadata"):
+                path = self.song_path(song_id)
+                ext = path.rsplit('.', 1)[-1] if path else None
+                codec = CODEC_BY_EXT.get(ext.lower()) if ext else None
+                self.catalog.add(song_id, clean_title, ext=ext, codec=codec)
+            if self._title_index is not None:
+                self._title_index.add(song_id, clean_title)
         except Exception as e:
             print(f"Error al guardar metadatos: {e}")
 
     def get_song_title(self, song_id):
-        """Obtiene el título de una canción desde los metadatos"""
+        """Obtiene el título de una canción desde el catálogo"""
         try:
-            metadata_file = os.path.join(self.songs_dir, 'metadata.json')
-            if os.path.exists(metadata_file):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                    if song_id in metadata:
-                        return metadata[song_id].get("title", f"Canción {song_id}")
-            return f"Canción {song_id}"
+            return self.catalog.get_title(song_id)
         except:
             return f"Canción {song_id}"
 
-    def download_youtube_video(self, video_url):
+    def download_youtube_video(self, video_url, sources=None):
         try:
-            self.downloading = True
-            self.cancel_download = False
-            
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': os.path.join(self.songs_dir, '%(id)s.%(ext)s'),
-                'quiet': True,
-                'no_warnings': True,
-                'progress_hooks': [self.download_progress_hook],
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                if self.cancel_download:
-                    print("Descarga cancelada")
-                    # Eliminar archivo parcial si existe
-                    try:
-                        os.remove(os.path.join(self.songs_dir, f"{info['id']}.mp3"))
-                    except:
-                        pass
-                    return None
-                
-                # Obtener nuevo ID y renombrar el archivo
-                new_id = self.get_next_song_id()
-                old_path = os.path.join(self.songs_dir, f"{info['id']}.mp3")
-                new_path = os.path.join(self.songs_dir, f"{new_id}.mp3")
-                os.rename(old_path, new_path)
+            # Solo el audio original; se convierte (o se guarda tal cual) al final
+            with self.downloader.ydl_pool.session(DOWNLOAD_PROFILE, self.download_progress_hook) as ydl:
+                # Primero solo la información: si el video ya está en la biblioteca no se descarga
+                with self.timings.measure("download.search"):
+                    info = ydl.extract_info(video_url, download=False)
+                if info and info.get('entries') is not None:  # Búsqueda (ytsearch:)
+                    entries = [entry for entry in info['entries'] if entry]
+                    if not entries:
+                        print("No se encontraron resultados")
+                        return None
+                    info = entries[0]
+                sources = {**(sources or {}), "youtube": info['id']}
+                existing = self.find_song_by_sources(sources)
+                if existing:
+                    print(f"Ya descargada con ID {existing}: {info.get('title', info['id'])}")
+                    self.catalog.add_sources(existing, sources)
+                    return existing
                 
-                # Guardar metadatos con el título del video
-                title = info.get('title', f'Video {info["id"]}')
-                self.save_song_metadata(new_id, title)
-                print(f"Canción descargada con ID: {new_id}")
-                print(f"Título: {title}")
-                time.sleep(1)
-                return new_id
+                with self.timings.measure("download.fetch"):
+                    info = ydl.process_ie_result(info, download=True)
+                source_path = ydl.prepare_filename(info)
+            # La sesión se devuelve al pool aquí: la conversión no la necesita
+            # y otros trabajos pueden usarla mientras tanto
+            if self.download_cancelled():
+                print("Descarga cancelada")
+                # Eliminar archivo parcial si existe
+                try:
+                    os.remove(source_path)
+                except:
+                    pass
+                return None
+            
+            # Obtener nuevo ID y guardar el audio con ese nombre
+            new_id = self.get_next_song_id()
+            if not self.downloader.finalize(source_path, new_id):
+                return None
+            
+            # Guardar metadatos con el título del video
+            title = info.get('title', f'Video {info["id"]}')
+            self.save_song_metadata(new_id, title)
+            self.catalog.add_sources(new_id, sources)
+            print(f"Canción descargada con ID: {new_id}")
+            print(f"Título: {title}")
+            time.sleep(1)
+            return new_id
         except Exception as e:
-            print(f"Error al descargar video: {e}")
+            if self.download_cancelled():
+                print("Descarga cancelada")
+            else:
+                print(f"Error al descargar video: {e}")
             return None
-        finally:
-            self.downloading = False
-            self.cancel_download = False
 
     def download_progress_hook(self, d):
-        """Hook para mostrar el progreso de la descarga"""
+        """Hook para mostrar el progreso de la descarga
+
+        Dentro de un trabajo en segundo plano el progreso se guarda en el
+        trabajo (se ve con Jobs) en lugar de imprimirse encima del prompt, y
+        si el trabajo se cancela se corta la descarga.
+        """
+        job = self.jobs.current()
+        if job is not None and job.cancelled:
+            from yt_dlp.utils import DownloadCancelled
+            raise DownloadCancelled()
         if d['status'] == 'downloading':
-            if 'total_bytes' in d:
-                total = d['total_bytes']
-                downloaded = d['downloaded_bytes']
-                percentage = (downloaded / total) * 100
-                print(f"\rDescargando: {percentage:.1f}%", end='', flush=True)
-            elif 'total_bytes_estimate' in d:
-                total = d['total_bytes_estimate']
-                downloaded = d['downloaded_bytes']
-                percentage = (downloaded / total) * 100
-                print(f"\rDescargando: {percentage:.1f}%", end='', flush=True)
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                percentage = (d['downloaded_bytes'] / total) * 100
+                if job is not None:
+                    job.progress = f"{percentage:.1f}%"
+                else:
+                    print(f"\rDescargando: {percentage:.1f}%", end='', flush=True)
         elif d['status'] == 'finished':
-            print("\nDescarga completada, procesando...")
+            if job is not None:
+                job.progress = "procesando"
+            else:
+                print("\nDescarga completada, procesando...")
 
     def create_playlist(self, playlist_name, *songs):
-        playlist_id = f"{len(os.listdir(self.lists_dir)) + 1}L"
-        playlist_data = {
-            "name": playlist_name,
-            "songs": list(songs)
-        }
-        with open(os.path.join(self.lists_dir, f"{playlist_id}.json"), "w") as f:
-            json.dump(playlist_data, f)
+        playlist_id = self.playlists.create(playlist_name, songs)
         print(f"Lista creada con ID: {playlist_id}")
         return playlist_id
 
@@ -588,14 +808,15 @@ Comandos disponibles:
             return False
         try:
             # Verificar si es una lista o una canción
-            if item_id.endswith('L'):  # Es una lista
-                os.remove(os.path.join(self.lists_dir, f"{item_id}.json"))
+            if self.playlists.is_playlist_id(item_id):  # Es una lista
+                item_id = self.playlists.normalize_id(item_id)
+                self.playlists.delete(item_id)
                 print(f"Lista {item_id} eliminada")
             else:  # Es una canción
-                # Eliminar el archivo MP3
-                mp3_path = os.path.join(self.songs_dir, f"{item_id}.mp3")
-                if os.path.exists(mp3_path):
-                    os.remove(mp3_path)
+                # Eliminar el archivo de audio
+                song_path = self.song_path(item_id)
+                if song_path:
+                    os.remove(song_path)
                     # Eliminar de los metadatos
                     self.remove_song_metadata(item_id)
                     # Eliminar de todas las listas
@@ -608,113 +829,245 @@ Comandos disponibles:
             print(f"Error al eliminar: {e}")
             return False
 
+    def find_duplicate_songs(self):
+        """Busca archivos de audio idénticos en Songs/ (hash por bloques con mmap)"""
+        try:
+            from dedup import find_duplicates
+            paths = [os.path.join(self.songs_dir, f"{song_id}.{info.ext}")
+                     for song_id, info in self.library.song_files()]
+            print(f"Analizando {len(paths)} canciones...")
+            groups = find_duplicates(paths)
+            if not groups:
+                print("No se encontraron canciones duplicadas")
+                return []
+
+            print(f"\nSe encontraron {len(groups)} grupos de duplicados:")
+            for i, group in enumerate(groups, 1):
+                print(f"\n{i}.")
+                for path in group:
+                    song_id = os.path.splitext(os.path.basename(path))[0]
+                    lists = sorted(self.playlists.playlists_containing(song_id), key=lambda x: (len(x), x))
+                    in_lists = f" (en {', '.join(lists)})" if lists else ""
+                    print(f"   {song_id}: {self.get_song_title(song_id)}{in_lists}")
+            print("\nPuedes eliminar las copias con: Delete_Songs [contraseña] [id1] [id2] ...")
+            return groups
+        except Exception as e:
+            print(f"Error al buscar duplicados: {e}")
+            return []
+
     def remove_song_metadata(self, song_id):
-        """Elimina una canción de los metadatos"""
+        """Elimina una canción del catálogo"""
         try:
-            metadata_file = os.path.join(self.songs_dir, 'metadata.json')
-            if os.path.exists(metadata_file):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                if song_id in metadata:
-                    del metadata[song_id]
-                    
-                    with open(metadata_file, 'w', encoding='utf-8') as f:
-                        json.dump(metadata, f, ensure_ascii=False, indent=2)
+            self.catalog.remove(song_id)
+            if self._title_index is not None:
+                self._title_index.remove(song_id)
         except Exception as e:
             print(f"Error al eliminar metadatos: {e}")
 
-    def remove_song_from_playlists(self, song_id):
-        """Elimina una canción de todas las listas de reproducción"""
+    def remove_song_from_playlists(self, *song_ids):
+        """Elimina canciones de las listas que las contienen (índice inverso)"""
         try:
-            for playlist_file in os.listdir(self.lists_dir):
-                playlist_path = os.path.join(self.lists_dir, playlist_file)
-                with open(playlist_path, "r") as f:
-                    playlist = json.load(f)
-                
-                if song_id in playlist['songs']:
-                    playlist['songs'].remove(song_id)
-                    with open(playlist_path, "w") as f:
-                        json.dump(playlist, f, indent=2)
+            return self.playlists.remove_songs_everywhere(song_ids)
         except Exception as e:
             print(f"Error al eliminar canción de las listas: {e}")
+            return {}
+
+    def delete_songs(self, password, *song_ids):
+        """Elimina varias canciones: cada lista afectada se actualiza una sola vez"""
+        if password != ADMIN_PASSWORD:
+            print("Contraseña incorrecta")
+            return False
+        if not song_ids:
+            print("Uso: delete_songs [contraseña] [id1] [id2] ...")
+            return False
+        try:
+            deleted = []
+            for song_id in dict.fromkeys(song_ids):
+                song_path = self.song_path(song_id)
+                if song_path:
+                    os.remove(song_path)
+                    self.remove_song_metadata(song_id)
+                    deleted.append(song_id)
+                else:
+                    print(f"No se encontró la canción {song_id}")
+            if not deleted:
+                return False
+
+            touched = self.remove_song_from_playlists(*deleted)
+            print(f"Eliminadas {len(deleted)} canciones")
+            for playlist_id, removed in touched.items():
+                print(f"  {playlist_id}: {removed} canciones quitadas")
+            return True
+        except Exception as e:
+            print(f"Error al eliminar canciones: {e}")
+            return False
 
     def play_playlist(self, playlist_id):
         try:
-            with open(os.path.join(self.lists_dir, f"{playlist_id}.json"), "r") as f:
-                playlist = json.load(f)
+            playlist_id = self.playlists.normalize_id(playlist_id)
+            playlist = self.playlists.get(playlist_id)
             
-            self.current_playlist = playlist["songs"]
-            self.played_songs = set()
-            print(f"Reproduciendo lista: {playlist['name']}")
-            
-            # Detener el hilo anterior si existe
-            self.is_playing = False
-            if self.check_thread and self.check_thread.is_alive():
-                self.check_thread.join()
-            
-            # Iniciar reproducción
-            self.is_playing = True
-            self.play_next_song()
-            
-            # Iniciar el hilo de verificación
-            self.check_thread = threading.Thread(target=self.check_song_end)
-            self.check_thread.daemon = True  # El hilo se cerrará cuando el programa principal termine
-            self.check_thread.start()
+            with self._playback_lock:
+                self.stop_stream()
+                self.current_playlist = list(playlist.songs)
+                self.current_playlist_id = playlist_id
+                # Reanudar la pasada aleatoria donde se dejó, si la lista no ha cambiado
+                self.shuffle = ShuffleQueue.resume(
+                    self.current_playlist,
+                    self.catalog.load_shuffle(playlist_id),
+                    weight=self.shuffle_weight()
+                )
+                self._shuffle_saved_order = None
+                # La encolada era de la lista anterior
+                self.queued_song = None
+                print(f"Reproduciendo lista: {playlist.name}")
+                
+                # Iniciar reproducción
+                self.start_end_watcher()
+                self.is_playing = True
+                self.play_next_song()
             
         except Exception as e:
             print(f"Error al reproducir playlist: {e}")
 
-    def check_song_end(self):
-        """Verifica si la canción actual ha terminado y reproduce la siguiente"""
-        while self.is_playing:
-            if not pygame.mixer.music.get_busy() and self.current_playlist:
+    def start_end_watcher(self):
+        """Activa el aviso de fin de pista del backend (por eventos, sin sondeo)"""
+        if self.end_watcher:
+            return
+        if hasattr(self.music, "set_end_callback"):
+            self.music.set_end_callback(self.on_track_end)
+            self.end_watcher = self.music
+        else:
+            self.end_watcher = PygameEndWatcher(self.music, self.on_track_end)
+            self.end_watcher.start()
+
+    def on_track_end(self):
+        """Se llama cuando el backend avisa de que ha terminado una pista"""
+        with self._playback_lock:
+            if not self.is_playing:
+                return
+            if self.queued_song is not None:
+                # La canción encolada ya está sonando sin hueco; encolar la siguiente
+                self.current_song = self.queued_song
+                self.apply_song_volume()
+                self.catalog.record_play(self.current_song)
+                print(f"\nReproduciendo: {self.get_song_title(self.current_song)}")
+                self.queue_next_song()
+            elif self.music.get_busy():
+                return  # Aviso de una pista que se cambió a mano
+            elif self.current_playlist:
                 self.play_next_song()
-            time.sleep(1)  # Verificar cada segundo
+            else:
+                self.is_playing = False
 
-    def play_next_song(self):
-        if not self.current_playlist:
-            self.is_playing = False
-            return
+    def shuffle_weight(self):
+        """Función de peso para el aleatorio según SHUFFLE_WEIGHTING (None = uniforme)"""
+        if SHUFFLE_WEIGHTING == "play_count":
+            # Las menos escuchadas salen antes
+            return lambda song_id: 1.0 / (1 + (self.catalog.get(song_id) or {}).get("play_count", 0))
+        if SHUFFLE_WEIGHTING == "recency":
+            # Las que hace más tiempo que no suenan salen antes (máximo a los 30 días)
+            now = time.time()
+            def weight(song_id):
+                last_played = (self.catalog.get(song_id) or {}).get("last_played")
+                if not last_played:
+                    return 30.0
+                return 1.0 + min((now - last_played) / 86400, 29.0)
+            return weight
+        return None
 
-        available_songs = [s for s in self.current_playlist if s not in self.played_songs]
-        if not available_songs:
-            self.played_songs.clear()
-            available_songs = self.current_playlist
+    def pick_next_song(self, queued=False):
+        """Elige la siguiente canción aleatoria sin repetir hasta agotar la lista
 
-        next_song = random.choice(available_songs)
-        self.played_songs.add(next_song)
-        
+        queued: la canción solo se encola y aún no suena. La posición guardada
+        cuenta las que sonaron, así que tras Stop o un reinicio la encolada no
+        se da por escuchada y vuelve a salir.
+        """
+        if self.shuffle is None:
+            self.shuffle = ShuffleQueue(self.current_playlist, weight=self.shuffle_weight())
+        next_song = self.shuffle.next()
+
+        # Guardar la posición para reanudar tras reiniciar
+        if self.current_playlist_id:
+            try:
+                cursor = self.shuffle.cursor - 1 if queued else self.shuffle.cursor
+                if self._shuffle_saved_order is not self.shuffle.order:
+                    self.catalog.save_shuffle(self.current_playlist_id, dict(self.shuffle.state(), cursor=cursor))
+                    self._shuffle_saved_order = self.shuffle.order
+                else:
+                    self.catalog.save_shuffle_cursor(self.current_playlist_id, cursor)
+            except Exception as e:
+                print(f"Error al guardar la posición aleatoria: {e}")
+        return next_song
+
+    def queue_next_song(self, next_song=None):
+        """Deja la siguiente canción encolada en el backend para una transición sin silencio
+
+        next_song es la que ya estaba elegida (y encolada) antes de cargar otra
+        pista a mano; así no se gasta otro hueco de la pasada aleatoria.
+        """
+        self.queued_song = None
+        if not self.current_playlist:
+            return
+        if next_song is None:
+            next_song = self.pick_next_song(queued=True)
         try:
-            pygame.mixer.music.load(os.path.join(self.songs_dir, f"{next_song}.mp3"))
-            pygame.mixer.music.play()
-            title = self.get_song_title(next_song)
-            print(f"Reproduciendo: {title}")
+            self.music.queue(self.playable_path(next_song))
+            self.queued_song = next_song
         except Exception as e:
-            print(f"Error al reproducir canción: {e}")
-            self.is_playing = False
+            print(f"Error al encolar canción: {e}")
+
+    def play_next_song(self):
+        with self._playback_lock:
+            if not self.current_playlist:
+                self.is_playing = False
+                return
+
+            # Un Next a mano salta a la que ya estaba encolada: volver a elegir
+            # la saltaría y gastaría dos huecos de la pasada aleatoria
+            next_song = self.queued_song
+            self.queued_song = None
+            if next_song is None:
+                next_song = self.pick_next_song()
+            
+            try:
+                self.start_end_watcher()
+                self.is_playing = True
+                self.music.load(self.playable_path(next_song))
+                self.current_song = next_song
+                self.apply_song_volume()
+                self.music.play()
+                self.catalog.record_play(next_song)
+                title = self.get_song_title(next_song)
+                print(f"Reproduciendo: {title}")
+                self.queue_next_song()
+            except Exception as e:
+                print(f"Error al reproducir canción: {e}")
+                self.is_playing = False
 
     def play_song(self, song_id):
         try:
-            # Detener el hilo anterior si existe
-            self.is_playing = False
-            if self.check_thread and self.check_thread.is_alive():
-                self.check_thread.join()
-            
-            # Iniciar reproducción
-            self.is_playing = True
-            pygame.mixer.music.load(os.path.join(self.songs_dir, f"{song_id}.mp3"))
-            pygame.mixer.music.play()
-            title = self.get_song_title(song_id)
-            print(f"Reproduciendo: {title}")
-            
-            # Iniciar el hilo de verificación
-            self.check_thread = threading.Thread(target=self.check_song_end)
-            self.check_thread.daemon = True
-            self.check_thread.start()
+            with self._playback_lock:
+                self.stop_stream()
+                # load() descarta la encolada; se vuelve a encolar la misma después
+                queued = self.queued_song if self.queued_song != song_id else None
+                # Iniciar reproducción
+                self.start_end_watcher()
+                self.is_playing = True
+                self.music.load(self.playable_path(song_id))
+                self.current_song = song_id
+                self.apply_song_volume()
+                self.music.play()
+                self.catalog.record_play(song_id)
+                title = self.get_song_title(song_id)
+                print(f"Reproduciendo: {title}")
+                
+                # Si había una lista sonando, continuar con ella al terminar
+                self.queue_next_song(queued)
             
         except Exception as e:
             print(f"Error al reproducir canción: {e}")
+            self.is_playing = False
 
     def set_volume(self, volume_str):
         """Ajusta el volumen del reproductor (0-100)"""
@@ -724,37 +1077,56 @@ Comandos disponibles:
             volume = min(volume, 3.0)
             if 0 <= volume <= 3.0:
                 self.volume = volume
-                pygame.mixer.music.set_volume(volume)
+                self.apply_song_volume()
+                if self.stream:
+                    self.stream.set_volume(volume)
                 print(f"Volumen ajustado a {int(volume * 100)}%")
             else:
                 print("El volumen debe estar entre 0 y 50")
         except ValueError:
             print("Por favor, introduce un número entre 0 y 50")
 
+    def max_volume(self):
+        """Volumen máximo que aplica el motor: mpv amplifica hasta 3.0
+        (--volume-max=300); pygame y predecode recortan a 1.0"""
+        return 3.0 if isinstance(self.music, MPVMusic) else 1.0
+
+    def song_volume(self, song_id):
+        """Volumen para una canción: el del usuario corregido con su ganancia de sonoridad
+
+        La ganancia se aplica sobre el volumen que el motor usa de verdad; con
+        pygame un volumen de 2.0 suena como 1.0 y, si se multiplicara antes de
+        recortar, todas las pistas de 0 a -6 dB acabarían sonando igual.
+        """
+        volume = min(self.volume, self.max_volume())
+        song = self.catalog.get(song_id) if song_id else None
+        gain_db = song.get("gain_db") if song else None
+        if not NORMALIZE_LOUDNESS or gain_db is None:
+            return volume
+        return min(volume * 10 ** (gain_db / 20), self.max_volume())
+
+    def apply_song_volume(self):
+        self.music.set_volume(self.song_volume(self.current_song))
+
     def check_playlist(self, playlist_id):
         """Verifica que todas las canciones de una lista existan"""
         try:
             # Verificar que la lista existe
-            if not playlist_id.endswith('L'):
-                playlist_id = f"{playlist_id}L"
-            
-            playlist_path = os.path.join(self.lists_dir, f"{playlist_id}.json")
-            if not os.path.exists(playlist_path):
+            playlist_id = self.playlists.normalize_id(playlist_id)
+            if not self.playlists.exists(playlist_id):
                 print(f"Error: La lista {playlist_id} no existe")
                 return False
 
             # Cargar la lista
-            with open(playlist_path, "r") as f:
-                playlist = json.load(f)
+            playlist = self.playlists.get(playlist_id)
             
-            print(f"\nVerificando lista: {playlist['name']}")
-            print(f"Total de canciones: {len(playlist['songs'])}")
+            print(f"\nVerificando lista: {playlist.name}")
+            print(f"Total de canciones: {len(playlist)}")
             
             # Verificar cada canción
             missing_songs = []
-            for song_id in playlist['songs']:
-                song_path = os.path.join(self.songs_dir, f"{song_id}.mp3")
-                if not os.path.exists(song_path):
+            for song_id in playlist.songs:
+                if not self.song_path(song_id):
                     missing_songs.append(song_id)
                     print(f"❌ Canción no encontrada: {self.get_song_title(song_id)} (ID: {song_id})")
                 else:
@@ -769,10 +1141,8 @@ Comandos disponibles:
                 # Preguntar si quiere eliminar las canciones faltantes
                 response = input("\n¿Deseas eliminar las canciones faltantes de la lista? (s/n): ")
                 if response.lower() == 's':
-                    playlist['songs'] = [s for s in playlist['songs'] if s not in missing_songs]
-                    with open(playlist_path, "w") as f:
-                        json.dump(playlist, f, indent=2)
-                    print(f"✅ Lista actualizada. Canciones restantes: {len(playlist['songs'])}")
+                    self.playlists.remove_songs(playlist_id, missing_songs)
+                    print(f"✅ Lista actualizada. Canciones restantes: {len(playlist)}")
             else:
                 print("\n✅ Todas las canciones están presentes en la lista")
             
@@ -784,72 +1154,253 @@ Comandos disponibles:
     def stop_playback(self):
         """Detiene la reproducción actual"""
         try:
-            self.is_playing = False
-            if self.check_thread and self.check_thread.is_alive():
-                self.check_thread.join()
-            pygame.mixer.music.stop()
-            self.current_playlist = []
-            self.played_songs.clear()
+            with self._playback_lock:
+                self.stop_stream()
+                self.is_playing = False
+                self.queued_song = None
+                # unload() descarta también la pista encolada sin publicar el fin de pista
+                if hasattr(self.music, "unload"):
+                    self.music.unload()
+                else:
+                    self.music.stop()
+                self.current_playlist = []
+                self.current_playlist_id = None
+                self.shuffle = None
             print("Reproducción detenida")
         except Exception as e:
             print(f"Error al detener la reproducción: {e}")
 
-    def cancel_current_download(self):
-        """Cancela la descarga actual"""
-        if self.downloading:
-            self.cancel_download = True
-            print("Cancelando descarga...")
-        else:
-            print("No hay ninguna descarga en progreso")
+    def stream_song(self, *query):
+        """Empieza a sonar mientras se descarga; al terminar se guarda en la biblioteca"""
+        if not query:
+            print("Uso: stream <url_youtube | nombre de la canción>")
+            return
+        threading.Thread(target=self._stream_song, args=(" ".join(query), time.perf_counter()),
+                         daemon=True).start()
 
-    def load_song_counter(self):
-        """Carga o crea el contador de IDs de canciones"""
+    def _stream_song(self, query, requested_at):
         try:
-            if os.path.exists(self.song_counter_file):
-                with open(self.song_counter_file, 'r') as f:
-                    return json.load(f)
-            else:
-                # Crear el directorio Songs si no existe
-                os.makedirs(self.songs_dir, exist_ok=True)
-                # Inicializar el contador
-                counter = {"next_id": 1}
-                with open(self.song_counter_file, 'w') as f:
-                    json.dump(counter, f)
-                return counter
+            from progressive import GrowingFileReader, ProgressivePlayer, StreamingDownload
+            url = query if query.startswith("http") else f"ytsearch1:{query}"
+            with self.downloader.ydl_pool.session(STREAM_PROFILE) as ydl:
+                info = ydl.extract_info(url, download=False)
+            if info and info.get('entries') is not None:
+                entries = [entry for entry in info['entries'] if entry]
+                if not entries:
+                    print("No se encontraron resultados")
+                    return
+                info = entries[0]
+            title = info.get('title', info['id'])
+            
+            existing = self.find_song_by_sources({"youtube": info['id']})
+            if existing:
+                self.play_song(existing)
+                return
+            
+            source_path = os.path.join(self.songs_dir, f"{info['id']}.src.{info.get('ext', 'webm')}")
+            download = StreamingDownload(info['url'], source_path + ".part", info.get('http_headers')).start()
+            self.stop_playback()
+            with self._playback_lock:
+                self.stream = ProgressivePlayer(GrowingFileReader(download), volume=self.volume)
+                self.stream.start(started_at=requested_at)
+            print(f"Reproduciendo (descargando): {title}")
+            
+            if not download.wait():
+                print(f"Error al descargar {title}: {download.error}")
+                return
+            os.replace(source_path + ".part", source_path)
+            new_id = self.get_next_song_id()
+            if self.downloader.finalize(source_path, new_id):
+                self.save_song_metadata(new_id, title)
+                self.catalog.add_sources(new_id, {"youtube": info['id']})
+                print(f"\nCanción guardada con ID: {new_id}")
         except Exception as e:
-            print(f"Error al cargar el contador: {e}")
-            return {"next_id": 1}
+            print(f"Error al reproducir en streaming: {e}")
+
+    def stop_stream(self):
+        """Corta el audio de Stream (la descarga sigue y se guarda igualmente)"""
+        if self.stream:
+            self.stream.stop()
+            self.stream = None
+
+    def download_cancelled(self):
+        """True si se canceló el trabajo en segundo plano que ejecuta este hilo"""
+        job = self.jobs.current()
+        return job is not None and job.cancelled
+
+    def cancel_check(self):
+        """Como download_cancelled, pero sirve desde otros hilos (p. ej. los del ImportPipeline)
+
+        El trabajo se toma ahora, en el hilo que lo ejecuta; download_cancelled
+        llamado desde un hilo del pipeline no encontraría ningún trabajo.
+        """
+        job = self.jobs.current()
+        return lambda: job is not None and job.cancelled
+
+    def run_in_background(self, description, func, *args, priority=PRIORITY_HIGH):
+        job = self.jobs.submit(description, func, *args, priority=priority)
+        print(f"Trabajo {job.id} en cola: {description}")
+        return job.id
+
+    def queue_youtube_download(self, video_url):
+        return self.run_in_background(f"YouTube {video_url}", self.download_youtube_video, video_url)
 
-    def save_song_counter(self):
-        """Guarda el contador de IDs de canciones"""
+    def queue_spotify_download(self, *urls):
+        """Encola canciones, playlists o álbumes de Spotify según la URL
+
+        Varias canciones a la vez van en un solo trabajo para pedir sus datos
+        a Spotify en un único lote.
+        """
+        if not urls:
+            print("Uso: download_spotify <url> [url2] ...")
+            return None
+        track_urls = [url for url in urls if "/track/" in url]
+        job_ids = [self.queue_spotify_url(url) for url in urls if url not in track_urls]
+        if len(track_urls) == 1:
+            job_ids.append(self.queue_spotify_url(track_urls[0]))
+        elif track_urls:
+            job_ids.append(self.run_in_background(f"Canciones de Spotify ({len(track_urls)})",
+                                                  self.download_spotify_tracks, *track_urls))
+        return job_ids[0] if len(job_ids) == 1 else job_ids
+
+    def queue_spotify_url(self, url):
+        if "/playlist/" in url:
+            return self.run_in_background(f"Playlist {url}", self.download_spotify_playlist, url,
+                                          priority=PRIORITY_LOW)
+        if "/album/" in url:
+            return self.run_in_background(f"Álbum {url}", self.download_spotify_album, url,
+                                          priority=PRIORITY_LOW)
+        if "/track/" in url:
+            return self.run_in_background(f"Canción {url}", self.download_spotify_track, url)
+        print("URL de Spotify no reconocida. Debe ser una canción, playlist o álbum.")
+        return None
+
+    def queue_analysis(self, *args):
+        force = bool(args) and args[0] == "all"
+        return self.run_in_background("Análisis de audio", self.analyze_library, force,
+                                      priority=PRIORITY_LOW)
+
+    def analyze_library(self, force=False):
+        """Mide duración, bitrate y sonoridad en paralelo (un proceso por núcleo)"""
         try:
-            with open(self.song_counter_file, 'w') as f:
-                json.dump(self.song_counter, f)
+            from analysis import LibraryAnalyzer
+            analyzer = LibraryAnalyzer(self.catalog, self.library)
+
+            def progress(done, total):
+                job = self.jobs.current()
+                if job:
+                    job.progress = f"{done}/{total}"
+
+            result = analyzer.run(force, should_cancel=self.download_cancelled, progress=progress)
+            print(f"\nAnálisis: {result['analyzed']} analizadas, {result['failed']} con error, "
+                  f"{result['skipped']} sin cambios")
+            return result
         except Exception as e:
-            print(f"Error al guardar el contador: {e}")
+            print(f"\nError al analizar la biblioteca: {e}")
+            return None
+
+    def queue_search(self, *args):
+        if not args:
+            print("Uso: search <nombre_canción> [artista] [álbum]")
+            return None
+        return self.run_in_background(f"Búsqueda {' '.join(args)}", self.search_song, *args)
+
+    def show_jobs(self):
+        """Muestra los trabajos en segundo plano"""
+        jobs = self.jobs.jobs()
+        if not jobs:
+            print("No hay trabajos")
+            return
+        print("\nTrabajos:")
+        for job in jobs:
+            progress = f" {job.progress}" if job.progress and not job.finished else ""
+            elapsed = f" {job.elapsed():.0f}s" if job.started_at else ""
+            error = f" ({job.error})" if job.error else ""
+            print(f"  {job.id:>3} [{job.status}{progress}] p{job.priority}{elapsed} {job.description}{error}")
+        with self._reviews_lock:
+            if self.pending_reviews:
+                print(f"\n{len(self.pending_reviews)} coincidencias pendientes de elegir (usa Review)")
+
+    def cancel_job(self, job_id=None):
+        """Cancela un trabajo, o todos los pendientes si no se indica ID"""
+        if job_id is None:
+            active = self.jobs.active()
+            if not active:
+                print("No hay ninguna descarga en progreso")
+                return
+            for job in active:
+                self.jobs.cancel(job.id)
+            print(f"Cancelando {len(active)} trabajos...")
+            return
+        try:
+            if self.jobs.cancel(int(job_id)):
+                print(f"Cancelando trabajo {job_id}...")
+            else:
+                print(f"El trabajo {job_id} no existe o ya terminó")
+        except ValueError:
+            print("Uso: cancel [id_trabajo]")
+
+    def set_job_priority(self, job_id, priority):
+        try:
+            if self.jobs.set_priority(int(job_id), int(priority)):
+                print(f"Prioridad del trabajo {job_id}: {priority}")
+            else:
+                print(f"El trabajo {job_id} no existe o ya empezó")
+        except ValueError:
+            print("Uso: priority [id_trabajo] [0-10]")
+
+    def defer_review(self, label, candidates, on_pick):
+        """Guarda una coincidencia dudosa para elegirla luego con Review"""
+        with self._reviews_lock:
+            self.pending_reviews.append((label, candidates, on_pick))
+        print(f"\nCoincidencia dudosa para {label}: usa Review para elegir")
+
+    def download_review_pick(self, selected, track, playlist_id, manifest=None):
+        """Descarga la opción elegida en Review y la añade a su playlist"""
+        song_id = self.downloader.download_video(selected)
+        if song_id:
+            if manifest is not None:
+                manifest.record(track, TRANSCODED, song_id=song_id)
+            self.save_song_metadata(song_id, f"{track['name']} - {track['artist']}")
+            self.catalog.add_sources(song_id, {"youtube": selected['video_id'], **track_sources(track)})
+            self.playlists.add_songs(playlist_id, [song_id])
+        return song_id
+
+    def review_pending(self):
+        """Elige a mano las coincidencias dudosas y encola su descarga"""
+        with self._reviews_lock:
+            reviews, self.pending_reviews = self.pending_reviews, []
+        if not reviews:
+            print("No hay coincidencias pendientes")
+            return
+        for i, (label, candidates, on_pick) in enumerate(reviews):
+            print(f"\n[{i + 1}/{len(reviews)}] {label}")
+            try:
+                selected = self.downloader.choose_result(candidates)
+            except KeyboardInterrupt:
+                # Lo que quede sin revisar vuelve a la lista
+                with self._reviews_lock:
+                    self.pending_reviews[:0] = reviews[i:]
+                print()
+                return
+            if selected:
+                self.run_in_background(f"Descarga {selected['title']}", on_pick, selected)
 
     def get_next_song_id(self):
         """Obtiene el siguiente ID de canción disponible"""
-        song_id = str(self.song_counter["next_id"])
-        self.song_counter["next_id"] += 1
-        self.save_song_counter()
-        return song_id
+        return self.catalog.next_song_id(self.library.exists)
 
     def edit_playlist(self, playlist_id, action, *song_ids):
         """Edita una lista de reproducción existente"""
         try:
             # Verificar que la lista existe
-            if not playlist_id.endswith('L'):
-                playlist_id = f"{playlist_id}L"
-            
-            playlist_path = os.path.join(self.lists_dir, f"{playlist_id}.json")
-            if not os.path.exists(playlist_path):
+            playlist_id = self.playlists.normalize_id(playlist_id)
+            if not self.playlists.exists(playlist_id):
                 print(f"Error: La lista {playlist_id} no existe")
                 return False
 
             # Cargar la lista
-            with open(playlist_path, "r") as f:
-                playlist = json.load(f)
+            playlist = self.playlists.get(playlist_id)
             
             # Verificar la acción
             action = action.lower()
@@ -860,33 +1411,24 @@ Comandos disponibles:
             # Verificar que las canciones existen
             valid_songs = []
             for song_id in song_ids:
-                song_path = os.path.join(self.songs_dir, f"{song_id}.mp3")
-                if not os.path.exists(song_path):
+                if not self.song_path(song_id):
                     print(f"Advertencia: La canción {song_id} no existe")
                 else:
                     valid_songs.append(song_id)
 
-            # Realizar la acción
+            # Realizar la acción (se guarda como una operación en el registro de la lista)
             if action == 'add':
                 # Añadir canciones (evitando duplicados)
-                for song_id in valid_songs:
-                    if song_id not in playlist['songs']:
-                        playlist['songs'].append(song_id)
-                print(f"✓ Añadidas {len(valid_songs)} canciones a la lista")
+                added = self.playlists.add_songs(playlist_id, valid_songs)
+                print(f"✓ Añadidas {len(added)} canciones a la lista")
             else:  # remove
                 # Eliminar canciones
-                original_count = len(playlist['songs'])
-                playlist['songs'] = [s for s in playlist['songs'] if s not in valid_songs]
-                removed_count = original_count - len(playlist['songs'])
+                removed_count = self.playlists.remove_songs(playlist_id, valid_songs)
                 print(f"✓ Eliminadas {removed_count} canciones de la lista")
-
-            # Guardar la lista actualizada
-            with open(playlist_path, "w") as f:
-                json.dump(playlist, f, indent=2)
             
             # Mostrar resumen
-            print(f"\nLista actualizada: {playlist['name']}")
-            print(f"Total de canciones: {len(playlist['songs'])}")
+            print(f"\nLista actualizada: {playlist.name}")
+            print(f"Total de canciones: {len(playlist)}")
             return True
 
         except Exception as e:
@@ -897,33 +1439,22 @@ Comandos disponibles:
         """Muestra el contenido detallado de una lista de reproducción"""
         try:
             # Verificar que la lista existe
-            if not playlist_id.endswith('L'):
-                playlist_id = f"{playlist_id}L"
-            
-            playlist_path = os.path.join(self.lists_dir, f"{playlist_id}.json")
-            if not os.path.exists(playlist_path):
+            playlist_id = self.playlists.normalize_id(playlist_id)
+            if not self.playlists.exists(playlist_id):
                 print(f"Error: La lista {playlist_id} no existe")
                 return False
 
             # Cargar la lista
-            with open(playlist_path, "r") as f:
-                playlist = json.load(f)
-            
-            # Cargar metadatos
-            metadata_file = os.path.join(self.songs_dir, 'metadata.json')
-            metadata = {}
-            if os.path.exists(metadata_file):
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+            playlist = self.playlists.get(playlist_id)
             
-            print(f"\nLista: {playlist['name']}")
+            print(f"\nLista: {playlist.name}")
             print(f"ID: {playlist_id}")
-            print(f"Total de canciones: {len(playlist['songs'])}")
+            print(f"Total de canciones: {len(playlist)}")
             print("\nCanciones:")
             
-            for i, song_id in enumerate(playlist['songs'], 1):
-                if song_id in metadata:
-                    song_info = metadata[song_id]
+            for i, song_id in enumerate(playlist.songs, 1):
+                song_info = self.catalog.get(song_id)
+                if song_info:
                     title = song_info.get("title", f"Canción {song_id}")
                     added_date = song_info.get("added_date", "Fecha desconocida")
                     print(f"{i}. {title}")
@@ -953,3 +1484,15 @@ if __name__ == "__main__":
             break
         except Exception as e:
             print(f"Error: {e}")
+
+    player.catalog.close()
+    player.playlists.close()
+    if player._downloader:
+        player._downloader.close()
+    if player._spotify_metadata:
+        player._spotify_metadata.close()
+    if hasattr(player.music, "close"):
+        # mpv se arranca con --idle y seguiría abierto al salir
+        player.music.close()
+    player.timings.close()
+    player.library.close()
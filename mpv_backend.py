@@ -0,0 +1,262 @@
+import os
+import json
+import queue
+import time
+import socket
+import tempfile
+import threading
+import subprocess
+from typing import Callable, Dict, Optional
+
+
+class _OverlappedPipe:
+    """Cliente de una tubería con nombre de Windows abierta en modo overlapped
+
+    Con un handle síncrono (open(path, "r+b")) Windows serializa las
+    operaciones del handle: mientras el hilo lector espera en readline(),
+    cada write() se queda detrás y el comando no llega a mpv hasta que este
+    envía algo. En modo overlapped la lectura y la escritura van por separado.
+    """
+
+    def __init__(self, path: str):
+        import _winapi
+        self._winapi = _winapi
+        self._handle = _winapi.CreateFile(
+            path, _winapi.GENERIC_READ | _winapi.GENERIC_WRITE, 0, _winapi.NULL,
+            _winapi.OPEN_EXISTING, _winapi.FILE_FLAG_OVERLAPPED, _winapi.NULL
+        )
+        self._buffer = b""
+
+    def write(self, data: bytes) -> None:
+        while data:
+            ov, _ = self._winapi.WriteFile(self._handle, data, overlapped=True)
+            written, err = ov.GetOverlappedResult(True)
+            if err or not written:
+                raise BrokenPipeError("la tubería de mpv se cerró")
+            data = data[written:]
+
+    def readline(self) -> bytes:
+        while b"\n" not in self._buffer:
+            ov, _ = self._winapi.ReadFile(self._handle, 4096, overlapped=True)
+            _, err = ov.GetOverlappedResult(True)
+            chunk = ov.getbuffer()
+            if not chunk and err != self._winapi.ERROR_MORE_DATA:
+                # Tubería cerrada: se devuelve lo que quede (b"" = fin)
+                line, self._buffer = self._buffer, b""
+                return line
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line + b"\n"
+
+    def close(self) -> None:
+        self._winapi.CloseHandle(self._handle)
+
+
+class MPVMusic:
+    """Backend de reproducción con un único proceso mpv controlado por JSON IPC
+
+    Tiene la misma interfaz que pygame.mixer.music (load/play/queue/stop/
+    unload/get_busy/set_volume) más set_end_callback. mpv se arranca una vez
+    en modo --idle con --input-ipc-server; cada pista se carga con loadfile
+    y la encolada con append-play, así que no se paga el arranque del
+    proceso ni la apertura del dispositivo de audio en cada canción.
+
+    Con spawn=False se conecta a un servidor IPC ya existente en ipc_path
+    (por ejemplo un servidor falso local para pruebas).
+    """
+
+    def __init__(self, ipc_path: Optional[str] = None, spawn: bool = True,
+                 mpv_path: str = "mpv", timeout: float = 5.0):
+        if ipc_path is None:
+            if os.name == "nt":
+                ipc_path = rf"\\.\pipe\pymusic-mpv-{os.getpid()}"
+            else:
+                ipc_path = os.path.join(tempfile.gettempdir(), f"pymusic-mpv-{os.getpid()}.sock")
+        self.ipc_path = ipc_path
+        self.timeout = timeout
+        self.volume = 100
+        self.path = None
+        self.on_end = None
+        self.proc = None
+
+        self._busy = False
+        self._queued = False
+        self._request_id = 0
+        self._responses: Dict[int, Dict] = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+
+        if spawn:
+            self.proc = subprocess.Popen([
+                mpv_path,
+                "--idle=yes",
+                "--no-video",
+                "--no-terminal",
+                "--no-audio-focus",
+                "--gapless-audio=yes",
+                "--volume-max=300",
+                f"--input-ipc-server={self.ipc_path}",
+            ], stdin=subprocess.DEVNULL)
+        self._connect()
+        # Los avisos de fin de pista se entregan desde otro hilo: el callback puede
+        # enviar comandos y sus respuestas las lee _read_events
+        self._end_events = queue.Queue()
+        self._reader = threading.Thread(target=self._read_events, daemon=True)
+        self._reader.start()
+        self._dispatcher = threading.Thread(target=self._dispatch_end_events, daemon=True)
+        self._dispatcher.start()
+
+    def _connect(self) -> None:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    self._pipe = _OverlappedPipe(self.ipc_path)
+                    self._send_raw = self._pipe.write
+                    self._readline = self._pipe.readline
+                    self._disconnect = self._pipe.close
+                else:
+                    self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self._sock.connect(self.ipc_path)
+                    self._send_raw = self._sock.sendall
+                    self._readline = self._sock.makefile("rb").readline
+                    self._disconnect = self._close_socket
+                return
+            except OSError:
+                if self.proc and self.proc.poll() is not None:
+                    raise RuntimeError("mpv terminó antes de abrir el socket IPC")
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def _close_socket(self) -> None:
+        try:
+            # Despierta al hilo lector aunque makefile() siga abierto
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def _read_events(self) -> None:
+        """Lee respuestas y eventos de mpv (bloqueante, sin sondeo)"""
+        while True:
+            try:
+                line = self._readline()
+            except OSError:
+                line = b""
+            if not line:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+                return
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+
+            if "request_id" in message and "event" not in message:
+                with self._cond:
+                    self._responses[message["request_id"]] = message
+                    self._cond.notify_all()
+                continue
+
+            event = message.get("event")
+            notify = False
+            with self._cond:
+                if event == "start-file":
+                    self._busy = True
+                elif event == "end-file" and message.get("reason") == "eof":
+                    # La pista terminó sola: sigue la encolada (si hay) o queda en silencio
+                    if self._queued:
+                        self._queued = False
+                    else:
+                        self._busy = False
+                    notify = True
+                elif event == "idle":
+                    self._busy = False
+            if notify:
+                self._end_events.put(True)
+
+    def _dispatch_end_events(self) -> None:
+        while True:
+            self._end_events.get()
+            if self.on_end:
+                try:
+                    self.on_end()
+                except Exception as e:
+                    print(f"Error al pasar de canción: {e}")
+
+    def command(self, *args, wait: bool = True):
+        """Envía un comando a mpv y devuelve el campo 'data' de la respuesta"""
+        with self._cond:
+            self._request_id += 1
+            request_id = self._request_id
+        payload = json.dumps({"command": list(args), "request_id": request_id}) + "\n"
+        with self._write_lock:
+            self._send_raw(payload.encode("utf-8"))
+        if not wait:
+            return None
+
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while request_id not in self._responses:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"mpv no respondió a {args[0]}")
+                self._cond.wait(remaining)
+            response = self._responses.pop(request_id)
+        if response.get("error") != "success":
+            raise RuntimeError(f"mpv: {args[0]}: {response.get('error')}")
+        return response.get("data")
+
+    def set_end_callback(self, callback: Callable[[], None]) -> None:
+        self.on_end = callback
+
+    def load(self, path: str) -> None:
+        self.path = path
+
+    def play(self) -> None:
+        with self._cond:
+            self._busy = True
+            self._queued = False
+        self.command("loadfile", self.path, "replace")
+        self.command("set_property", "pause", False)
+
+    def queue(self, path: str) -> None:
+        """Reproduce path en cuanto termine la pista actual (reemplaza la encolada)"""
+        self.command("playlist-clear")
+        self.command("loadfile", path, "append-play")
+        with self._cond:
+            self._queued = True
+
+    def stop(self) -> None:
+        with self._cond:
+            self._busy = False
+            self._queued = False
+        self.command("stop")
+
+    def unload(self) -> None:
+        self.stop()
+
+    def get_busy(self) -> bool:
+        return self._busy
+
+    def set_volume(self, vol: float) -> None:
+        # Se aplica al momento sobre la pista que está sonando
+        self.volume = int(vol * 100)
+        self.command("set_property", "volume", self.volume)
+
+    def close(self) -> None:
+        try:
+            self.command("quit", wait=False)
+        except OSError:
+            pass
+        if self.proc:
+            try:
+                self.proc.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        try:
+            self._disconnect()
+        except OSError:
+            pass
@@ -0,0 +1,347 @@
+import os
+import time
+import threading
+from typing import Callable, Optional
+
+import pygame
+
+# Evento que pygame publica cuando termina una pista
+TRACK_END_EVENT = pygame.USEREVENT + 1
+
+# Bitrate más bajo que se espera en la biblioteca: sin la duración, acota por
+# arriba lo que dura (y ocupa decodificada) una pista a partir de su tamaño
+MIN_EXPECTED_BITRATE = 96_000
+# Cada cuánto se mira si terminó una pista que suena desde el disco
+_STREAM_POLL_SECONDS = 0.25
+# Marca de la pista actual cuando suena con pygame.mixer.music en vez de un Sound
+_STREAMED = object()
+
+
+class PygameEndWatcher:
+    """Hilo que se bloquea esperando el evento de fin de pista de pygame
+
+    Sustituye al sondeo de get_busy() cada segundo: el hilo duerme dentro de
+    SDL hasta que pygame.mixer.music publica TRACK_END_EVENT.
+    """
+
+    def __init__(self, music, callback: Callable[[], None], event_type: int = TRACK_END_EVENT):
+        self.music = music
+        self.callback = callback
+        self.event_type = event_type
+        self.thread = None
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        # No devolver hasta que el evento esté configurado, para no perder el primero
+        self._ready.wait(timeout=5)
+
+    def _run(self) -> None:
+        try:
+            # SDL solo entrega eventos con el subsistema de vídeo iniciado
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(self.event_type)
+            self.music.set_endevent(self.event_type)
+        except Exception as e:
+            print(f"Error al iniciar el aviso de fin de pista: {e}")
+            return
+        finally:
+            self._ready.set()
+
+        while True:
+            event = pygame.event.wait()
+            if event.type == self.event_type:
+                try:
+                    self.callback()
+                except Exception as e:
+                    print(f"Error al pasar de canción: {e}")
+
+
+class PredecodeEngine:
+    """Motor de reproducción que decodifica la siguiente pista por adelantado
+
+    Tiene la misma interfaz que pygame.mixer.music (load/play/queue/stop/
+    unload/get_busy/set_volume) más set_end_callback. Mientras suena una
+    pista, la encolada se decodifica en segundo plano a un pygame.mixer.Sound
+    en memoria, con un límite de bytes. Sin crossfade la siguiente se encola
+    en el mismo canal (Channel.queue), así que empieza en la muestra
+    siguiente. Con crossfade se lanza en el otro canal con fade de entrada
+    mientras la actual hace fadeout.
+
+    Si al terminar una pista la siguiente aún no está decodificada se cuenta
+    un underrun y se espera a que termine de decodificarse. Una pista que por
+    sí sola no cabe en max_buffer_bytes (una sesión de una hora...) no se
+    decodifica: suena desde el disco con pygame.mixer.music, sin unión sin
+    huecos ni crossfade.
+
+    duration_of(ruta) da la duración conocida de una pista (p. ej. la del
+    análisis); con ella se estima lo que ocupará decodificada antes de
+    decodificarla, y sin ella se estima a partir del tamaño del archivo.
+    """
+
+    def __init__(self, crossfade_ms: int = 0, max_buffer_bytes: int = 256 * 1024 * 1024,
+                 duration_of: Optional[Callable[[str], Optional[float]]] = None):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        pygame.mixer.set_reserved(2)
+        self.channels = (pygame.mixer.Channel(0), pygame.mixer.Channel(1))
+        self.active = 0
+        self.crossfade_ms = crossfade_ms
+        self.max_buffer_bytes = max_buffer_bytes
+        self.duration_of = duration_of
+        self.volume = 1.0
+        self.on_end = None
+
+        self.path = None
+        # Sound ya decodificado de la pista cargada (la encolada, tras un Next)
+        self._loaded = None
+        self.current = None
+        self.current_ends_at = None
+        self.next_path = None
+        self.next_sound = None
+        self.next_failed = False
+        self.next_on_channel = False
+        self._generation = 0
+
+        # Métricas
+        self.underruns = 0
+        self.decoded_tracks = 0
+        self.decode_seconds = 0.0
+        self.over_limit = 0
+        self.streamed_tracks = 0
+
+        self._cond = threading.Condition()
+        self._scheduler = threading.Thread(target=self._schedule, daemon=True)
+        self._scheduler.start()
+
+    def _pcm_bytes(self, seconds: float) -> int:
+        freq, size, channels = pygame.mixer.get_init()
+        return int(seconds * freq * channels * (abs(size) // 8))
+
+    def _sound_bytes(self, sound) -> int:
+        if sound is None or sound is _STREAMED:
+            return 0
+        return self._pcm_bytes(sound.get_length())
+
+    def _estimated_bytes(self, path: str) -> int:
+        """Lo que ocupará path decodificada, sin decodificarla"""
+        duration = None
+        if self.duration_of:
+            try:
+                duration = self.duration_of(path)
+            except Exception:
+                duration = None
+        if not duration:
+            try:
+                duration = os.path.getsize(path) * 8 / MIN_EXPECTED_BITRATE
+            except OSError:
+                return 0  # Sin estimación: se comprueba después de decodificar
+        return self._pcm_bytes(duration)
+
+    def _decode(self, path: str):
+        started = time.perf_counter()
+        sound = pygame.mixer.Sound(path)
+        self.decode_seconds += time.perf_counter() - started
+        self.decoded_tracks += 1
+        return sound
+
+    def set_end_callback(self, callback: Callable[[], None]) -> None:
+        self.on_end = callback
+
+    def _fits(self, path: str) -> bool:
+        return self._estimated_bytes(path) <= self.max_buffer_bytes
+
+    def load(self, path: str) -> None:
+        with self._cond:
+            # Un Next a mano carga la encolada: si ya está decodificada se aprovecha
+            loaded = self.next_sound if path == self.next_path else None
+        self.stop()
+        self.path = path
+        self._loaded = loaded
+
+    def play(self) -> None:
+        sound, self._loaded = self._loaded, None
+        if sound is None and self._fits(self.path):
+            sound = self._decode(self.path)
+        with self._cond:
+            self._generation += 1
+            if sound is None:
+                self._stream(self.path)
+            else:
+                self._start(sound, fade_ms=0)
+            self._cond.notify_all()
+
+    def _stream(self, path: str) -> None:
+        """Pista que no cabe en memoria: pygame.mixer.music la lee del disco según suena"""
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.set_volume(self.volume)
+        pygame.mixer.music.play()
+        self.current = _STREAMED
+        self.current_ends_at = None
+        self.streamed_tracks += 1
+
+    def _start(self, sound, fade_ms: int) -> None:
+        channel = self.channels[self.active]
+        channel.set_volume(self.volume)
+        channel.play(sound, fade_ms=fade_ms)
+        self.current = sound
+        self.current_ends_at = time.monotonic() + sound.get_length()
+
+    def queue(self, path: str) -> None:
+        with self._cond:
+            self.next_path = path
+            self.next_sound = None
+            self.next_failed = False
+            self.next_on_channel = False
+            generation = self._generation
+        threading.Thread(target=self._predecode, args=(path, generation), daemon=True).start()
+
+    def _predecode(self, path: str, generation: int) -> None:
+        try:
+            sound = None
+            current_bytes = self._sound_bytes(self.current)
+            # Se estima antes de decodificar: decodificar para luego tirarla ya
+            # ocupaba la memoria que el límite quiere evitar
+            if self._estimated_bytes(path) + current_bytes > self.max_buffer_bytes:
+                self.over_limit += 1
+            else:
+                sound = self._decode(path)
+                if self._sound_bytes(sound) + current_bytes > self.max_buffer_bytes:
+                    # La estimación se quedó corta: se decodificará de nuevo al llegar su turno
+                    self.over_limit += 1
+                    sound = None
+        except Exception as e:
+            print(f"Error al decodificar {path}: {e}")
+            sound = None
+        with self._cond:
+            if generation != self._generation or path != self.next_path:
+                return  # Se cambió de pista mientras se decodificaba
+            self.next_sound = sound
+            self.next_failed = sound is None
+            if sound is not None and not self.crossfade_ms and self.current is not _STREAMED:
+                # Unión sin huecos: el canal la empieza en la muestra siguiente
+                self.channels[self.active].queue(sound)
+                self.next_on_channel = True
+            self._cond.notify_all()
+
+    def _schedule(self) -> None:
+        """Espera al final de cada pista (o al inicio del crossfade) y pasa a la siguiente"""
+        while True:
+            with self._cond:
+                while self.current is None:
+                    self._cond.wait()
+                generation = self._generation
+                if self.current is _STREAMED:
+                    # No se sabe cuándo acaba exactamente: se mira cada poco
+                    if pygame.mixer.music.get_busy():
+                        self._cond.wait(_STREAM_POLL_SECONDS)
+                        continue
+                    switch_at = time.monotonic()
+                else:
+                    switch_at = self.current_ends_at
+                    if self.next_path and self.crossfade_ms:
+                        switch_at -= self.crossfade_ms / 1000
+                    remaining = switch_at - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                if generation != self._generation:
+                    continue
+
+                if self.next_path and self.next_sound is None and not self.next_failed:
+                    # La siguiente no está lista a tiempo
+                    self.underruns += 1
+                    while (self.next_sound is None and not self.next_failed
+                           and generation == self._generation):
+                        self._cond.wait()
+                    if generation != self._generation:
+                        continue
+
+                next_path, sound = self.next_path, self.next_sound
+                on_channel = self.next_on_channel
+                self.next_path = self.next_sound = None
+                self.next_failed = False
+                self.next_on_channel = False
+                stream = False
+                if next_path and sound is None:
+                    # No cabía junto a la actual o falló: decodificar ahora, o
+                    # sonar desde el disco si ni sola cabe
+                    try:
+                        if self._fits(next_path):
+                            sound = self._decode(next_path)
+                        else:
+                            stream = True
+                    except Exception as e:
+                        print(f"Error al decodificar {next_path}: {e}")
+
+                if stream:
+                    if self.crossfade_ms and self.current is not _STREAMED:
+                        self.channels[self.active].fadeout(self.crossfade_ms)
+                    try:
+                        self._stream(next_path)
+                    except Exception as e:
+                        print(f"Error al reproducir {next_path}: {e}")
+                        self.current = None
+                        self.current_ends_at = None
+                elif sound is None:
+                    self.current = None
+                    self.current_ends_at = None
+                elif self.crossfade_ms:
+                    self.channels[self.active].fadeout(self.crossfade_ms)
+                    self.active = 1 - self.active
+                    self._start(sound, fade_ms=self.crossfade_ms)
+                elif on_channel:
+                    # Ya estaba encolada en el canal: sigue sin hueco
+                    self.current = sound
+                    self.current_ends_at = max(switch_at, time.monotonic()) + sound.get_length()
+                else:
+                    self._start(sound, fade_ms=0)
+                self.path = next_path
+
+            if self.on_end:
+                try:
+                    self.on_end()
+                except Exception as e:
+                    print(f"Error al pasar de canción: {e}")
+
+    def get_busy(self) -> bool:
+        return self.current is not None
+
+    def set_volume(self, volume: float) -> None:
+        self.volume = max(0.0, min(volume, 1.0))
+        for channel in self.channels:
+            channel.set_volume(self.volume)
+        if self.current is _STREAMED:
+            pygame.mixer.music.set_volume(self.volume)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._generation += 1
+            for channel in self.channels:
+                channel.stop()
+            if self.current is _STREAMED:
+                pygame.mixer.music.stop()
+            self._loaded = None
+            self.current = None
+            self.current_ends_at = None
+            self.next_path = self.next_sound = None
+            self.next_failed = False
+            self.next_on_channel = False
+            self._cond.notify_all()
+
+    def unload(self) -> None:
+        self.stop()
+
+    def stats(self) -> dict:
+        return {
+            "underruns": self.underruns,
+            "decoded_tracks": self.decoded_tracks,
+            "decode_seconds": self.decode_seconds,
+            "over_limit": self.over_limit,
+            "streamed_tracks": self.streamed_tracks,
+        }
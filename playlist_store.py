@@ -0,0 +1,316 @@
+import os
+import re
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class Playlist:
+    """Lista en memoria: orden de canciones más un conjunto para pertenencia O(1)"""
+
+    def __init__(self, name: str, songs: Iterable[str]):
+        self.name = name
+        self.songs: List[str] = list(songs)
+        self.members = set(self.songs)
+
+    def __contains__(self, song_id: str) -> bool:
+        return song_id in self.members
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def add(self, song_ids: Iterable[str]) -> List[str]:
+        """Añade las canciones que no estén ya. Devuelve las añadidas"""
+        added = []
+        for song_id in song_ids:
+            if song_id not in self.members:
+                self.members.add(song_id)
+                self.songs.append(song_id)
+                added.append(song_id)
+        return added
+
+    def remove(self, song_ids: Iterable[str]) -> int:
+        """Quita todas las apariciones de las canciones en una sola pasada"""
+        to_remove = self.members.intersection(song_ids)
+        if not to_remove:
+            return 0
+        before = len(self.songs)
+        self.songs = [s for s in self.songs if s not in to_remove]
+        self.members -= to_remove
+        return before - len(self.songs)
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "songs": self.songs}
+
+
+class PlaylistStore:
+    """Almacén de listas en Lists/: instantánea <id>.json más registro <id>.ops
+
+    Cada edición se añade como una línea JSON al registro de operaciones en
+    lugar de reescribir la lista entera. Al cargar se aplica el registro
+    sobre la instantánea y, cuando el registro crece, se compacta: se
+    reescribe la instantánea (de forma atómica) y se vacía el registro.
+
+    También mantiene un índice inverso song_id -> {playlist_id} para que
+    borrar canciones solo toque las listas que las contienen. El índice se
+    guarda en Lists/members.idx junto con el tamaño y el mtime de los
+    archivos de cada lista; al cargarlo solo se vuelven a leer las listas
+    cuyos archivos cambiaron desde entonces (o todas, si no existe).
+    """
+
+    SNAPSHOT_EXT = ".json"
+    OPS_EXT = ".ops"
+    INDEX_FILE = "members.idx"
+
+    def __init__(self, lists_dir: str, compact_after: int = 64):
+        self.lists_dir = lists_dir
+        self.compact_after = compact_after
+        self._cache: Dict[str, Playlist] = {}
+        self._pending_ops: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._index: Optional[Dict[str, Set[str]]] = None
+
+    @staticmethod
+    def normalize_id(playlist_id: str) -> str:
+        """'3', '3l' y '3L' son la misma lista: se guarda siempre como '3L'"""
+        match = re.fullmatch(r"(\d+)[lL]?", playlist_id.strip())
+        return f"{match.group(1)}L" if match else playlist_id
+
+    @staticmethod
+    def is_playlist_id(item_id: str) -> bool:
+        return re.fullmatch(r"\d+[lL]", item_id.strip()) is not None
+
+    def _snapshot_path(self, playlist_id: str) -> str:
+        return os.path.join(self.lists_dir, f"{playlist_id}{self.SNAPSHOT_EXT}")
+
+    def _ops_path(self, playlist_id: str) -> str:
+        return os.path.join(self.lists_dir, f"{playlist_id}{self.OPS_EXT}")
+
+    def list_ids(self) -> List[str]:
+        ids = [f[:-len(self.SNAPSHOT_EXT)] for f in os.listdir(self.lists_dir)
+               if f.endswith(self.SNAPSHOT_EXT)]
+        return sorted(ids, key=lambda i: (len(i), i))
+
+    def exists(self, playlist_id: str) -> bool:
+        playlist_id = self.normalize_id(playlist_id)
+        return playlist_id in self._cache or os.path.exists(self._snapshot_path(playlist_id))
+
+    def get(self, playlist_id: str) -> Playlist:
+        """Devuelve la lista (cargada una sola vez). FileNotFoundError si no existe"""
+        playlist_id = self.normalize_id(playlist_id)
+        with self._lock:
+            playlist = self._cache.get(playlist_id)
+            if playlist is not None:
+                return playlist
+
+            with open(self._snapshot_path(playlist_id), "r") as f:
+                data = json.load(f)
+            playlist = Playlist(data["name"], data["songs"])
+
+            ops = 0
+            ops_path = self._ops_path(playlist_id)
+            if os.path.exists(ops_path):
+                with open(ops_path, "r") as f:
+                    for line in f:
+                        try:
+                            op = json.loads(line)
+                        except ValueError:
+                            continue  # Línea a medio escribir (corte de luz...): se salta
+                        self._apply(playlist, op)
+                        ops += 1
+
+            self._cache[playlist_id] = playlist
+            self._pending_ops[playlist_id] = ops
+            return playlist
+
+    def _fingerprint(self, playlist_id: str) -> List[int]:
+        """Tamaño y mtime de la instantánea y del registro de una lista"""
+        fingerprint = []
+        for path in (self._snapshot_path(playlist_id), self._ops_path(playlist_id)):
+            try:
+                stat = os.stat(path)
+                fingerprint += [stat.st_size, stat.st_mtime_ns]
+            except FileNotFoundError:
+                fingerprint += [-1, -1]
+        return fingerprint
+
+    def _load_saved_index(self) -> Tuple[Dict[str, List[int]], Dict[str, Set[str]]]:
+        try:
+            with open(os.path.join(self.lists_dir, self.INDEX_FILE), "r") as f:
+                data = json.load(f)
+            return data["files"], {song_id: set(lists) for song_id, lists in data["index"].items()}
+        except (OSError, ValueError, KeyError, AttributeError):
+            return {}, {}
+
+    def _ensure_index(self) -> Dict[str, Set[str]]:
+        with self._lock:
+            if self._index is None:
+                files, index = self._load_saved_index()
+                current = {playlist_id: self._fingerprint(playlist_id) for playlist_id in self.list_ids()}
+                stale = {playlist_id for playlist_id in set(files) | set(current)
+                         if files.get(playlist_id) != current.get(playlist_id)}
+                if stale and index:
+                    # Quitar del índice guardado las listas que cambiaron o ya no existen
+                    for song_id in list(index):
+                        index[song_id] -= stale
+                        if not index[song_id]:
+                            del index[song_id]
+                for playlist_id in sorted(stale & set(current)):
+                    try:
+                        playlist = self.get(playlist_id)
+                    except Exception as e:
+                        print(f"Advertencia: no se pudo leer la lista {playlist_id}: {e}")
+                        continue
+                    for song_id in playlist.members:
+                        index.setdefault(song_id, set()).add(playlist_id)
+                self._index = index
+                if stale:
+                    self.save_index()
+            return self._index
+
+    def save_index(self) -> None:
+        """Guarda el índice inverso (si se llegó a construir) para la próxima sesión"""
+        with self._lock:
+            if self._index is None:
+                return
+            path = os.path.join(self.lists_dir, self.INDEX_FILE)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump({
+                        "files": {playlist_id: self._fingerprint(playlist_id) for playlist_id in self.list_ids()},
+                        "index": {song_id: sorted(lists) for song_id, lists in self._index.items()},
+                    }, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Advertencia: no se pudo guardar el índice de listas: {e}")
+
+    def close(self) -> None:
+        self.save_index()
+
+    def _index_add(self, playlist_id: str, song_ids: Iterable[str]) -> None:
+        if self._index is not None:
+            for song_id in song_ids:
+                self._index.setdefault(song_id, set()).add(playlist_id)
+
+    def _index_remove(self, playlist_id: str, song_ids: Iterable[str]) -> None:
+        if self._index is not None:
+            for song_id in song_ids:
+                lists = self._index.get(song_id)
+                if lists is not None:
+                    lists.discard(playlist_id)
+                    if not lists:
+                        del self._index[song_id]
+
+    def playlists_containing(self, song_id: str) -> Set[str]:
+        """IDs de las listas que contienen la canción"""
+        with self._lock:
+            return set(self._ensure_index().get(song_id, ()))
+
+    def _apply(self, playlist: Playlist, op: Dict) -> None:
+        if op["op"] == "add":
+            playlist.add(op["songs"])
+        elif op["op"] == "remove":
+            playlist.remove(op["songs"])
+        elif op["op"] == "rename":
+            playlist.name = op["name"]
+
+    def _append_op(self, playlist_id: str, op: Dict) -> None:
+        with open(self._ops_path(playlist_id), "ab+") as f:
+            # Si un corte dejó la última línea a medias, la operación nueva va en
+            # su propia línea (si no, se perdería junto con la línea rota)
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write((json.dumps(op) + "\n").encode("ascii"))
+        self._pending_ops[playlist_id] = self._pending_ops.get(playlist_id, 0) + 1
+        if self._pending_ops[playlist_id] >= self.compact_after:
+            self.compact(playlist_id)
+
+    def _write_snapshot(self, playlist_id: str, playlist: Playlist) -> None:
+        path = self._snapshot_path(playlist_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(playlist.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def compact(self, playlist_id: str) -> None:
+        """Reescribe la instantánea con el estado actual y vacía el registro"""
+        playlist_id = self.normalize_id(playlist_id)
+        with self._lock:
+            playlist = self.get(playlist_id)
+            self._write_snapshot(playlist_id, playlist)
+            try:
+                os.remove(self._ops_path(playlist_id))
+            except FileNotFoundError:
+                pass
+            self._pending_ops[playlist_id] = 0
+
+    def next_id(self) -> str:
+        numbers = [int(i[:-1]) for i in self.list_ids() if i.endswith("L") and i[:-1].isdigit()]
+        return f"{max(numbers, default=0) + 1}L"
+
+    def create(self, name: str, songs: Iterable[str], playlist_id: Optional[str] = None) -> str:
+        with self._lock:
+            playlist_id = self.normalize_id(playlist_id) if playlist_id else self.next_id()
+            playlist = Playlist(name, songs)
+            self._write_snapshot(playlist_id, playlist)
+            if playlist_id in self._cache:
+                self._index_remove(playlist_id, self._cache[playlist_id].members)
+            self._cache[playlist_id] = playlist
+            self._index_add(playlist_id, playlist.members)
+            self._pending_ops[playlist_id] = 0
+            return playlist_id
+
+    def add_songs(self, playlist_id: str, song_ids: Iterable[str]) -> List[str]:
+        playlist_id = self.normalize_id(playlist_id)
+        with self._lock:
+            added = self.get(playlist_id).add(song_ids)
+            if added:
+                self._append_op(playlist_id, {"op": "add", "songs": added})
+                self._index_add(playlist_id, added)
+            return added
+
+    def remove_songs(self, playlist_id: str, song_ids: Iterable[str]) -> int:
+        playlist_id = self.normalize_id(playlist_id)
+        with self._lock:
+            playlist = self.get(playlist_id)
+            song_ids = [s for s in song_ids if s in playlist]
+            removed = playlist.remove(song_ids)
+            if removed:
+                self._append_op(playlist_id, {"op": "remove", "songs": song_ids})
+                self._index_remove(playlist_id, song_ids)
+            return removed
+
+    def remove_songs_everywhere(self, song_ids: Iterable[str]) -> Dict[str, int]:
+        """Quita las canciones de todas las listas que las contienen
+
+        Agrupa por lista usando el índice inverso, así cada lista afectada
+        recibe una sola operación. Devuelve {playlist_id: canciones quitadas}.
+        """
+        with self._lock:
+            index = self._ensure_index()
+            by_playlist: Dict[str, List[str]] = {}
+            for song_id in dict.fromkeys(song_ids):
+                for playlist_id in index.get(song_id, ()):
+                    by_playlist.setdefault(playlist_id, []).append(song_id)
+            return {
+                playlist_id: self.remove_songs(playlist_id, ids)
+                for playlist_id, ids in sorted(by_playlist.items(), key=lambda item: (len(item[0]), item[0]))
+            }
+
+    def delete(self, playlist_id: str) -> None:
+        playlist_id = self.normalize_id(playlist_id)
+        with self._lock:
+            if self._index is not None:
+                self._index_remove(playlist_id, self.get(playlist_id).members)
+            os.remove(self._snapshot_path(playlist_id))
+            try:
+                os.remove(self._ops_path(playlist_id))
+            except FileNotFoundError:
+                pass
+            self._cache.pop(playlist_id, None)
+            self._pending_ops.pop(playlist_id, None)
@@ -0,0 +1,220 @@
+import os
+import time
+import threading
+import subprocess
+import urllib.request
+from typing import Dict, List, Optional
+
+import pygame
+
+DOWNLOAD_CHUNK = 64 * 1024
+
+
+class StreamingDownload:
+    """Descarga HTTP a un archivo que va creciendo, en un hilo aparte
+
+    Si el archivo ya existe (descarga interrumpida) se pide el resto con
+    Range. Los lectores esperan en `changed` a que lleguen más bytes.
+    """
+
+    def __init__(self, url: str, path: str, headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.path = path
+        self.headers = dict(headers or {})
+        self.written = os.path.getsize(path) if os.path.exists(path) else 0
+        self.total: Optional[int] = None
+        self.done = False
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self.changed = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "StreamingDownload":
+        self.thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            headers = dict(self.headers)
+            if self.written:
+                headers["Range"] = f"bytes={self.written}-"
+            request = urllib.request.Request(self.url, headers=headers)
+            with urllib.request.urlopen(request, timeout=30) as response:
+                if self.written and response.status != 206:
+                    self.written = 0  # El servidor no admite Range: empezar de cero
+                length = response.headers.get("Content-Length")
+                if length is not None:
+                    self.total = self.written + int(length)
+                with open(self.path, "ab" if self.written else "wb") as f:
+                    while not self.cancelled:
+                        chunk = response.read(DOWNLOAD_CHUNK)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        f.flush()
+                        with self.changed:
+                            self.written += len(chunk)
+                            self.changed.notify_all()
+            if self.total is not None and self.written < self.total and not self.cancelled:
+                self.error = "descarga incompleta"
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que termine. True si se completó sin errores"""
+        self.thread.join(timeout)
+        return self.done and self.error is None and not self.cancelled
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class GrowingFileReader:
+    """Lee un archivo mientras se descarga: al llegar al final espera más datos"""
+
+    def __init__(self, download: StreamingDownload):
+        self.download = download
+        self.file = None
+        self.position = 0
+
+    def read(self, size: int = DOWNLOAD_CHUNK) -> bytes:
+        download = self.download
+        with download.changed:
+            while self.position >= download.written and not download.done:
+                download.changed.wait(0.5)
+        if self.file is None:
+            if not os.path.exists(download.path):
+                return b""
+            self.file = open(download.path, "rb")
+        self.file.seek(self.position)
+        data = self.file.read(min(size, download.written - self.position))
+        self.position += len(data)
+        return data
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class ProgressivePlayer:
+    """Reproduce un audio mientras se descarga
+
+    ffmpeg decodifica la entrada (que se le pasa por un pipe según crece el
+    archivo) a PCM con el formato del mezclador; el PCM se trocea en Sounds
+    que se encolan en un canal reservado. Empieza a sonar cuando hay
+    min_buffer_seconds decodificados. Guarda el tiempo hasta el primer audio.
+    """
+
+    def __init__(self, reader: GrowingFileReader, min_buffer_seconds: float = 2.0,
+                 chunk_seconds: float = 0.5, volume: float = 1.0,
+                 decoder_cmd: Optional[List[str]] = None):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        self.frequency, size, self.channels = pygame.mixer.get_init()
+        self.frame_bytes = self.channels * (abs(size) // 8)
+        self.reader = reader
+        self.min_buffer_seconds = min_buffer_seconds
+        self.chunk_bytes = int(chunk_seconds * self.frequency) * self.frame_bytes
+        self.volume = max(0.0, min(volume, 1.0))
+        self.decoder_cmd = decoder_cmd or [
+            "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", str(self.channels), "-ar", str(self.frequency), "pipe:1",
+        ]
+        self.started_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self.underruns = 0
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._proc = None
+        # Canal reservado en _play (para cambiar el volumen mientras suena)
+        self.channel = None
+
+    @property
+    def time_to_first_audio(self) -> Optional[float]:
+        if self.started_at is None or self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.started_at
+
+    def start(self, started_at: Optional[float] = None) -> "ProgressivePlayer":
+        """Empieza a decodificar; started_at es el instante de la petición del usuario"""
+        self.started_at = started_at or time.perf_counter()
+        self._proc = subprocess.Popen(self.decoder_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        threading.Thread(target=self._feed, daemon=True).start()
+        threading.Thread(target=self._play, daemon=True).start()
+        return self
+
+    def _feed(self) -> None:
+        """Pasa al decodificador los bytes según se descargan"""
+        try:
+            while not self._stop.is_set():
+                data = self.reader.read()
+                if not data:
+                    break
+                self._proc.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+
+    def _read_chunk(self) -> bytes:
+        data = self._proc.stdout.read(self.chunk_bytes)
+        # Cortar en un número entero de muestras
+        return data[:len(data) - len(data) % self.frame_bytes]
+
+    def _play(self) -> None:
+        channel = self.channel = pygame.mixer.find_channel(True)
+        try:
+            # Acumular el búfer mínimo antes de empezar
+            buffered = []
+            needed = self.min_buffer_seconds * self.frequency * self.frame_bytes
+            while sum(map(len, buffered)) < needed and not self._stop.is_set():
+                chunk = self._read_chunk()
+                if not chunk:
+                    break
+                buffered.append(chunk)
+            if not buffered or self._stop.is_set():
+                return
+
+            channel.set_volume(self.volume)
+            channel.play(pygame.mixer.Sound(buffer=b"".join(buffered)))
+            self.first_audio_at = time.perf_counter()
+            print(f"Primer audio en {self.time_to_first_audio:.2f} s")
+
+            while not self._stop.is_set():
+                chunk = self._read_chunk()
+                if not chunk:
+                    break
+                sound = pygame.mixer.Sound(buffer=chunk)
+                # El canal admite una pista en cola: esperar a que quede libre
+                while channel.get_queue() is not None and not self._stop.is_set():
+                    time.sleep(0.05)
+                if not channel.get_busy():
+                    self.underruns += 1
+                    channel.play(sound)
+                else:
+                    channel.queue(sound)
+            while channel.get_busy() and not self._stop.is_set():
+                time.sleep(0.1)
+        finally:
+            channel.stop()
+            self.finished.set()
+
+    def set_volume(self, volume: float) -> None:
+        self.volume = max(0.0, min(volume, 1.0))
+        if self.channel is not None:
+            self.channel.set_volume(self.volume)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._proc and self._proc.poll() is None:
+            self._proc.kill()
+        self.finished.wait(timeout=2)
+        self.reader.close()
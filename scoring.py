@@ -0,0 +1,116 @@
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple
+
+_PARENS_RE = re.compile(r'\([^)]*\)')
+_BRACKETS_RE = re.compile(r'\[[^\]]*\]')
+_SYMBOLS_RE = re.compile(r'[^\w\s-]')
+_SPACES_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def clean_title(title: str) -> str:
+    """Limpia el título eliminando caracteres especiales y texto extra"""
+    title = _PARENS_RE.sub('', title)
+    title = _BRACKETS_RE.sub('', title)
+    title = _SYMBOLS_RE.sub('', title)
+    title = _SPACES_RE.sub(' ', title).strip()
+    return title
+
+
+@lru_cache(maxsize=4096)
+def _split_parts(title: str) -> Tuple[str, Tuple[Tuple[str, str], ...], int]:
+    """Título limpio, partes separadas por '-' y nº de caracteres
+
+    Cada parte es (original, minúsculas).
+    """
+    clean = clean_title(title)
+    parts = tuple((p, p.lower()) for p in (p.strip() for p in clean.split('-')))
+    return clean, parts, len(clean.replace(' ', ''))
+
+
+@lru_cache(maxsize=65536)
+def _ratio(a: str, b: str) -> float:
+    """SequenceMatcher(None, a, b).ratio(), memorizado por par"""
+    # Con 200 caracteres o más difflib activa autojunk y ya no se cumple ratio == 1
+    if a == b and len(b) < 200:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _upper_bound(a: str, b: str) -> float:
+    """Cota superior de ratio() que solo mira longitudes (real_quick_ratio)"""
+    la, lb = len(a), len(b)
+    return 2.0 * min(la, lb) / (la + lb) if la + lb else 1.0
+
+
+class ConfidenceScorer:
+    """Puntúa en lote los resultados de una búsqueda contra el título esperado
+
+    Da exactamente la misma puntuación que SmartDownloader.calculate_confidence
+    (la diferencia admitida es 0; solo cambia el orden de las operaciones):
+    - las palabras excluidas se buscan con una única expresión regular,
+    - el título esperado se limpia y se parte una sola vez por lote,
+    - las partes se comparan en orden de cota superior (real_quick_ratio) y se deja
+      de calcular ratio() en cuanto la cota ya no puede superar al mejor,
+    - ratio() se memoriza por par de partes: los candidatos de una búsqueda
+      suelen repetir artista y nombre de la canción.
+    """
+
+    def __init__(self, exclude_keywords: Iterable[str]):
+        keywords = sorted(set(k.lower() for k in exclude_keywords), key=len, reverse=True)
+        self.exclude_re = re.compile('|'.join(re.escape(k) for k in keywords)) if keywords else None
+
+    def is_excluded(self, title: str) -> bool:
+        return bool(self.exclude_re and self.exclude_re.search(title.lower()))
+
+    def score(self, expected_title: str, result_title: str, duration: int) -> int:
+        return self.score_batch(expected_title, [(result_title, duration)])[0]
+
+    def score_batch(self, expected_title: str, candidates: Sequence[Tuple[str, int]]) -> List[int]:
+        """Devuelve la confianza de cada (título, duración) en el mismo orden"""
+        _, expected_parts, total_expected_chars = _split_parts(expected_title)
+        scores = []
+
+        for result_title, duration in candidates:
+            confidence = 100
+
+            if self.is_excluded(result_title):
+                scores.append(0)
+                continue
+
+            # Penalización por duración
+            if duration > 600:
+                scores.append(0)
+                continue
+            elif duration > 300:
+                confidence -= 50
+
+            _, result_parts, _ = _split_parts(result_title)
+            matching_chars = 0
+
+            for exp_part, exp_lower in expected_parts:
+                bounds = sorted(
+                    ((_upper_bound(exp_lower, res_lower), res_lower)
+                     for _, res_lower in result_parts),
+                    key=lambda item: item[0], reverse=True
+                )
+                best = 0
+                for bound, res_lower in bounds:
+                    if bound <= best:
+                        break
+                    ratio = _ratio(exp_lower, res_lower)
+                    if ratio > best:
+                        best = ratio
+                if best:
+                    matching_chars += len(exp_part) * best
+
+            if total_expected_chars > 0:
+                missing_chars = total_expected_chars - matching_chars
+                confidence -= (missing_chars * 10)  # -10 por cada carácter incorrecto
+                confidence = max(confidence, 0)
+
+            scores.append(min(confidence, 100))
+
+        return scores
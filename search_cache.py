@@ -0,0 +1,94 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+
+class SearchCache:
+    """Caché en disco de resultados de búsqueda de YouTube (SQLite)
+
+    Guarda solo los campos planos que usa el sistema de confianza (id, título,
+    duración). Las entradas caducan tras `ttl` segundos y, si se supera
+    `max_entries`, se descartan las usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, db_path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " query TEXT PRIMARY KEY,"
+            " entries TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS searches_lru ON searches (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normaliza la consulta para que variaciones triviales compartan entrada"""
+        return re.sub(r"\s+", " ", query.lower()).strip()
+
+    def get(self, query: str) -> Optional[List[Dict]]:
+        key = self.normalize(query)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT entries, created FROM searches WHERE query = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    with self.conn:
+                        self.conn.execute("DELETE FROM searches WHERE query = ?", (key,))
+                self.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE searches SET last_used = ? WHERE query = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, query: str, entries: List[Dict]) -> None:
+        key = self.normalize(query)
+        now = time.time()
+        flat = [
+            {"id": e.get("id"), "title": e.get("title"), "duration": e.get("duration")}
+            for e in entries if e
+        ]
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO searches (query, entries, created, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(flat, ensure_ascii=False), now, now),
+            )
+            self.conn.execute(
+                "DELETE FROM searches WHERE query IN ("
+                " SELECT query FROM searches ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM searches")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
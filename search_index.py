@@ -0,0 +1,184 @@
+import re
+import heapq
+import bisect
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Separa en lo que no es letra ni número de cualquier alfabeto ('Привет мир', 'Кино'...)
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+# Peso de cada tipo de coincidencia de una palabra de la búsqueda
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORE = 0.6
+# Similitud mínima (trigramas compartidos) para una coincidencia aproximada
+FUZZY_MIN_SIMILARITY = 0.4
+# Palabras del vocabulario que se prueban como prefijo o como aproximada de
+# cada palabra buscada (las de mejor puntuación)
+MAX_WORD_CANDIDATES = 100
+# Canciones candidatas por búsqueda: una palabra muy común (o un prefijo de una
+# letra) no obliga a recorrer media biblioteca
+MAX_CANDIDATES = 2000
+
+
+def normalize(text: str) -> List[str]:
+    """Palabras en minúsculas y sin tildes: 'Canción Nº1' -> ['cancion', 'no1']"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [word for word in _NON_WORD_RE.split(text) if word]
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigramas de una palabra con relleno en los bordes ('sol' -> ' so', 'sol', 'ol ')"""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Índice en memoria de los títulos de la biblioteca para el comando Find
+
+    Un índice invertido palabra -> canciones responde a las coincidencias
+    exactas; el vocabulario ordenado, a los prefijos (búsqueda binaria); y
+    un índice de trigramas sobre el vocabulario (no sobre las canciones), a
+    las coincidencias aproximadas con erratas. Se actualiza canción a canción.
+
+    Una búsqueda recorre como mucho MAX_CANDIDATES canciones, empezando por
+    la palabra más selectiva, y puntúa cada candidata con las palabras de su
+    título; si una palabra está en más canciones, afinar con otra palabra.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._titles: Dict[str, str] = {}
+        # song_id -> palabras normalizadas (sin repetir) de su título
+        self._words: Dict[str, Tuple[str, ...]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[str, str]]) -> "TitleIndex":
+        index = cls()
+        for song_id, title in items:
+            index.add(song_id, title)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def add(self, song_id: str, title: str) -> None:
+        """Indexa una canción (si ya estaba, se reemplaza su título)"""
+        with self._lock:
+            self.remove(song_id)
+            self._titles[song_id] = title
+            words = self._words[song_id] = tuple(set(normalize(title)))
+            for word in words:
+                songs = self._postings.get(word)
+                if songs is None:
+                    songs = self._postings[word] = set()
+                    bisect.insort(self._vocabulary, word)
+                    for gram in trigrams(word):
+                        self._trigrams.setdefault(gram, set()).add(word)
+                songs.add(song_id)
+
+    def remove(self, song_id: str) -> None:
+        with self._lock:
+            if self._titles.pop(song_id, None) is None:
+                return
+            for word in self._words.pop(song_id):
+                songs = self._postings.get(word)
+                if songs is None:
+                    continue
+                songs.discard(song_id)
+                if not songs:
+                    # Palabra sin canciones: sale del vocabulario y de los trigramas
+                    del self._postings[word]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+                    for gram in trigrams(word):
+                        words = self._trigrams.get(gram)
+                        if words is not None:
+                            words.discard(word)
+                            if not words:
+                                del self._trigrams[gram]
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        """Palabras que empiezan por prefix; las más cortas (las que mejor puntúan) primero"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        if end - start <= MAX_WORD_CANDIDATES:
+            return self._vocabulary[start:end]
+        return heapq.nsmallest(MAX_WORD_CANDIDATES, self._vocabulary[start:end], key=len)
+
+    def _similar(self, word: str) -> Dict[str, float]:
+        """Palabras del vocabulario parecidas a word (coeficiente de Dice sobre trigramas)"""
+        grams = trigrams(word)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        similar = {}
+        for candidate, count in shared.items():
+            # Una palabra de n letras tiene n trigramas con el relleno
+            similarity = 2 * count / (len(grams) + len(candidate))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                similar[candidate] = similarity
+        if len(similar) > MAX_WORD_CANDIDATES:
+            similar = dict(heapq.nlargest(MAX_WORD_CANDIDATES, similar.items(), key=lambda item: item[1]))
+        return similar
+
+    def _word_matches(self, word: str) -> Dict[str, float]:
+        """Mejor puntuación de cada palabra del vocabulario para una palabra de la búsqueda"""
+        matches: Dict[str, float] = {}
+        if word in self._postings:
+            matches[word] = EXACT_SCORE
+        for candidate in self._prefixed(word):
+            if candidate != word:
+                # Los prefijos más largos respecto a la palabra completa puntúan más
+                matches[candidate] = PREFIX_SCORE * (0.5 + 0.5 * len(word) / len(candidate))
+        if len(word) >= 3:
+            for candidate, similarity in self._similar(word).items():
+                score = FUZZY_SCORE * similarity
+                if score > matches.get(candidate, 0.0):
+                    matches[candidate] = score
+        return matches
+
+    def _candidates(self, matches: List[Dict[str, float]]) -> Set[str]:
+        """Canciones a puntuar: las de la palabra buscada con menos canciones
+        primero y, dentro de cada una, las de sus mejores coincidencias"""
+        by_selectivity = sorted(
+            matches, key=lambda word_matches: sum(len(self._postings[w]) for w in word_matches)
+        )
+        candidates: Set[str] = set()
+        for word_matches in by_selectivity:
+            for word, _ in sorted(word_matches.items(), key=lambda item: -item[1]):
+                for song_id in self._postings[word]:
+                    if len(candidates) >= MAX_CANDIDATES:
+                        return candidates
+                    candidates.add(song_id)
+        return candidates
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, str, float]]:
+        """(song_id, título, puntuación) de las mejores coincidencias
+
+        Cada palabra de la búsqueda puede coincidir exacta, como prefijo o
+        aproximada; una canción suma la mejor puntuación de cada palabra, así
+        que las que coinciden con todas quedan delante.
+        """
+        words = normalize(query)
+        if not words:
+            return []
+        with self._lock:
+            matches = [self._word_matches(word) for word in words]
+            scored = []
+            for song_id in self._candidates(matches):
+                song_words = self._words[song_id]
+                score = 0.0
+                for word_matches in matches:
+                    score += max([word_matches.get(word, 0.0) for word in song_words])
+                # A igual puntuación, antes los títulos más cortos (coinciden más de lleno)
+                scored.append((-score, len(self._titles[song_id]), song_id))
+            return [
+                (song_id, self._titles[song_id], -score / len(words))
+                for score, _, song_id in heapq.nsmallest(limit, scored)
+            ]
@@ -0,0 +1,74 @@
+import math
+import random
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class ShuffleQueue:
+    """Orden aleatorio de una playlist con cursor: O(1) por canción
+
+    Se baraja una permutación completa (Fisher–Yates, o ponderada si se dan
+    pesos) y se recorre con un cursor. Al acabar la pasada se baraja otra,
+    evitando que la primera canción de la nueva sea la última de la anterior.
+    """
+
+    def __init__(self, songs: Sequence[str], weight: Optional[Callable[[str], float]] = None,
+                 rng: Optional[random.Random] = None, order: Optional[List[str]] = None,
+                 cursor: int = 0):
+        self.songs = list(songs)
+        self.weight = weight
+        self.rng = rng or random.Random()
+        self.passes = 0
+        if order is not None:
+            self.order = list(order)
+            self.cursor = cursor
+        else:
+            self.order = self._shuffled()
+            self.cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def _shuffled(self) -> List[str]:
+        if self.weight is None:
+            order = list(self.songs)
+            self.rng.shuffle(order)  # Fisher–Yates
+            return order
+        # Muestreo ponderado sin reemplazo (Efraimidis–Spirakis): clave = u^(1/w)
+        keyed = []
+        for song in self.songs:
+            w = max(self.weight(song), 1e-9)
+            keyed.append((math.log(self.rng.random() or 1e-300) / w, song))
+        keyed.sort(reverse=True)
+        return [song for _, song in keyed]
+
+    def next(self) -> Optional[str]:
+        """Devuelve la siguiente canción y avanza el cursor"""
+        if not self.songs:
+            return None
+        if self.cursor >= len(self.order):
+            last = self.order[-1] if self.order else None
+            self.order = self._shuffled()
+            self.cursor = 0
+            self.passes += 1
+            # No repetir la canción de la frontera entre pasadas
+            if len(self.order) > 1 and self.order[0] == last:
+                swap = self.rng.randrange(1, len(self.order))
+                self.order[0], self.order[swap] = self.order[swap], self.order[0]
+        song = self.order[self.cursor]
+        self.cursor += 1
+        return song
+
+    def state(self) -> Dict:
+        """Estado serializable para reanudar la pasada tras reiniciar"""
+        return {"order": self.order, "cursor": self.cursor}
+
+    @classmethod
+    def resume(cls, songs: Sequence[str], state: Optional[Dict],
+               weight: Optional[Callable[[str], float]] = None) -> "ShuffleQueue":
+        """Reanuda desde un estado guardado si sigue correspondiendo a la playlist"""
+        if state:
+            order = state.get("order") or []
+            cursor = int(state.get("cursor", 0))
+            if len(order) == len(songs) and set(order) == set(songs) and 0 <= cursor <= len(order):
+                return cls(songs, weight=weight, order=order, cursor=cursor)
+        return cls(songs, weight=weight)
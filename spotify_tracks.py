@@ -0,0 +1,217 @@
+import json
+import time
+import queue
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Solo pedimos a Spotify los campos que realmente usamos
+PLAYLIST_FIELDS = "items(track(id,name,artists(name),album(name),external_ids(isrc))),next"
+PAGE_SIZE = 100
+ALBUM_PAGE_SIZE = 50
+# Máximo de IDs por llamada a spotify.tracks
+TRACKS_BATCH_SIZE = 50
+
+_END = object()
+
+
+def _track_info(track: Dict, album_name: Optional[str] = None) -> Optional[Dict]:
+    """Reduce un objeto de pista de Spotify a nombre, artista, álbum e IDs de origen
+
+    'isrc' solo viene en las pistas completas (playlists); en las de álbum es None.
+    """
+    if not track or not track.get("name"):
+        return None
+    artists = track.get("artists") or [{}]
+    album = album_name if album_name is not None else (track.get("album") or {}).get("name", "")
+    return {
+        "name": track["name"],
+        "artist": artists[0].get("name", ""),
+        "album": album or "",
+        "id": track.get("id"),
+        "isrc": (track.get("external_ids") or {}).get("isrc"),
+    }
+
+
+def track_sources(track: Dict) -> Dict[str, Optional[str]]:
+    """IDs de origen de una pista para el índice de duplicados del catálogo"""
+    return {"spotify": track.get("id"), "isrc": track.get("isrc")}
+
+
+def iter_pages(spotify, page: Optional[Dict]) -> Iterator[Dict]:
+    """Recorre una respuesta paginada de Spotify siguiendo 'next'"""
+    while page:
+        yield page
+        page = spotify.next(page) if page.get("next") else None
+
+
+def iter_playlist_tracks(spotify, playlist_id: str) -> Iterator[Dict]:
+    """Genera las pistas de una playlist página a página"""
+    first = spotify.playlist_items(playlist_id, fields=PLAYLIST_FIELDS,
+                                   limit=PAGE_SIZE, additional_types=("track",))
+    for page in iter_pages(spotify, first):
+        for item in page.get("items", []):
+            info = _track_info(item.get("track"))
+            if info:
+                yield info
+
+
+def iter_album_tracks(spotify, album_id: str, album_name: str,
+                      first_page: Optional[Dict] = None) -> Iterator[Dict]:
+    """Genera las pistas de un álbum página a página
+
+    first_page es la página 'tracks' que ya trae spotify.album(); si se pasa,
+    no se vuelve a pedir.
+    """
+    first = first_page or spotify.album_tracks(album_id, limit=ALBUM_PAGE_SIZE)
+    for page in iter_pages(spotify, first):
+        for track in page.get("items", []):
+            info = _track_info(track, album_name)
+            if info:
+                yield info
+
+
+class SpotifyMetadata:
+    """Datos de pistas de Spotify (nombre, artista, álbum, ISRC) con caché en disco
+
+    Las pistas que no están en la caché se piden por lotes de hasta
+    TRACKS_BATCH_SIZE con spotify.tracks, siempre con el mismo cliente (una
+    sola sesión HTTP y un solo token). La caché es SQLite, por ID de pista,
+    y las entradas caducan tras `ttl` segundos. `spotify` puede ser cualquier
+    objeto con el método tracks() de spotipy (p. ej. uno falso para pruebas).
+    """
+
+    def __init__(self, spotify, cache_path: str, ttl: float = 30 * 24 * 3600, timings=None):
+        self.spotify = spotify
+        self.ttl = ttl
+        self.timings = timings
+        self.api_calls = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            " track_id TEXT PRIMARY KEY,"
+            " info TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _cached(self, track_ids: List[str]) -> Dict[str, Dict]:
+        found = {}
+        oldest = time.time() - self.ttl
+        with self._lock:
+            for start in range(0, len(track_ids), 500):
+                chunk = track_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for track_id, info in self.conn.execute(
+                    f"SELECT track_id, info FROM tracks WHERE track_id IN ({placeholders}) AND created >= ?",
+                    (*chunk, oldest),
+                ):
+                    found[track_id] = json.loads(info)
+        return found
+
+    def _store(self, infos: Iterable[Dict]) -> None:
+        now = time.time()
+        rows = [(info["id"], json.dumps(info, ensure_ascii=False), now) for info in infos]
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tracks (track_id, info, created) VALUES (?, ?, ?)", rows
+            )
+
+    def _fetch(self, track_ids: List[str]) -> List[Optional[Dict]]:
+        if self.timings is None:
+            response = self.spotify.tracks(track_ids)
+        else:
+            with self.timings.measure("spotify.tracks"):
+                response = self.spotify.tracks(track_ids)
+        self.api_calls += 1
+        return response.get("tracks") or []
+
+    def tracks(self, track_ids: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """track_id -> datos de la pista (None si Spotify no la encuentra)"""
+        track_ids = list(dict.fromkeys(track_ids))
+        result: Dict[str, Optional[Dict]] = dict(self._cached(track_ids))
+        missing = [track_id for track_id in track_ids if track_id not in result]
+        self.hits += len(result)
+        self.misses += len(missing)
+        for start in range(0, len(missing), TRACKS_BATCH_SIZE):
+            chunk = missing[start:start + TRACKS_BATCH_SIZE]
+            infos = []
+            for track_id, track in zip(chunk, self._fetch(chunk)):
+                info = _track_info(track)
+                result[track_id] = info
+                if info:
+                    infos.append(dict(info, id=track_id))
+            self._store(infos)
+        return result
+
+    def track(self, track_id: str) -> Optional[Dict]:
+        return self.tracks([track_id]).get(track_id)
+
+    def remember(self, tracks: Iterator[Dict]) -> Iterator[Dict]:
+        """Deja pasar las pistas de una playlist guardándolas en la caché por lotes
+
+        Solo se guardan las completas (con ISRC); las de álbum no lo traen.
+        """
+        batch = []
+        try:
+            for track in tracks:
+                if track.get("id") and track.get("isrc"):
+                    batch.append(track)
+                    if len(batch) >= TRACKS_BATCH_SIZE:
+                        self._store(batch)
+                        batch = []
+                yield track
+        finally:
+            self._store(batch)
+
+    def stats(self) -> Dict:
+        return {"api_calls": self.api_calls, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+def prefetch(tracks: Iterator[Dict], max_buffered: int = 2 * PAGE_SIZE) -> Iterator[Dict]:
+    """Consume el generador en un hilo aparte para que las páginas siguientes
+    se pidan mientras se procesan las primeras pistas"""
+    buffer = queue.Queue(maxsize=max_buffered)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for track in tracks:
+                if not put(track):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_END)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeMusic:
+    """Backend de reproducción en memoria: guarda lo que se carga, encola y el volumen"""
+
+    def __init__(self):
+        self.loaded = None
+        self.queued = None
+        self.volume = None
+        self.busy = False
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def set_end_callback(self, callback):
+        self.callback = callback
+
+    def load(self, path):
+        self.loaded = path
+        self.queued = None
+
+    def queue(self, path):
+        self.queued = path
+
+    def play(self):
+        self.busy = True
+
+    def stop(self):
+        self.busy = False
+
+    def unload(self):
+        self.loaded = None
+        self.queued = None
+        self.busy = False
+
+    def get_busy(self):
+        return self.busy
+
+
+@pytest.fixture
+def player(tmp_path, monkeypatch):
+    """MusicPlayer sobre un BASE_DIR temporal con 10 canciones vacías"""
+    pytest.importorskip("pygame")
+    import main
+
+    monkeypatch.setattr(main, "BASE_DIR", str(tmp_path))
+    songs_dir = tmp_path / "Songs"
+    songs_dir.mkdir()
+    for i in range(1, 11):
+        (songs_dir / f"{i}.mp3").write_bytes(b"")
+    player = main.MusicPlayer(FakeMusic())
+    yield player
+    player.catalog.close()
+    player.library.close()
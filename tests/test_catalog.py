@@ -0,0 +1,14 @@
+from catalog import SongCatalog
+
+
+def test_next_song_id_skips_ids_already_on_disk(tmp_path):
+    catalog = SongCatalog(str(tmp_path))
+    on_disk = {"1", "2", "3"}
+    catalog.add("4", "Ya en el catálogo")
+
+    ids = [catalog.next_song_id(on_disk.__contains__) for _ in range(2)]
+
+    assert ids == ["5", "6"]
+    # La reserva del bloque va con FULL; el resto de escrituras sigue en NORMAL
+    assert catalog.conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    catalog.close()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class FakeSpotify:
+    def __init__(self, count):
+        self.items = [
+            {"track": {"id": f"sp{i}", "name": f"Tema {i}", "artists": [{"name": "Grupo"}],
+                       "album": {"name": "Disco"}, "external_ids": {"isrc": f"ISRC{i}"}}}
+            for i in range(count)
+        ]
+
+    def playlist(self, playlist_id, fields=None):
+        return {"name": "Prueba", "tracks": {"total": len(self.items)}}
+
+    def playlist_items(self, playlist_id, **kwargs):
+        return {"items": self.items, "next": None}
+
+
+class FakeCache:
+    def stats(self):
+        return {"hits": 0, "misses": 0}
+
+
+class BlockingDownloader:
+    """Las descargas se quedan esperando a `gate` para poder cancelar con pistas en curso"""
+
+    def __init__(self, songs_dir):
+        self.songs_dir = songs_dir
+        self.search_cache = FakeCache()
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+        self.fetching = 0
+        self.finalized = []
+
+    def resolve(self, name, artist="", album=""):
+        return [{"confidence": 95, "video_id": f"yt-{name}", "url": f"https://youtu.be/{name}", "title": name}]
+
+    def existing_song(self, video_id):
+        return None
+
+    def fetch_audio(self, video_info):
+        with self.lock:
+            self.fetching += 1
+        self.gate.wait(5)
+        return f"/tmp/{video_info['video_id']}.webm"
+
+    def finalize(self, source_path, video_id):
+        with self.lock:
+            self.finalized.append(video_id)
+        return None
+
+
+def test_cancel_from_another_thread_stops_tracks_in_flight(player):
+    player._spotify = FakeSpotify(20)
+    player._spotify_ready = True
+    downloader = player._downloader = BlockingDownloader(player.songs_dir)
+
+    job = player.jobs.submit("Playlist", player.download_spotify_playlist,
+                             "https://open.spotify.com/playlist/abc")
+    deadline = time.time() + 5
+    while downloader.fetching == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert downloader.fetching > 0
+
+    player.jobs.cancel(job.id)
+    downloader.gate.set()
+    deadline = time.time() + 5
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    player.spotify_metadata.close()
+
+    assert job.finished
+    # Las descargas en curso terminan, pero ninguna llega a convertirse
+    assert downloader.finalized == []
+    assert downloader.fetching <= 3
@@ -0,0 +1,20 @@
+from import_manifest import TRANSCODED, ImportManifest
+
+
+def track(name):
+    return {"id": name, "name": name, "artist": "x", "album": ""}
+
+
+def test_records_after_a_torn_line_are_kept(tmp_path):
+    path = str(tmp_path / "imports" / "spotify-abc.jsonl")
+    manifest = ImportManifest(path)
+    manifest.record(track("a"), TRANSCODED, song_id="1")
+    # Un corte a mitad de escribir deja la última línea sin terminar
+    with open(path, "ab") as f:
+        f.write('{"key": "b", "state": "transcoded", "title": "Canción'.encode("utf-8")[:-1])
+
+    manifest = ImportManifest(path)
+    manifest.record(track("c"), TRANSCODED, song_id="3")
+    manifest.record(track("d"), TRANSCODED, song_id="4")
+
+    assert sorted(ImportManifest(path).entries) == ["a", "c", "d"]
@@ -0,0 +1,47 @@
+import threading
+
+from importer import ImportPipeline
+
+
+class FakeDownloader:
+    def __init__(self, songs_dir, broken_video=None):
+        self.songs_dir = songs_dir
+        self.broken_video = broken_video
+
+    def resolve(self, name, artist="", album=""):
+        return [{"confidence": 95, "video_id": f"yt-{name}", "url": f"https://youtu.be/{name}", "title": name}]
+
+    def existing_song(self, video_id):
+        # Fuera de _run_stage: p. ej. un error al leer la biblioteca
+        if video_id == self.broken_video:
+            raise OSError("biblioteca no disponible")
+        return None
+
+    def fetch_audio(self, video_info):
+        return f"/tmp/{video_info['video_id']}.webm"
+
+    def finalize(self, source_path, video_id):
+        return f"id-{video_id}"
+
+
+def run_with_timeout(pipeline, tracks, timeout=5):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(pipeline.run(tracks)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run() no terminó"
+    return results[0]
+
+
+def test_task_raising_outside_a_stage_fails_only_that_track(tmp_path):
+    def lookup(track):
+        if track["name"] == "b":
+            raise KeyError("catálogo roto")
+        return None
+
+    pipeline = ImportPipeline(FakeDownloader(str(tmp_path), broken_video="yt-c"), lookup=lookup)
+    tracks = [{"name": name, "artist": "x", "album": ""} for name in "abcd"]
+
+    results = run_with_timeout(pipeline, tracks)
+
+    assert results == ["id-yt-a", None, None, "id-yt-d"]
@@ -0,0 +1,118 @@
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from mpv_backend import MPVMusic
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="servidor IPC falso sobre AF_UNIX")
+
+
+class FakeMPV:
+    """Servidor JSON IPC mínimo: responde a los comandos y publica start-file/end-file/idle"""
+
+    def __init__(self, path):
+        self.commands = []
+        self.playlist = []
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(1)
+        self._conn = None
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _send(self, message):
+        self._conn.sendall((json.dumps(message) + "\n").encode())
+
+    def _serve(self):
+        self._conn, _ = self._server.accept()
+        with self._conn, self._conn.makefile("rb") as lines:
+            for line in lines:
+                request = json.loads(line)
+                command = request["command"]
+                self.commands.append(command)
+                if command[0] == "quit":
+                    break  # El cliente ya no espera respuesta
+                self._send({"request_id": request["request_id"], "error": "success", "data": None})
+                if command[0] == "loadfile" and command[2] == "replace":
+                    self._send({"event": "start-file"})
+                elif command[0] == "loadfile" and command[2] == "append-play":
+                    self.playlist = [command[1]]
+                elif command[0] == "playlist-clear":
+                    self.playlist = []
+
+    def end_track(self):
+        """La pista actual termina sola: sigue la encolada o queda en silencio"""
+        self._send({"event": "end-file", "reason": "eof"})
+        if self.playlist:
+            self.playlist.pop(0)
+            self._send({"event": "start-file"})
+        else:
+            self._send({"event": "idle"})
+
+    def close(self):
+        self._server.close()
+
+
+@pytest.fixture
+def fake_mpv(tmp_path):
+    path = str(tmp_path / "mpv.sock")
+    server = FakeMPV(path)
+    music = MPVMusic(ipc_path=path, spawn=False)
+    yield server, music
+    music.close()
+    server.close()
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_play_queue_and_volume_commands(fake_mpv):
+    server, music = fake_mpv
+
+    music.set_volume(1.5)
+    music.load("a.mp3")
+    music.play()
+    music.queue("b.mp3")
+
+    assert server.commands == [
+        ["set_property", "volume", 150],
+        ["loadfile", "a.mp3", "replace"],
+        ["set_property", "pause", False],
+        ["playlist-clear"],
+        ["loadfile", "b.mp3", "append-play"],
+    ]
+    assert music.get_busy()
+
+
+def test_one_end_callback_per_finished_track(fake_mpv):
+    server, music = fake_mpv
+    ends = []
+    music.set_end_callback(lambda: ends.append(music.get_busy()))
+    music.load("a.mp3")
+    music.play()
+    music.queue("b.mp3")
+
+    server.end_track()
+    # La encolada sigue sonando sin hueco
+    assert wait_for(lambda: ends == [True])
+    server.end_track()
+    assert wait_for(lambda: ends == [True, False])
+    time.sleep(0.1)
+    assert ends == [True, False]
+
+
+def test_close_quits_and_stops_the_reader(fake_mpv):
+    server, music = fake_mpv
+
+    music.close()
+
+    assert wait_for(lambda: server.commands[-1:] == [["quit"]])
+    music._reader.join(2)
+    assert not music._reader.is_alive()
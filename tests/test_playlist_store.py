@@ -0,0 +1,35 @@
+from playlist_store import PlaylistStore
+
+
+def test_ops_after_a_torn_line_are_kept(tmp_path):
+    store = PlaylistStore(str(tmp_path))
+    playlist_id = store.create("Lista", ["1", "2"])
+    store.add_songs(playlist_id, ["3"])
+    # Un corte a mitad de escribir deja la última línea sin terminar
+    with open(store._ops_path(playlist_id), "a") as f:
+        f.write('{"op": "add", "songs": ["9')
+
+    PlaylistStore(str(tmp_path)).add_songs(playlist_id, ["4"])
+    store = PlaylistStore(str(tmp_path))
+    store.add_songs(playlist_id, ["5"])
+
+    assert PlaylistStore(str(tmp_path)).get(playlist_id).songs == ["1", "2", "3", "4", "5"]
+
+
+def test_reverse_index_is_reused_across_sessions(tmp_path, monkeypatch):
+    store = PlaylistStore(str(tmp_path))
+    for i in range(1, 6):
+        store.create(f"Lista {i}", [str(i), "común"], playlist_id=f"{i}L")
+    assert store.playlists_containing("común") == {"1L", "2L", "3L", "4L", "5L"}
+    store.close()
+    # Un cambio después de guardar el índice: solo esa lista se vuelve a leer
+    PlaylistStore(str(tmp_path)).add_songs("2L", ["nueva"])
+
+    store = PlaylistStore(str(tmp_path))
+    read = []
+    get = store.get
+    monkeypatch.setattr(store, "get", lambda playlist_id: read.append(playlist_id) or get(playlist_id))
+
+    assert store.playlists_containing("nueva") == {"2L"}
+    assert store.playlists_containing("3") == {"3L"}
+    assert read == ["2L"]
@@ -0,0 +1,63 @@
+import time
+import wave
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+from playback import PredecodeEngine
+
+
+def write_wav(path, seconds):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(44100)
+        f.writeframes(b"\0" * int(seconds * 44100) * 4)
+    return str(path)
+
+
+@pytest.fixture
+def mixer(monkeypatch):
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    pygame.mixer.init(44100, -16, 2)
+    yield
+    pygame.mixer.quit()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_manual_next_reuses_the_predecoded_track(tmp_path, mixer):
+    first = write_wav(tmp_path / "1.wav", 5)
+    second = write_wav(tmp_path / "2.wav", 5)
+    engine = PredecodeEngine()
+    engine.load(first)
+    engine.play()
+    engine.queue(second)
+    assert wait_for(lambda: engine.next_sound is not None)
+
+    engine.load(second)
+    engine.play()
+
+    assert engine.stats()["decoded_tracks"] == 2
+    assert engine.get_busy()
+    engine.stop()
+
+
+def test_track_over_the_cap_streams_from_disk(tmp_path, mixer):
+    path = write_wav(tmp_path / "largo.wav", 5)
+    engine = PredecodeEngine(max_buffer_bytes=44100 * 4)  # cabe 1 s de audio
+
+    engine.load(path)
+    engine.play()
+
+    stats = engine.stats()
+    assert stats["decoded_tracks"] == 0
+    assert stats["streamed_tracks"] == 1
+    assert engine.get_busy()
+    engine.stop()
+    assert not engine.get_busy()
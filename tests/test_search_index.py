@@ -0,0 +1,31 @@
+from search_index import MAX_CANDIDATES, TitleIndex, normalize
+
+
+def test_normalize_keeps_non_latin_letters():
+    assert normalize("Кино - Группа крови") == ["кино", "группа", "крови"]
+    assert normalize("Canción Nº1") == ["cancion", "no1"]
+
+
+def test_search_non_latin_titles():
+    index = TitleIndex.build([
+        ("1", "Кино - Звезда по имени Солнце"),
+        ("2", "Привет мир"),
+        ("3", "Hello world"),
+    ])
+
+    assert [song_id for song_id, _, _ in index.search("кино")] == ["1"]
+    assert index.search("Привет мир")[0][:2] == ("2", "Привет мир")
+    # Prefijo y errata también funcionan fuera del alfabeto latino
+    assert index.search("прив")[0][0] == "2"
+    assert index.search("звизда")[0][0] == "1"
+
+
+def test_common_word_scans_a_bounded_number_of_songs():
+    index = TitleIndex.build((str(i), f"love song {i}") for i in range(MAX_CANDIDATES * 3))
+    index.add("rare", "love rare")
+
+    results = index.search("love rare", limit=5)
+
+    assert len(index.search("love", limit=5)) == 5
+    # La palabra más selectiva se recorre primero: la única que tiene las dos gana
+    assert results[0][:2] == ("rare", "love rare")
@@ -0,0 +1,44 @@
+SONGS = [str(i) for i in range(1, 11)]
+
+
+def test_manual_next_visits_every_song_once_per_pass(player):
+    player.playlists.create("Todas", SONGS, playlist_id="1L")
+    player.play_playlist("1L")
+
+    played = [player.current_song]
+    for _ in range(len(SONGS) - 1):
+        player.play_next_song()
+        played.append(player.current_song)
+
+    assert sorted(played, key=int) == SONGS
+
+
+def test_manual_next_plays_the_queued_song(player):
+    player.playlists.create("Todas", SONGS, playlist_id="1L")
+    player.play_playlist("1L")
+    queued = player.queued_song
+
+    player.play_next_song()
+
+    assert player.current_song == queued
+    assert player.music.loaded.endswith(f"{queued}.mp3")
+
+
+def test_song_queued_before_stop_is_not_skipped(player):
+    player.playlists.create("Todas", SONGS, playlist_id="1L")
+    player.play_playlist("1L")
+    played = [player.current_song]
+    for _ in range(3):
+        player.play_next_song()
+        played.append(player.current_song)
+    queued = player.queued_song
+
+    player.stop_playback()
+    player.play_playlist("1L")
+
+    assert player.current_song == queued
+    played.append(player.current_song)
+    for _ in range(len(SONGS) - len(played)):
+        player.play_next_song()
+        played.append(player.current_song)
+    assert sorted(played, key=int) == SONGS
@@ -0,0 +1,24 @@
+import pytest
+
+
+def test_gain_applies_to_the_volume_the_backend_plays(player):
+    player.volume = 2.0  # DEFAULT_VOLUME; pygame y predecode lo recortan a 1.0
+    player.catalog.set_analysis("1", {"gain_db": -3.0})
+    player.catalog.set_analysis("2", {"gain_db": -6.0})
+
+    loud = player.song_volume("1")
+    louder = player.song_volume("2")
+
+    assert loud == pytest.approx(10 ** (-3 / 20))
+    assert louder == pytest.approx(10 ** (-6 / 20))
+    assert louder < loud < 1.0
+
+
+def test_song_volume_is_applied_to_the_backend(player):
+    player.volume = 0.5
+    player.catalog.set_analysis("3", {"gain_db": -6.0})
+    player.current_song = "3"
+
+    player.apply_song_volume()
+
+    assert player.music.volume == pytest.approx(0.5 * 10 ** (-6 / 20))
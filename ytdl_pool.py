@@ -0,0 +1,146 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Union
+
+# Perfil de búsqueda: resultados planos, sin resolver formatos
+SEARCH_PROFILE = "search"
+# Perfil de descarga: el de SmartDownloader.fetch_opts()
+DOWNLOAD_PROFILE = "download"
+# Perfil de Stream: información completa (URL directa del audio) sin descargar
+STREAM_PROFILE = "stream"
+
+SEARCH_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': True,
+    'default_search': 'ytsearch',
+}
+STREAM_OPTS = {
+    # Formatos que ffmpeg puede leer desde un pipe mientras crecen
+    'format': 'bestaudio[ext=webm]/bestaudio',
+    'quiet': True,
+    'no_warnings': True,
+}
+
+
+class _Session:
+    """Un YoutubeDL del pool y el hook de progreso de quien lo tiene prestado"""
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.progress_hook: Optional[Callable[[Dict], None]] = None
+        self.uses = 0
+
+    def dispatch(self, d: Dict) -> None:
+        if self.progress_hook is not None:
+            self.progress_hook(d)
+
+
+class YoutubeDLPool:
+    """Instancias de yt_dlp.YoutubeDL ya configuradas, reutilizadas entre operaciones
+
+    Crear un YoutubeDL carga los extractores y abre un pool de conexiones
+    HTTP nuevo; aquí se crean una vez por perfil y se prestan. Cada
+    instancia la usa un solo hilo a la vez: si todas las de un perfil están
+    ocupadas (max_per_profile, un número para todos o un dict por perfil) se
+    espera a que se devuelva una. Una instancia que termina con una excepción
+    se descarta por si quedó en mal estado.
+    """
+
+    def __init__(self, profiles: Dict[str, Callable[[], Dict]],
+                 max_per_profile: Union[int, Dict[str, int]] = 2):
+        # perfil -> función que devuelve sus opciones (se llama al crear cada instancia)
+        self.profiles = profiles
+        if isinstance(max_per_profile, int):
+            max_per_profile = {name: max_per_profile for name in profiles}
+        self.max_per_profile = {name: max_per_profile.get(name, 2) for name in profiles}
+        self._idle: Dict[str, List[_Session]] = {name: [] for name in profiles}
+        self._open: Dict[str, int] = {name: 0 for name in profiles}
+        self._cond = threading.Condition()
+        self._closed = False
+        self.metrics: Dict[str, Dict[str, int]] = {
+            name: {"created": 0, "reused": 0, "waits": 0, "discarded": 0} for name in profiles
+        }
+
+    def _create(self, profile: str) -> _Session:
+        import yt_dlp
+        session = _Session(None)
+        opts = dict(self.profiles[profile]())
+        # Un solo hook fijo por instancia que reenvía al de quien la tenga prestada
+        opts['progress_hooks'] = [session.dispatch]
+        session.ydl = yt_dlp.YoutubeDL(opts)
+        return session
+
+    def _acquire(self, profile: str) -> _Session:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("El pool de yt-dlp está cerrado")
+            metrics = self.metrics[profile]
+            while not self._idle[profile] and self._open[profile] >= self.max_per_profile[profile]:
+                metrics["waits"] += 1
+                self._cond.wait()
+            if self._idle[profile]:
+                metrics["reused"] += 1
+                return self._idle[profile].pop()
+            # Se reserva el hueco antes de crear (crear es lento y se hace sin el lock)
+            self._open[profile] += 1
+            metrics["created"] += 1
+        try:
+            return self._create(profile)
+        except Exception:
+            with self._cond:
+                self._open[profile] -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, profile: str, session: _Session, discard: bool) -> None:
+        session.progress_hook = None
+        with self._cond:
+            if discard or self._closed:
+                self._open[profile] -= 1
+                if discard:
+                    self.metrics[profile]["discarded"] += 1
+            else:
+                self._idle[profile].append(session)
+            self._cond.notify()
+        if discard or self._closed:
+            self._close_session(session)
+
+    @staticmethod
+    def _close_session(session: _Session) -> None:
+        try:
+            session.ydl.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self, profile: str, progress_hook: Optional[Callable[[Dict], None]] = None):
+        """Presta un YoutubeDL del perfil: `with pool.session("search") as ydl: ...`"""
+        session = self._acquire(profile)
+        session.progress_hook = progress_hook
+        session.uses += 1
+        failed = True
+        try:
+            yield session.ydl
+            failed = False
+        finally:
+            self._release(profile, session, discard=failed)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Por perfil: instancias creadas (= pools de conexiones abiertos), préstamos
+        servidos por una instancia ya abierta, esperas, descartadas y abiertas ahora"""
+        with self._cond:
+            return {
+                name: dict(metrics, open=self._open[name], idle=len(self._idle[name]))
+                for name, metrics in self.metrics.items()
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = [session for sessions in self._idle.values() for session in sessions]
+            for name in self._idle:
+                self._open[name] -= len(self._idle[name])
+                self._idle[name] = []
+        for session in idle:
+            self._close_session(session)